@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+# Порядок фаз замера: первичная загрузка, итерация без изменений, изменение части
+# файлов, удаление части файлов, полная сверка со списком файлов на диске
+# и восстановление папки с диска в пустую директорию
+PHASES = ("initial", "idle", "modify", "delete", "reconcile", "restore")
+
+_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(value):
+    """
+    Разбирает размер в байтах с необязательным суффиксом K, M или G.
+
+    Args:
+        value (str): Значение, например "4K" или "2G".
+
+    Returns:
+        int: Размер в байтах.
+    """
+    value = value.strip().upper().removesuffix("B")
+    multiplier = _SUFFIXES.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def generate_tree(root, files, file_size, dirs, big_files, big_size):
+    """
+    Создаёт синтетическое дерево файлов.
+
+    Мелкие файлы со случайным содержимым распределяются по `dirs` директориям,
+    большие файлы создаются разреженными, чтобы генерация не занимала место и время.
+
+    Args:
+        root (str): Корень дерева.
+        files (int): Число мелких файлов.
+        file_size (int): Размер мелкого файла в байтах.
+        dirs (int): Число директорий для мелких файлов.
+        big_files (int): Число больших файлов.
+        big_size (int): Размер большого файла в байтах.
+
+    Returns:
+        list: Пути мелких файлов относительно корня.
+    """
+    names = []
+    for index in range(files):
+        name = f"d{index % max(dirs, 1):04d}/f{index:06d}.bin"
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(os.urandom(file_size))
+        names.append(name)
+    if big_files:
+        os.makedirs(os.path.join(root, "big"), exist_ok=True)
+    for index in range(big_files):
+        with open(os.path.join(root, "big", f"b{index:02d}.bin"), "wb") as file:
+            file.truncate(big_size)
+    return names
+
+
+def start_server(args, root):
+    """
+    Запускает имитацию API диска (`fake_disk.py`) в отдельном процессе, чтобы её память
+    и процессорное время не попадали в замеры клиента.
+
+    Returns:
+        tuple: (процесс, URL API).
+    """
+    command = [
+        sys.executable,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_disk.py"),
+        "--root",
+        root,
+        "--latency",
+        str(args.latency),
+        "--bandwidth",
+        str(parse_size(args.bandwidth)),
+        "--error-rate",
+        str(args.error_rate),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    url = process.stdout.readline().strip()
+    if not url:
+        process.kill()
+        raise RuntimeError("Имитация API диска не запустилась")
+    return process, url
+
+
+def server_stats(url):
+    base = url.split("/v1/")[0]
+    return requests.get(f"{base}/_stats", timeout=10).json()
+
+
+def peak_rss_mb():
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(phase, url, action):
+    """
+    Выполняет фазу замера и собирает её показатели.
+
+    Args:
+        phase (str): Название фазы.
+        url (str): URL имитации API.
+        action (callable): Действие фазы (итерация синхронизации).
+
+    Returns:
+        dict: Время, число файловых операций (при скачивании — запросов участков),
+            переданные в обе стороны байты, запросы к API и пиковая память процесса.
+    """
+    before = server_stats(url)
+    started = time.perf_counter()
+    action()
+    seconds = time.perf_counter() - started
+    after = server_stats(url)
+
+    def delta(key):
+        return after.get(key, 0) - before.get(key, 0)
+
+    files = sum(
+        delta(key)
+        for key in ("upload_href", "delete", "copy", "move", "mkdir", "download")
+    )
+    sent = delta("bytes_in") + delta("bytes_out")
+    return {
+        "phase": phase,
+        "seconds": round(seconds, 3),
+        "files": files,
+        "files_per_s": round(files / seconds, 1) if seconds else 0.0,
+        "mb": round(sent / 1024**2, 2),
+        "mb_per_s": round(sent / 1024**2 / seconds, 2) if seconds else 0.0,
+        "api_calls": delta("calls"),
+        "errors": delta("errors"),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def print_report(results):
+    columns = (
+        ("phase", "{:<10}"),
+        ("seconds", "{:>9}"),
+        ("files", "{:>7}"),
+        ("files_per_s", "{:>11}"),
+        ("mb", "{:>9}"),
+        ("mb_per_s", "{:>9}"),
+        ("api_calls", "{:>9}"),
+        ("errors", "{:>6}"),
+        ("peak_rss_mb", "{:>11}"),
+    )
+    print(" ".join(fmt.format(name) for name, fmt in columns))
+    for result in results:
+        print(" ".join(fmt.format(result[name]) for name, fmt in columns))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Замер скорости синхронизации на синтетическом дереве файлов "
+        "с имитацией API диска"
+    )
+    parser.add_argument("--files", type=int, default=10000, help="число мелких файлов")
+    parser.add_argument("--file-size", default="4K", help="размер мелкого файла")
+    parser.add_argument("--dirs", type=int, default=100, help="число директорий")
+    parser.add_argument("--big-files", type=int, default=0, help="число больших файлов")
+    parser.add_argument("--big-size", default="1G", help="размер большого файла")
+    parser.add_argument(
+        "--modify", type=float, default=0.01, help="доля изменяемых и удаляемых файлов"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="задержка ответа API в секундах"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        default="0",
+        help="полоса приёма файлов сервером (0 — без ограничения)",
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="доля ответов 503"
+    )
+    parser.add_argument("--workdir", help="рабочая директория (по умолчанию временная)")
+    parser.add_argument(
+        "--keep", action="store_true", help="не удалять рабочую директорию"
+    )
+    parser.add_argument("--json", help="записать результаты в JSON-файл")
+    parser.add_argument(
+        "--log-level", default="WARNING", help="уровень логов в консоли"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="disk-bench-")
+    local_dir = os.path.join(workdir, "local")
+    os.makedirs(local_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    names = generate_tree(
+        local_dir,
+        args.files,
+        parse_size(args.file_size),
+        args.dirs,
+        args.big_files,
+        parse_size(args.big_size),
+    )
+    print(f"Дерево создано за {time.perf_counter() - started:.1f} с: {workdir}")
+
+    server, url = start_server(args, "/bench")
+    # Настройки задаются до импорта модулей синхронизации: config читает их при импорте
+    os.environ.update(
+        {
+            "API_KEY": "benchmark",
+            "URL": url,
+            "DIR_PATH": local_dir,
+            "DISK_PATH": "/bench",
+            "LOG_FILE": os.path.join(workdir, "log.json"),
+            "DB_FILE": os.path.join(workdir, "database.db"),
+        }
+    )
+    from logs import setup_logging
+
+    setup_logging(console_level=args.log_level)
+
+    from cloud import Connector
+    from cycle import sync_cycle
+    from pairs import SyncPair
+    from restore import restore
+    from transfer import TransferExecutor
+
+    attribute = Connector()
+    executor = TransferExecutor(attribute)
+    sample = names[: int(len(names) * args.modify)]
+
+    def modify():
+        for name in sample:
+            with open(os.path.join(local_dir, name), "ab") as file:
+                file.write(b"\0")
+        sync_cycle(attribute, executor, reconcile=False)
+
+    def delete():
+        for name in sample:
+            os.remove(os.path.join(local_dir, name))
+        sync_cycle(attribute, executor, reconcile=False)
+
+    actions = {
+        "initial": lambda: sync_cycle(attribute, executor, reconcile=True),
+        "idle": lambda: sync_cycle(attribute, executor, reconcile=False),
+        "modify": modify,
+        "delete": delete,
+        "reconcile": lambda: sync_cycle(attribute, executor, reconcile=True),
+        "restore": lambda: restore(
+            SyncPair(os.path.join(workdir, "restore"), "/bench")
+        ),
+    }
+    try:
+        results = [measure(phase, url, actions[phase]) for phase in PHASES]
+    finally:
+        server.terminate()
+        server.wait()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,350 @@
+import hashlib
 import os
+import random
+import threading
+import time
+import uuid
 from loguru import logger
 from curses.ascii import isalpha
 import requests
-import pprint
-from config import API, DIR_PATH, DISK_PATH, URL, LOG_FILE
-
-logger.add(
-    LOG_FILE,
-    format="{level} {time} {file} {function} {line} {message} {exception}",
-    serialize=True,
-    level="INFO",
-    rotation="500 MB",
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+from config import (
+    API,
+    DIR_PATH,
+    DISK_PATH,
+    URL,
+    UPLOAD_CHUNK_SIZE,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_BACKOFF_MAX,
+    INFO_PAGE_LIMIT,
+    OPERATION_TIMEOUT,
+    UPLOAD_RESUME_THRESHOLD,
+    UPLOAD_SEGMENT_SIZE,
+    UPLOAD_HREF_TTL,
+    DELETE_PERMANENTLY,
+    DELETE_WORKERS,
 )
+from database_connect import UploadState, get_database
+from logs import log_sampled
+from metrics import get_metrics
+from ratelimit import THROTTLE_STATUSES, get_rate_limiter
+from scanner import parent_path
+
+# Коды ответа, при которых идемпотентный запрос имеет смысл повторить
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Поля ресурса, запрашиваемые при получении списка файлов
+INFO_FIELDS = ("name", "type", "size", "modified", "md5", "sha256", "revision")
+
+# Размер части блока, после которой проверяется ограничение полосы загрузки
+THROTTLE_SLICE = 256 * 1024
+
+# Размер блока чтения ответа при скачивании файла
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Коды ответа на пустой запрос с заголовком `Content-Range`, означающие, что сервер
+# не поддерживает загрузку частями
+RESUMABLE_REJECT_STATUSES = frozenset({400, 416, 501})
+
+# Коды ответа, при которых ссылку на скачивание нужно запросить заново
+EXPIRED_HREF_STATUSES = frozenset({403, 404, 410})
+
+# Префикс имени временного файла, на котором проверяется поддержка загрузки частями
+PROBE_PREFIX = ".resumable-probe-"
+
+# Ключ таблицы meta с результатом проверки поддержки загрузки частями
+RESUMABLE_META_KEY = "resumable_upload"
+
+_session = None
+_session_lock = threading.Lock()
+
+# Поддержка загрузки частями по URL API, общая для всех Connector процесса
+_resumable_support = {}
+_resumable_lock = threading.Lock()
+
+
+class ThrottleRetry(Retry):
+    """
+    Повтор запросов urllib3, сообщающий ограничителю о сигналах ограничения,
+    полученных при промежуточных попытках.
+
+    Повторы выполняются внутри одного вызова `ThrottledAdapter.send`, поэтому
+    перед каждым повтором ограничитель тоже выдаёт разрешение на запрос.
+    """
+
+    limiter = None
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.limiter = self.limiter
+        return retry
+
+    def increment(self, method=None, url=None, response=None, *args, **kwargs):
+        get_metrics().inc("retries_total", source="api")
+        if (
+            self.limiter is not None
+            and response is not None
+            and response.status in THROTTLE_STATUSES
+        ):
+            self.limiter.throttle(response.headers.get("Retry-After"))
+        return super().increment(method, url, response, *args, **kwargs)
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.limiter is not None:
+            self.limiter.before_request()
+
+
+def request_endpoint(url, method=None):
+    """
+    Определяет метку эндпоинта API для метрик.
+
+    Args:
+        url (str): URL запроса.
+        method (str): HTTP-метод запроса.
+
+    Returns:
+        str: Например "resources", "resources/upload", "operations", "upload"
+            для запросов по ссылке загрузки или "download" — по ссылке скачивания.
+    """
+    path = urlsplit(url).path
+    _, found, tail = path.partition("/v1/disk/")
+    if not found:
+        return "download" if method == "GET" else "upload"
+    if tail.startswith("operations"):
+        return "operations"
+    return tail.rstrip("/")
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """
+    HTTP-адаптер, который пропускает каждый запрос через общий ограничитель
+    и учитывает число и длительность запросов в метриках.
+    """
+
+    def __init__(self, limiter=None, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if self.limiter is not None:
+            self.limiter.before_request()
+        metrics = get_metrics()
+        endpoint = request_endpoint(request.url, request.method)
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            metrics.inc(
+                "api_requests_total",
+                endpoint=endpoint,
+                method=request.method,
+                status="error",
+            )
+            raise
+        metrics.observe("api_request", time.perf_counter() - started, endpoint=endpoint)
+        metrics.inc(
+            "api_requests_total",
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+        )
+        if self.limiter is not None:
+            self.limiter.after_response(
+                response.status_code, response.headers.get("Retry-After")
+            )
+        return response
+
+
+def create_session(pool_size=None, max_retries=None, limiter=None):
+    """
+    Создаёт HTTP-сессию с пулом keep-alive соединений и повтором запросов.
+
+    Идемпотентные запросы (GET, HEAD, DELETE) при обрыве соединения, ответах 5xx и 429
+    повторяются с экспоненциальной задержкой и случайным разбросом; заголовок
+    `Retry-After` учитывается. Загрузка файла (PUT) повторяется в `Connector.load`,
+    т.к. тело запроса — поток, который нельзя отправить повторно без переоткрытия файла.
+
+    Args:
+        pool_size (int): Размер пула соединений (по умолчанию HTTP_POOL_SIZE).
+        max_retries (int): Число повторов (по умолчанию HTTP_MAX_RETRIES).
+        limiter (RateLimiter): Ограничитель, через который проходят все запросы сессии.
+
+    Returns:
+        requests.Session: Настроенная сессия.
+    """
+    pool_size = pool_size or HTTP_POOL_SIZE
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+    retry = ThrottleRetry(
+        total=max_retries,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_FACTOR,
+        backoff_max=HTTP_BACKOFF_MAX,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "DELETE", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    retry.limiter = limiter
+    adapter = ThrottledAdapter(
+        limiter,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logger.debug(f"Создана HTTP-сессия: пул {pool_size}, повторов {max_retries}")
+    return session
+
+
+def get_session():
+    """
+    Возвращает общую для всего процесса HTTP-сессию, создавая её при первом обращении.
+
+    Returns:
+        requests.Session: Общая сессия.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(limiter=get_rate_limiter())
+        return _session
+
+
+def backoff_delay(attempt, retry_after=None, source="upload"):
+    """
+    Вычисляет задержку перед повтором запроса и учитывает повтор в метриках.
+
+    Args:
+        attempt (int): Номер повтора, начиная с 0.
+        retry_after (str): Значение заголовка `Retry-After` из ответа сервера, если есть.
+        source (str): Метка источника повтора в метрике retries_total
+            ("upload" или "download").
+
+    Returns:
+        float: Задержка в секундах.
+    """
+    get_metrics().inc("retries_total", source=source)
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_FACTOR * (2**attempt))
+    return delay + random.uniform(0, HTTP_BACKOFF_FACTOR)
+
+
+def iter_file_chunks(
+    f,
+    chunk_size,
+    total=None,
+    progress=None,
+    file_name=None,
+    hasher=None,
+    limit=None,
+    throttle=None,
+):
+    """
+    Читает открытый файл блоками фиксированного размера через один переиспользуемый буфер.
+
+    Генератор передаётся в `requests` как тело запроса, поэтому файл уходит на сервер
+    chunked-потоком и в памяти одновременно находится не больше одного блока.
+
+    Args:
+        f: Файл, открытый в бинарном режиме.
+        chunk_size (int): Размер блока в байтах.
+        total (int): Полный размер файла (для callback прогресса).
+        progress (callable): Необязательный callback `progress(file_name, sent, total, elapsed)`.
+        file_name (str): Имя файла, передаваемое в callback.
+        hasher: Необязательный объект `hashlib`, которым хэшируется отправляемое содержимое.
+        limit (int): Максимальное число байт, читаемых из файла (по умолчанию до конца).
+        throttle (callable): Необязательная функция `throttle(size)`, ожидающая
+            разрешения на отправку `size` байт; блок отдаётся частями по THROTTLE_SLICE
+            байт, чтобы скорость передачи была равномерной.
+
+    Yields:
+        memoryview: Очередной прочитанный блок файла.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    sent = 0
+    started = time.monotonic()
+    while limit is None or sent < limit:
+        if limit is None or limit - sent >= chunk_size:
+            size = f.readinto(buffer)
+        else:
+            size = f.readinto(view[: limit - sent])
+        if not size:
+            break
+        sent += size
+        if hasher is not None:
+            hasher.update(view[:size])
+        # Буфер перезаписывается только после того, как блок отправлен в сокет
+        if throttle is None:
+            yield view[:size]
+        else:
+            for start in range(0, size, THROTTLE_SLICE):
+                part = view[start : min(size, start + THROTTLE_SLICE)]
+                throttle(len(part))
+                yield part
+        if progress is not None:
+            progress(file_name, sent, total, time.monotonic() - started)
+
+
+def hash_file_range(f, hasher, start, end, chunk_size):
+    """
+    Дочитывает в хэш участок файла [start, end).
+
+    Args:
+        f: Файл, открытый в бинарном режиме.
+        hasher: Объект `hashlib`.
+        start (int): Начало участка в байтах.
+        end (int): Конец участка в байтах (не включительно).
+        chunk_size (int): Размер блока чтения в байтах.
+    """
+    if start >= end:
+        return
+    f.seek(start)
+    for chunk in iter_file_chunks(f, chunk_size, hasher=hasher, limit=end - start):
+        pass
+
+
+def range_end(value):
+    """
+    Разбирает заголовок `Range` ответа 308 на запрос возобновляемой загрузки.
+
+    Args:
+        value (str): Значение заголовка вида "bytes=0-1023" или None.
+
+    Returns:
+        int: Число принятых сервером байт.
+    """
+    if not value:
+        return 0
+    try:
+        return int(value.rpartition("-")[2]) + 1
+    except ValueError:
+        return 0
 
 
 class Connector:
-    def __init__(self):
+    def __init__(
+        self,
+        chunk_size=None,
+        session=None,
+        db=None,
+        limiter=None,
+        dir_path=None,
+        disk_path=None,
+    ):
         logger.debug("Инициализация Connector")
         self._headers = {
             "Content-Type": "application/json",
@@ -23,140 +352,1272 @@ class Connector:
             "Authorization": f"OAuth {API}",
         }
         self.url = URL
-        self.disk_path = DISK_PATH
-        self.file_path = DIR_PATH
+        self.disk_path = disk_path or DISK_PATH
+        self.file_path = dir_path or DIR_PATH
+        self.chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+        self.session = session or get_session()
+        self.limiter = limiter or get_rate_limiter()
+        self.timeout = HTTP_TIMEOUT
+        self.max_retries = HTTP_MAX_RETRIES
+        self.page_limit = INFO_PAGE_LIMIT
+        self.resume_threshold = UPLOAD_RESUME_THRESHOLD
+        self.segment_size = UPLOAD_SEGMENT_SIZE
+        self.href_ttl = UPLOAD_HREF_TTL
+        # Поддержка загрузки частями проверяется перед первой такой загрузкой
+        # (см. `resumable_supported`)
+        self.resumable = None
+        self.permanently = DELETE_PERMANENTLY
+        self.delete_workers = DELETE_WORKERS
+        self._db = db
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Директории, которые уже есть на диске ("" — DISK_PATH)
+        self._known_dirs = {""}
+        # Блокировки директорий, которые создаются сейчас (см. `_mkdir`)
+        self._dir_locks = {}
+        self._dirs_lock = threading.Lock()
         logger.debug(f"URL: {self.url}, Disk Path: {self.disk_path}")
 
-    def load(self, path_file, replace=False, f_path=None):
+    @property
+    def db(self):
+        """
+        База данных, в которой хранится состояние возобновляемых загрузок.
+        """
+        if self._db is None:
+            self._db = get_database()
+        return self._db
+
+    def load(self, path_file, replace=False, f_path=None, progress=None, digests=None):
         """
         Загружает файл на диск.
+
+        Файл отправляется потоком блоками по `self.chunk_size` байт, поэтому потребление
+        памяти не зависит от размера файла. После загрузки логируется скорость передачи.
+        Файлы от UPLOAD_RESUME_THRESHOLD байт загружаются частями с возобновлением
+        после сбоя (см. `_load_resumable`).
+
+        Args:
+            path_file (str): Полный путь к локальному файлу.
+            replace (bool): Перезаписать файл на диске, если он уже существует.
+            f_path (str): Путь файла на диске относительно DISK_PATH.
+            progress (callable): Необязательный callback `progress(file_name, sent, total, elapsed)`.
+            digests (dict): Необязательный словарь, в который после успешной загрузки
+                записывается MD5 отправленного содержимого {f_path: хэш}.
+
+        Returns:
+            bool: True, если файл успешно загружен, иначе False.
         """
-        file_name = (
-            os.path.basename(f_path) if f_path else "unknown_file_name"
-        )  # Если f_path == None
-        logger.info(f"Попытка загрузки файла: {file_name}, Replace: {replace}")
+        file_name = f_path if f_path else "unknown_file_name"  # Если f_path == None
+        logger.debug("Попытка загрузки файла: {}, Replace: {}", file_name, replace)
+        if not self.ensure_parent(file_name):
+            return False
+
+        if self.resumable is not False and self.resume_threshold:
+            try:
+                size = os.path.getsize(path_file)
+            except OSError:
+                size = 0
+            if size >= self.resume_threshold and self.resumable_supported():
+                result = self._load_resumable(
+                    path_file, file_name, replace, progress, digests, f_path
+                )
+                if result is not None:
+                    return result
+                # Часть файла могла быть сохранена как целый файл, поэтому перезапись
+                replace = True
+
+        href = self._upload_href(file_name, replace)
+        if href is None:
+            return False
+
+        logger.debug("Путь к файлу для загрузки: {}", path_file)
+        try:
+            with open(path_file, "rb") as f:
+                total = os.fstat(f.fileno()).st_size
+                started = time.monotonic()
+                response, digest = self._put_file(href, f, total, progress, file_name)
+                elapsed = time.monotonic() - started
+
+                # Проверяем статус код ответа при загрузке файла
+                if response.status_code >= 400:  # 4xx и 5xx коды считаем ошибками
+                    logger.error(
+                        f"Ошибка при загрузке файла. Status Code: {response.status_code}, Response: {response.text}"
+                    )
+                    response.raise_for_status()  # Вызываем исключение для обработки
 
+                if digests is not None:
+                    digests[f_path] = digest
+                speed = total / elapsed if elapsed > 0 else 0
+                log_sampled(
+                    "Файл успешно загружен",
+                    "Файл {} успешно загружен.  Status Code: {}, "
+                    "{} байт за {:.2f} с ({:.2f} МБ/с)",
+                    file_name,
+                    response.status_code,
+                    total,
+                    elapsed,
+                    speed / 1024 / 1024,
+                )  # Логируем status code и скорость загрузки
+                return True
+
+        except FileNotFoundError:
+            logger.error(f"Файл по пути {path_file} не найден")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Ошибка при загрузке файла: {e}")
+        except Exception as e:
+            logger.exception(
+                f"Неожиданная ошибка при загрузке файла: {e}"
+            )  # Логируем все остальные исключения с трассировкой стека
+        return False
+
+    def _upload_href(self, file_name, replace):
+        """
+        Запрашивает у API ссылку для загрузки файла.
+
+        Args:
+            file_name (str): Имя файла на диске.
+            replace (bool): Перезаписать файл на диске, если он уже существует.
+
+        Returns:
+            str: Ссылка для загрузки или None, если получить её не удалось.
+        """
         try:
-            upload_url = f"{self.url}/upload?path={self.disk_path + '/' + file_name}&overwrite={replace}"
-            logger.debug(f"URL запроса: {upload_url}")
-            resp = requests.request("GET", upload_url, headers=self._headers)
+            params = {
+                "path": f"{self.disk_path}/{file_name}",
+                "overwrite": str(replace).lower(),
+            }
+            logger.debug("Параметры запроса на загрузку: {}", params)
+            resp = self.session.get(
+                f"{self.url}/upload",
+                headers=self._headers,
+                params=params,
+                timeout=self.timeout,
+            )
 
             # Проверяем статус код ответа
             if resp.status_code != 200:
                 logger.error(
                     f"Ошибка при запросе на загрузку. Status Code: {resp.status_code}, Response: {resp.text}"
                 )
-                return
+                if resp.status_code == 409:
+                    # Директорию могли удалить с диска: при повторе она будет создана
+                    self.forget_dirs([parent_path(file_name)])
+                return None
 
             resp_json = resp.json()
-            logger.debug(f"Ответ от сервера при запросе на загрузку: {resp_json}")
+            logger.debug("Ответ от сервера при запросе на загрузку: {}", resp_json)
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Ошибка при запросе к серверу: {e}")
-            return  # Или выбросьте исключение, в зависимости от вашей логики
-
-        if resp_json:
-            if "href" in resp_json:
-                logger.debug(f"Путь к файлу для загрузки: {path_file}")
-                try:
-                    with open(path_file, "rb") as f:
-                        response = requests.put(resp_json["href"], files={"file": f})
-
-                        # Проверяем статус код ответа при загрузке файла
-                        if (
-                            response.status_code >= 400
-                        ):  # 4xx и 5xx коды считаем ошибками
-                            logger.error(
-                                f"Ошибка при загрузке файла. Status Code: {response.status_code}, Response: {response.text}"
-                            )
-                            response.raise_for_status()  # Вызываем исключение для обработки
-
-                        logger.info(
-                            f"Файл {file_name} успешно загружен.  Status Code: {response.status_code}"
-                        )  # Логируем status code
-
-                except FileNotFoundError:
-                    logger.error(f"Файл по пути {path_file} не найден")
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"Ошибка при загрузке файла: {e}")
-                except Exception as e:
-                    logger.exception(
-                        f"Неожиданная ошибка при загрузке файла: {e}"
-                    )  # Логируем все остальные исключения с трассировкой стека
-            else:
-                logger.warning(f"Ключ 'href' отсутствует в ответе сервера: {resp_json}")
-        else:
+            return None
+
+        if not resp_json:
             logger.warning("Не получен ответ от сервера при подготовке к загрузке.")
+            return None
+        if "href" not in resp_json:
+            logger.warning(f"Ключ 'href' отсутствует в ответе сервера: {resp_json}")
+            return None
+        return resp_json["href"]
 
-    def reload(self, path_file, f_path=None):
+    def _load_resumable(self, path_file, file_name, replace, progress, digests, f_path):
         """
-        Перезагружает файл, устанавливая replace в True.
+        Загружает файл частями с сохранением состояния загрузки в базе данных.
+
+        Ссылка для загрузки и подтверждённое сервером смещение записываются в таблицу
+        uploads после каждой части. Если загрузка прервалась (обрыв связи, перезапуск
+        процесса), следующая попытка запрашивает у сервера принятое смещение и
+        продолжает с него, пока ссылка действительна. Если ссылка истекла или файл
+        изменился, загрузка начинается заново с новой ссылкой.
+
+        Returns:
+            bool: True, если файл загружен, False при ошибке (состояние загрузки
+                сохраняется для следующей попытки) и None, если сервер не поддерживает
+                загрузку частями или отклонил часть этого файла.
+        """
+        try:
+            f = open(path_file, "rb")
+        except FileNotFoundError:
+            logger.error(f"Файл по пути {path_file} не найден")
+            return False
+
+        with f:
+            st = os.fstat(f.fileno())
+            with self.db.transaction():
+                state = self.db.upload_get(file_name)
+            try:
+                for _ in range(2):
+                    state = self._resume_state(state, file_name, replace, st)
+                    if state is None:
+                        return False
+                    started = time.monotonic()
+                    outcome, digest = self._put_segments(f, state, progress)
+                    if outcome != "expired":
+                        break
+                    # Ссылка перестала действовать во время загрузки
+                    logger.info(
+                        f"Ссылка для загрузки файла {file_name} больше не действует, "
+                        f"загрузка начинается заново"
+                    )
+                    self._forget_upload(file_name)
+                    state = None
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Ошибка при загрузке файла {file_name}: {e}")
+                return False
+            except Exception as e:
+                logger.exception(f"Неожиданная ошибка при загрузке файла: {e}")
+                return False
+
+        if outcome == "unsupported":
+            self._forget_upload(file_name)
+            self._save_resumable(False)
+            return None
+        if outcome == "rejected":
+            self._forget_upload(file_name)
+            logger.warning(f"Файл {file_name} загружается целиком")
+            return None
+        if outcome != "done":
+            return False
+
+        self._forget_upload(file_name)
+        if digests is not None:
+            digests[f_path] = digest
+        elapsed = time.monotonic() - started
+        sent = st.st_size - state.offset
+        speed = sent / elapsed if elapsed > 0 else 0
+        logger.info(
+            f"Файл {file_name} успешно загружен частями, {sent} байт из {st.st_size} "
+            f"за {elapsed:.2f} с ({speed / 1024 / 1024:.2f} МБ/с)"
+        )
+        return True
+
+    def _resume_state(self, state, file_name, replace, st):
+        """
+        Определяет, с какого места продолжить загрузку файла.
+
+        Сохранённая загрузка продолжается, если файл не изменился, а ссылка
+        ещё действует и сервер подтвердил принятое смещение; иначе запрашивается
+        новая ссылка и загрузка начинается с нуля.
+
+        Args:
+            state (UploadState): Сохранённое состояние загрузки или None.
+            file_name (str): Имя файла на диске.
+            replace (bool): Перезаписать файл на диске, если он уже существует.
+            st (os.stat_result): Текущее состояние локального файла.
+
+        Returns:
+            UploadState: Состояние, с которого начинается отправка, или None,
+                если ссылку для загрузки получить не удалось.
+        """
+        if state is not None:
+            if (state.size, state.mtime_ns) != (st.st_size, st.st_mtime_ns):
+                logger.info(
+                    f"Файл {file_name} изменился после начала загрузки, "
+                    f"загрузка начинается заново"
+                )
+            elif state.expires_at <= time.time():
+                logger.info(
+                    f"Ссылка для загрузки файла {file_name} истекла, "
+                    f"загрузка начинается заново"
+                )
+            else:
+                offset = self._confirmed_offset(state.href, state.size)
+                if offset is not None:
+                    logger.info(
+                        f"Возобновление загрузки файла {file_name} "
+                        f"с {offset} из {state.size} байт"
+                    )
+                    return state._replace(offset=offset)
+                logger.info(
+                    f"Ссылка для загрузки файла {file_name} больше не действует, "
+                    f"загрузка начинается заново"
+                )
+
+        href = self._upload_href(file_name, replace)
+        if href is None:
+            return None
+        state = UploadState(
+            file_name,
+            href,
+            time.time() + self.href_ttl,
+            st.st_size,
+            st.st_mtime_ns,
+            0,
+        )
+        with self.db.transaction():
+            self.db.upload_save(state)
+        return state
+
+    def _forget_upload(self, file_name):
+        """
+        Удаляет сохранённое состояние загрузки файла.
+        """
+        with self.db.transaction():
+            self.db.upload_delete(file_name)
+
+    def _confirmed_offset(self, href, total):
+        """
+        Запрашивает у сервера, сколько байт загрузки уже принято.
+
+        Отправляет пустой PUT с заголовком `Content-Range: bytes */total`; сервер
+        отвечает 308 с заголовком `Range` для незавершённой загрузки и 2xx для
+        завершённой.
+
+        Args:
+            href (str): Ссылка для загрузки.
+            total (int): Полный размер файла в байтах.
+
+        Returns:
+            int: Число принятых байт или None, если ссылка больше не действует.
+
+        Raises:
+            requests.exceptions.RequestException: Если сервер недоступен.
+        """
+        response = self.session.put(
+            href,
+            data=b"",
+            headers={"Content-Range": f"bytes */{total}"},
+            timeout=self.timeout,
+        )
+        if response.status_code == 308:
+            return range_end(response.headers.get("Range"))
+        if response.status_code in (200, 201):
+            return total
+        logger.debug(
+            "Сервер не подтвердил смещение загрузки. Status Code: {}",
+            response.status_code,
+        )
+        return None
+
+    def resumable_supported(self):
+        """
+        Проверяет, поддерживает ли сервер загрузку частями.
+
+        Результат проверки сохраняется в таблице meta и общий для всех Connector
+        процесса с тем же URL API, поэтому проверка выполняется один раз.
+
+        Returns:
+            bool: True, если поддерживает, False, если нет, и None, если проверить
+                не удалось (проверка повторится перед следующей загрузкой).
+        """
+        if self.resumable is not None:
+            return self.resumable
+        with _resumable_lock:
+            supported = _resumable_support.get(self.url)
+            if supported is None:
+                with self.db.transaction():
+                    stored = self.db.get_meta(RESUMABLE_META_KEY)
+                supported = self._probe_resumable() if stored is None else stored == "1"
+            if supported is not None:
+                self._save_resumable(supported)
+        return supported
+
+    def _save_resumable(self, supported):
         """
-        logger.info(f"Перезагрузка файла: {f_path}")
-        self.load(path_file=path_file, replace=True, f_path=f_path)
+        Запоминает, поддерживает ли сервер загрузку частями.
 
-    def delete(self, f_path):
+        Args:
+            supported (bool): Результат проверки.
         """
-        Удаляет файл.
+        if not supported and self.resumable is not False:
+            logger.warning(
+                "Сервер не поддерживает загрузку частями, файлы загружаются целиком"
+            )
+        self.resumable = supported
+        _resumable_support[self.url] = supported
+        with self.db.transaction():
+            self.db.set_meta(RESUMABLE_META_KEY, int(supported))
+
+    def _probe_resumable(self):
         """
-        logger.info(f"Попытка удаления файла: {f_path}")
+        Проверяет поддержку загрузки частями на временном файле, до отправки данных.
 
-        params = {"path": DISK_PATH + f"/{f_path}"}
+        Ссылка запрашивается для нового файла со случайным именем без перезаписи,
+        поэтому проверка не затрагивает файлы на диске. По ссылке отправляется пустой
+        PUT с заголовком `Content-Range: bytes */1`: сервер, поддерживающий загрузку
+        частями, отвечает 308. Ответ 2xx означает, что заголовок проигнорирован
+        и сохранён пустой файл; он сразу удаляется.
 
+        Returns:
+            bool: True, если поддерживает, False, если нет, и None, если сервер
+                не ответил определённо.
+        """
+        name = f"{PROBE_PREFIX}{uuid.uuid4().hex}"
+        href = self._upload_href(name, False)
+        if href is None:
+            return None
         try:
-            response = requests.delete(self.url, headers=self._headers, params=params)
-            response.raise_for_status()  # Проверка на ошибки HTTP
-            if response.status_code == 204:
-                logger.info(f"Файл {f_path} успешно удален.")
-                return True, "Файл успешно удален."
+            response = self.session.put(
+                href,
+                data=b"",
+                headers={"Content-Range": "bytes */1"},
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Поддержка загрузки частями не проверена: {e}")
+            return None
+        status = response.status_code
+        if status == 308:
+            logger.info("Сервер поддерживает загрузку частями")
+            return True
+        if 200 <= status < 300:
+            self.delete(name, permanently=True)
+            return False
+        if status in RESUMABLE_REJECT_STATUSES:
+            return False
+        logger.warning(
+            f"Поддержка загрузки частями не проверена. Status Code: {status}, "
+            f"Response: {response.text}"
+        )
+        return None
+
+    def _put_segments(self, f, state, progress=None):
+        """
+        Отправляет файл частями по `self.segment_size` байт, начиная с `state.offset`.
+
+        Каждая часть отправляется PUT-запросом с заголовком `Content-Range`, после
+        подтверждения части сервером смещение сохраняется в базе данных. При обрыве
+        соединения, ответе 5xx/429 или ответе 308 без продвижения смещения после
+        задержки принятое смещение запрашивается у сервера и отправка продолжается
+        с него.
+
+        MD5 всего файла считается по ходу отправки; уже принятая сервером часть
+        файла при возобновлении дочитывается локально.
+
+        Args:
+            f: Файл, открытый в бинарном режиме.
+            state (UploadState): Состояние загрузки.
+            progress (callable): Необязательный callback прогресса.
+
+        Returns:
+            tuple: (str, str) — результат ("done", "failed", "expired", "unsupported"
+                или "rejected", если сервер отклонил часть файла) и MD5 файла
+                для результата "done".
+        """
+        total = state.size
+        offset = state.offset
+        hasher = hashlib.md5()
+        hashed = 0
+        failures = 0
+
+        while offset < total:
+            if offset < hashed:
+                # Сервер подтвердил меньше, чем уже посчитано: MD5 считается заново
+                hasher, hashed = hashlib.md5(), 0
+            hash_file_range(f, hasher, hashed, offset, self.chunk_size)
+            hashed = offset
+            end = min(offset + self.segment_size, total)
+            segment_hasher = hasher.copy()
+            segment_progress = None
+            if progress is not None:
+
+                def segment_progress(name, sent, size, elapsed, start=offset):
+                    progress(name, start + sent, size, elapsed)
+
+            f.seek(offset)
+            try:
+                response = self.session.put(
+                    state.href,
+                    data=iter_file_chunks(
+                        f,
+                        self.chunk_size,
+                        total,
+                        segment_progress,
+                        state.name,
+                        segment_hasher,
+                        end - offset,
+                        self._before_send,
+                    ),
+                    headers={"Content-Range": f"bytes {offset}-{end - 1}/{total}"},
+                    timeout=(self.timeout, None),
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                response = None
+                reason = str(e)
             else:
+                reason = f"Status Code: {response.status_code}"
+
+            if response is not None:
+                status = response.status_code
+                if 200 <= status < 300:
+                    if end < total:
+                        # Сервер принял часть как целый файл
+                        return "unsupported", None
+                    return "done", segment_hasher.hexdigest()
+                if status == 308:
+                    confirmed = range_end(response.headers.get("Range"))
+                    if confirmed == end:
+                        hasher, hashed = segment_hasher, end
+                    progressed = confirmed > offset
+                    offset = confirmed
+                    with self.db.transaction():
+                        self.db.upload_save(state._replace(offset=offset))
+                    if progressed:
+                        failures = 0
+                        continue
+                    # Сервер не принял ни одного байта части: повтор с задержкой
+                    reason = f"сервер подтвердил {confirmed} из {total} байт"
+                elif status in (404, 410):
+                    return "expired", None
+                elif status != 416 and status not in RETRY_STATUSES:
+                    # Ответ 416 означает расхождение смещения: оно запрашивается
+                    # у сервера заново
+                    logger.warning(
+                        f"Сервер отклонил часть файла {state.name}. {reason}, "
+                        f"Response: {response.text}"
+                    )
+                    return "rejected", None
+
+            failures += 1
+            if failures > self.max_retries:
+                logger.error(
+                    f"Загрузка файла {state.name} прервана на {offset} из {total} байт: "
+                    f"{reason}. Загрузка продолжится в следующей попытке"
+                )
+                return "failed", None
+            delay = backoff_delay(
+                failures - 1,
+                response.headers.get("Retry-After") if response is not None else None,
+            )
+            logger.warning(
+                f"Сбой при загрузке части файла {state.name}: {reason}. "
+                f"Повтор через {delay:.1f} с"
+            )
+            time.sleep(delay)
+            confirmed = self._confirmed_offset(state.href, total)
+            if confirmed is None:
+                return "expired", None
+            offset = confirmed
+
+        # Сервер уже принял весь файл до возобновления
+        hash_file_range(f, hasher, hashed, total, self.chunk_size)
+        return "done", hasher.hexdigest()
+
+    def _before_send(self, size):
+        """
+        Ожидает разрешения ограничителя на отправку блока файла и учитывает
+        отправленные байты в метриках.
+
+        Args:
+            size (int): Размер блока в байтах.
+        """
+        self.limiter.before_upload(size)
+        get_metrics().inc("upload_bytes_total", size)
+
+    def _put_file(self, href, f, total, progress=None, file_name=None):
+        """
+        Отправляет открытый файл по ссылке загрузки, повторяя попытку при сбоях.
+
+        При обрыве соединения или ответе 5xx/429 файл перематывается в начало и
+        отправляется заново после задержки с экспоненциальным ростом. MD5 содержимого
+        считается по ходу отправки, без отдельного чтения файла.
+
+        Args:
+            href (str): Ссылка для загрузки, полученная от API.
+            f: Файл, открытый в бинарном режиме.
+            total (int): Размер файла в байтах.
+            progress (callable): Необязательный callback прогресса.
+            file_name (str): Имя файла для логов.
+
+        Returns:
+            tuple: (requests.Response, str) — ответ сервера на последнюю попытку
+                и MD5 отправленного в ней содержимого.
+        """
+        for attempt in range(self.max_retries + 1):
+            f.seek(0)
+            hasher = hashlib.md5()
+            try:
+                response = self.session.put(
+                    href,
+                    data=iter_file_chunks(
+                        f,
+                        self.chunk_size,
+                        total,
+                        progress,
+                        file_name,
+                        hasher,
+                        throttle=self._before_send,
+                    ),
+                    # Сервер может долго обрабатывать большой файл после приёма тела
+                    timeout=(self.timeout, None),
+                )
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
                 logger.warning(
-                    f"Неожиданный статус код {response.status_code} при удалении файла."
+                    f"Сбой соединения при загрузке файла {file_name}: {e}. "
+                    f"Повтор через {delay:.1f} с"
                 )
-                return (
-                    False,
-                    f"Неожиданный статус код {response.status_code} при удалении файла.",
+                time.sleep(delay)
+                continue
+
+            if (
+                response.status_code not in RETRY_STATUSES
+                or attempt == self.max_retries
+            ):
+                return response, hasher.hexdigest()
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(
+                f"Сервер ответил {response.status_code} при загрузке файла {file_name}. "
+                f"Повтор через {delay:.1f} с"
+            )
+            time.sleep(delay)
+
+    def reload(self, path_file, f_path=None, digests=None):
+        """
+        Перезагружает файл, устанавливая replace в True.
+
+        Returns:
+            bool: True, если файл успешно загружен, иначе False.
+        """
+        logger.debug("Перезагрузка файла: {}", f_path)
+        return self.load(
+            path_file=path_file, replace=True, f_path=f_path, digests=digests
+        )
+
+    def download_href(self, name):
+        """
+        Запрашивает у API ссылку для скачивания файла.
+
+        Args:
+            name (str): Путь файла на диске относительно DISK_PATH.
+
+        Returns:
+            str: Ссылка для скачивания или None, если получить её не удалось.
+        """
+        try:
+            response = self.session.get(
+                f"{self.url}/download",
+                params={"path": f"{self.disk_path}/{name}"},
+                headers=self._headers,
+                timeout=self.timeout,
+            )
+            if response.status_code != 200:
+                logger.error(
+                    f"Ошибка при запросе ссылки на скачивание файла {name}. "
+                    f"Status Code: {response.status_code}, Response: {response.text}"
+                )
+                return None
+            href = response.json().get("href")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Ошибка при запросе ссылки на скачивание файла {name}: {e}")
+            return None
+        if not href:
+            logger.warning(f"Ключ 'href' отсутствует в ответе сервера для файла {name}")
+        return href
+
+    def download(self, name, fd, start, end, hashers=()):
+        """
+        Скачивает участок файла на диске и записывает его в открытый файл по тому же
+        смещению.
+
+        Участок запрашивается с заголовком `Range`, ответ читается потоком блоками
+        по DOWNLOAD_CHUNK_SIZE байт и записывается `os.pwrite`, поэтому участки одного
+        файла можно скачивать параллельно в заранее выделенный файл. При обрыве
+        соединения скачивание продолжается с места обрыва после задержки; повторы
+        ответов 5xx и 429 выполняет сессия. Если ссылка на скачивание устарела,
+        она запрашивается заново.
+
+        Args:
+            name (str): Путь файла на диске относительно DISK_PATH.
+            fd (int): Дескриптор файла, открытого на запись.
+            start (int): Начало участка в байтах.
+            end (int): Конец участка в байтах (включительно).
+            hashers (tuple): Объекты `hashlib`, которыми по порядку хэшируется
+                содержимое участка.
+
+        Returns:
+            tuple: (bool, str) — успешно ли скачан участок и описание результата.
+        """
+        metrics = get_metrics()
+        offset = start
+        href = None
+        for attempt in range(self.max_retries + 1):
+            if href is None:
+                href = self.download_href(name)
+                if href is None:
+                    return False, "ссылка на скачивание не получена"
+            try:
+                with self.session.get(
+                    href,
+                    headers={"Range": f"bytes={offset}-{end}"},
+                    stream=True,
+                    timeout=self.timeout,
+                ) as response:
+                    if response.status_code in EXPIRED_HREF_STATUSES:
+                        logger.debug(
+                            "Ссылка на скачивание файла {} устарела: {}",
+                            name,
+                            response.status_code,
+                        )
+                        href = None
+                        continue
+                    # Сервер без поддержки Range отдаёт файл целиком с начала
+                    if response.status_code != 206 and not (
+                        response.status_code == 200 and offset == 0
+                    ):
+                        return False, (
+                            f"ошибка скачивания, Status Code: {response.status_code}"
+                        )
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        chunk = chunk[: end + 1 - offset]
+                        if not chunk:
+                            break
+                        os.pwrite(fd, chunk, offset)
+                        for hasher in hashers:
+                            hasher.update(chunk)
+                        offset += len(chunk)
+                        metrics.inc("download_bytes_total", len(chunk))
+                if offset > end:
+                    return True, "скачан"
+                error = "ответ завершился раньше конца участка"
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = f"сбой соединения: {e}"
+            if attempt == self.max_retries:
+                return False, error
+            delay = backoff_delay(attempt, source="download")
+            logger.warning(
+                f"Скачивание файла {name} прервано на байте {offset} ({error}). "
+                f"Повтор через {delay:.1f} с"
+            )
+            time.sleep(delay)
+        return False, "ссылка на скачивание устарела"
+
+    def move(self, from_name, to_name, overwrite=True):
+        """
+        Перемещает (переименовывает) файл на диске на стороне сервера.
+
+        Содержимое файла не передаётся, поэтому переименование файла любого размера
+        стоит одного запроса.
+
+        Args:
+            from_name (str): Текущее имя файла на диске.
+            to_name (str): Новое имя файла на диске.
+            overwrite (bool): Перезаписать файл с новым именем, если он уже существует.
+
+        Returns:
+            tuple: (bool, str) — успешно ли выполнено перемещение и описание результата.
+        """
+        logger.debug("Перемещение файла на диске: {} -> {}", from_name, to_name)
+        if not self.ensure_parent(to_name):
+            return False, "Не удалось создать директорию на диске."
+        params = {
+            "from": f"{self.disk_path}/{from_name}",
+            "path": f"{self.disk_path}/{to_name}",
+            "overwrite": str(overwrite).lower(),
+        }
+
+        try:
+            response = self.session.post(
+                f"{self.url}/move",
+                headers=self._headers,
+                params=params,
+                timeout=self.timeout,
+            )
+            if response.status_code == 201:
+                log_sampled(
+                    "Файл перемещён", "Файл {} перемещён в {}.", from_name, to_name
+                )
+                return True, "Файл успешно перемещён."
+            if response.status_code == 202:
+                return self.wait_operation(response.json()["href"])
+            logger.error(
+                f"Ошибка при перемещении файла {from_name}. Status Code: {response.status_code}, "
+                f"Response: {response.text}"
+            )
+            return False, f"Ошибка при перемещении файла: {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Ошибка при перемещении файла {from_name}: {e}")
+            return False, f"Ошибка при перемещении файла: {e}"
+
+    def copy(self, from_name, to_name, overwrite=True):
+        """
+        Копирует файл на диске на стороне сервера.
+
+        Используется для файлов, содержимое которых уже есть на диске под другим именем:
+        вместо загрузки выполняется один запрос.
+
+        Args:
+            from_name (str): Имя файла-источника на диске.
+            to_name (str): Имя копии на диске.
+            overwrite (bool): Перезаписать файл с именем копии, если он уже существует.
+
+        Returns:
+            tuple: (bool, str) — успешно ли выполнено копирование и описание результата.
+        """
+        logger.debug("Копирование файла на диске: {} -> {}", from_name, to_name)
+        if not self.ensure_parent(to_name):
+            return False, "Не удалось создать директорию на диске."
+        params = {
+            "from": f"{self.disk_path}/{from_name}",
+            "path": f"{self.disk_path}/{to_name}",
+            "overwrite": str(overwrite).lower(),
+        }
+
+        try:
+            response = self.session.post(
+                f"{self.url}/copy",
+                headers=self._headers,
+                params=params,
+                timeout=self.timeout,
+            )
+            if response.status_code == 201:
+                log_sampled(
+                    "Файл скопирован", "Файл {} скопирован в {}.", from_name, to_name
                 )
+                return True, "Файл успешно скопирован."
+            if response.status_code == 202:
+                return self.wait_operation(response.json()["href"])
+            logger.error(
+                f"Ошибка при копировании файла {from_name}. Status Code: {response.status_code}, "
+                f"Response: {response.text}"
+            )
+            return False, f"Ошибка при копировании файла: {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Ошибка при копировании файла {from_name}: {e}")
+            return False, f"Ошибка при копировании файла: {e}"
+
+    def _map(self, func, items):
+        """
+        Выполняет короткие запросы к API параллельно в пуле из `self.delete_workers`
+        потоков.
+
+        Задачи пула не должны сами ставить задачи в пул.
+
+        Args:
+            func (callable): Функция одного аргумента.
+            items (list): Аргументы.
+
+        Returns:
+            list: Результаты в порядке аргументов.
+        """
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.delete_workers, thread_name_prefix="api"
+                )
+        return list(self._pool.map(func, items))
+
+    def _operation_status(self, href):
+        """
+        Запрашивает статус асинхронной операции на диске.
+
+        Args:
+            href (str): Ссылка на статус операции из ответа 202.
+
+        Returns:
+            tuple: (статус, ошибка) — "success", "failed" или "in-progress" и None,
+                либо None и описание ошибки запроса.
+        """
+        try:
+            response = self.session.get(
+                href, headers=self._headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json().get("status"), None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Ошибка при запросе статуса операции {href}: {e}")
+            return None, e
+
+    def wait_operations(self, hrefs, timeout=None):
+        """
+        Ожидает завершения нескольких асинхронных операций на диске.
+
+        Статусы всех незавершённых операций запрашиваются параллельно одним пакетом,
+        пакеты повторяются с растущей задержкой, пока операции не завершатся.
+
+        Args:
+            hrefs (dict): Словарь {ключ: ссылка на статус операции из ответа 202}.
+            timeout (float): Максимальное время ожидания (по умолчанию OPERATION_TIMEOUT).
+
+        Returns:
+            dict: Словарь {ключ: (bool, str)} — успешно ли завершилась операция и её статус.
+        """
+        deadline = time.monotonic() + (timeout or OPERATION_TIMEOUT)
+        delay = 0.5
+        pending = dict(hrefs)
+        results = {}
+        while pending:
+            keys = list(pending)
+            statuses = self._map(self._operation_status, [pending[key] for key in keys])
+            for key, (status, error) in zip(keys, statuses):
+                if error is not None:
+                    results[key] = (
+                        False,
+                        f"Ошибка при запросе статуса операции: {error}",
+                    )
+                elif status == "success":
+                    results[key] = (True, "Операция выполнена.")
+                elif status == "failed":
+                    logger.error(
+                        f"Операция на диске завершилась ошибкой: {pending[key]}"
+                    )
+                    results[key] = (False, "Операция завершилась ошибкой.")
+                else:
+                    continue
+                del pending[key]
+            if not pending:
+                break
+            if time.monotonic() + delay > deadline:
+                for key, href in pending.items():
+                    logger.warning(f"Операция на диске не завершилась вовремя: {href}")
+                    results[key] = (False, "Превышено время ожидания операции.")
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+        return results
+
+    def wait_operation(self, href, timeout=None):
+        """
+        Ожидает завершения асинхронной операции на диске.
+
+        Args:
+            href (str): Ссылка на статус операции из ответа 202.
+            timeout (float): Максимальное время ожидания (по умолчанию OPERATION_TIMEOUT).
+
+        Returns:
+            tuple: (bool, str) — успешно ли завершилась операция и её статус.
+        """
+        return self.wait_operations({href: href}, timeout)[href]
+
+    def _send_delete(self, f_path, permanently=None):
+        """
+        Отправляет запрос на удаление файла или директории, не дожидаясь асинхронной
+        операции.
+
+        Args:
+            f_path (str): Путь на диске относительно DISK_PATH.
+            permanently (bool): Удалить, минуя корзину (по умолчанию DELETE_PERMANENTLY).
+
+        Returns:
+            tuple: (bool, str, str) — успешно ли выполнено удаление, описание результата
+                и ссылка на статус асинхронной операции (тогда результат ещё неизвестен).
+        """
+        logger.debug("Попытка удаления файла: {}", f_path)
+        permanently = self.permanently if permanently is None else permanently
+        params = {
+            "path": f"{self.disk_path}/{f_path}",
+            "permanently": str(permanently).lower(),
+        }
+
+        try:
+            response = self.session.delete(
+                self.url, headers=self._headers, params=params, timeout=self.timeout
+            )
+            if response.status_code == 404:
+                # Файла уже нет на диске (например, удаление прошло в предыдущей попытке)
+                log_sampled(
+                    "Файл уже отсутствует на диске",
+                    "Файл {} уже отсутствует на диске.",
+                    f_path,
+                )
+                self.forget_dirs([f_path])
+                return True, "Файл уже отсутствует на диске.", None
+            response.raise_for_status()  # Проверка на ошибки HTTP
+            if response.status_code == 204:
+                log_sampled("Файл успешно удален", "Файл {} успешно удален.", f_path)
+                self.forget_dirs([f_path])
+                return True, "Файл успешно удален.", None
+            if response.status_code == 202:
+                # Директория и большие файлы удаляются асинхронно
+                return False, "", response.json()["href"]
+            logger.warning(
+                f"Неожиданный статус код {response.status_code} при удалении файла."
+            )
+            return (
+                False,
+                f"Неожиданный статус код {response.status_code} при удалении файла.",
+                None,
+            )
         except requests.exceptions.RequestException as e:
             logger.error(f"Ошибка при удалении файла {f_path}: {e}")
-            return False, f"Ошибка при удалении файла: {e}"
+            return False, f"Ошибка при удалении файла: {e}", None
         except Exception as e:
             logger.exception(f"Неожиданная ошибка при удалении файла {f_path}: {e}")
-            return False, f"Неожиданная ошибка при удалении файла: {e}"
+            return False, f"Неожиданная ошибка при удалении файла: {e}", None
+
+    def delete(self, f_path, permanently=None):
+        """
+        Удаляет файл или директорию вместе с содержимым.
+
+        Args:
+            f_path (str): Путь на диске относительно DISK_PATH.
+            permanently (bool): Удалить, минуя корзину (по умолчанию DELETE_PERMANENTLY).
+
+        Returns:
+            tuple: (bool, str) — успешно ли выполнено удаление и описание результата.
+        """
+        return self.delete_many([f_path], permanently)[f_path]
+
+    def delete_many(self, names, permanently=None):
+        """
+        Удаляет несколько файлов и директорий.
+
+        Запросы на удаление отправляются параллельно; асинхронные операции, которые
+        API возвращает для директорий и больших файлов (ответ 202), ожидаются
+        одним пакетом (см. `wait_operations`).
 
-    def info(self):
+        Args:
+            names (iterable): Пути на диске относительно DISK_PATH.
+            permanently (bool): Удалить, минуя корзину (по умолчанию DELETE_PERMANENTLY).
+
+        Returns:
+            dict: Словарь {путь: (bool, str)} — успешно ли выполнено удаление
+                и описание результата.
+        """
+        names = list(names)
+        results = {}
+        pending = {}
+        sent = self._map(lambda name: self._send_delete(name, permanently), names)
+        for name, (ok, message, href) in zip(names, sent):
+            if href is None:
+                results[name] = (ok, message)
+            else:
+                pending[name] = href
+        if pending:
+            logger.info(f"Ожидание завершения асинхронных удалений: {len(pending)}")
+            for name, (ok, message) in self.wait_operations(pending).items():
+                if ok:
+                    log_sampled("Файл успешно удален", "Файл {} успешно удален.", name)
+                    self.forget_dirs([name])
+                results[name] = (ok, message)
+        return results
+
+    def remember_dirs(self, names):
+        """
+        Запоминает директории, которые есть на диске, чтобы не создавать их повторно.
+
+        Args:
+            names (iterable): Пути директорий относительно DISK_PATH.
         """
-        Получает информацию о файлах в указанной директории.
+        with self._dirs_lock:
+            self._known_dirs.update(names)
+
+    def forget_dirs(self, names):
         """
-        logger.info(f"Запрос информации о файлах в директории: {DISK_PATH}")
-        info = {}
-        params = {"path": DISK_PATH}
+        Забывает директории, удалённые с диска, вместе с их поддиректориями.
 
+        Args:
+            names (iterable): Пути относительно DISK_PATH.
+        """
+        with self._dirs_lock:
+            for name in names:
+                if not name:
+                    continue
+                prefix = f"{name}/"
+                self._known_dirs = {
+                    path
+                    for path in self._known_dirs
+                    if path != name and not path.startswith(prefix)
+                }
+
+    def mkdir(self, name):
+        """
+        Создаёт директорию на диске вместе с недостающими родительскими директориями.
+
+        Args:
+            name (str): Путь директории относительно DISK_PATH.
+
+        Returns:
+            tuple: (bool, str) — есть ли директория на диске и описание результата.
+        """
+        return self._mkdir(name, recheck=False)
+
+    def _mkdir(self, name, recheck):
+        """
+        Создаёт директорию на диске; параллельные запросы на создание одной
+        директории выполняются по очереди.
+
+        Запрос, который дождался создания директории другим потоком, не повторяется,
+        поэтому параллельные загрузки в новую директорию создают её одним запросом.
+
+        Args:
+            name (str): Путь директории относительно DISK_PATH.
+            recheck (bool): Не создавать директорию, если она уже известна.
+
+        Returns:
+            tuple: (bool, str) — есть ли директория на диске и описание результата.
+        """
+        with self._dirs_lock:
+            lock = self._dir_locks.setdefault(name, threading.Lock())
+        waited = not lock.acquire(blocking=False)
+        if waited:
+            lock.acquire()
         try:
-            response = requests.request(
-                "GET", self.url, params=params, headers=self._headers
-            ).json()
-            logger.debug(f"Ответ от сервера при запросе информации: {response}")
-
-            names = []
-            if "name" in response:
-                names.append(response["name"])
-
-            if "_embedded" in response and "items" in response["_embedded"]:
-                for item in response["_embedded"]["items"]:
-                    if "name" in item:
-                        names.append(item["name"])
-            result = names[1:]
-            logger.info(f"Получен список файлов: {result}")
-            return result
+            if recheck or waited:
+                with self._dirs_lock:
+                    if name in self._known_dirs:
+                        return True, "Директория есть на диске."
+            return self._create_dir(name)
+        finally:
+            with self._dirs_lock:
+                if self._dir_locks.get(name) is lock:
+                    del self._dir_locks[name]
+            lock.release()
+
+    def _create_dir(self, name):
+        """
+        Отправляет запрос на создание директории, предварительно создав
+        недостающие родительские директории.
+
+        Args:
+            name (str): Путь директории относительно DISK_PATH.
+
+        Returns:
+            tuple: (bool, str) — есть ли директория на диске и описание результата.
+        """
+        if not self.ensure_parent(name):
+            return False, "Не удалось создать родительскую директорию на диске."
+        params = {"path": f"{self.disk_path}/{name}"}
+
+        try:
+            response = self.session.put(
+                self.url, headers=self._headers, params=params, timeout=self.timeout
+            )
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при запросе информации о файлах: {e}")
-            return []  # Или обработайте ошибку иначе
-        except Exception as e:
-            logger.exception(
-                f"Неожиданная ошибка при получении информации о файлах: {e}"
+            logger.error(f"Ошибка при создании директории {name}: {e}")
+            return False, f"Ошибка при создании директории: {e}"
+
+        if response.status_code == 201:
+            log_sampled("Директория создана", "Директория {} создана на диске.", name)
+        elif response.status_code == 409 and "ExistentDirectory" in response.text:
+            # DiskPathPointsToExistentDirectoryError: директория уже есть
+            logger.debug("Директория {} уже есть на диске.", name)
+        else:
+            logger.error(
+                f"Ошибка при создании директории {name}. Status Code: {response.status_code}, "
+                f"Response: {response.text}"
             )
-            return []
+            return False, f"Ошибка при создании директории: {response.status_code}"
+        self.remember_dirs([name])
+        return True, "Директория есть на диске."
+
+    def ensure_parent(self, name):
+        """
+        Создаёт на диске родительские директории файла, если их ещё нет.
+
+        Args:
+            name (str): Путь файла относительно DISK_PATH.
+
+        Returns:
+            bool: True, если все родительские директории есть на диске.
+        """
+        parent = parent_path(name)
+        with self._dirs_lock:
+            if parent in self._known_dirs:
+                return True
+        # Недостающие директории выше создаются рекурсивно; блокировки берутся
+        # от глубокой директории к корню, поэтому взаимная блокировка невозможна
+        ok, _ = self._mkdir(parent, recheck=True)
+        return ok
+
+    def walk(self, ignore=None):
+        """
+        Рекурсивно получает список всех файлов и директорий в DISK_PATH.
+
+        Args:
+            ignore (IgnoreRules): Правила исключения; исключённые директории
+                не обходятся.
+
+        Yields:
+            dict: Описание элемента с ключами из INFO_FIELDS, где "name" — путь
+                относительно DISK_PATH.
+
+        Raises:
+            requests.exceptions.RequestException: Если список какой-либо директории
+                получить не удалось.
+        """
+        stack = [""]
+        count = 0
+        while stack:
+            rel = stack.pop()
+            path = f"{self.disk_path}/{rel}" if rel else self.disk_path
+            for item in self.info(path):
+                name = f"{rel}/{item['name']}" if rel else item["name"]
+                if item.get("type") == "dir":
+                    if ignore is not None and ignore.match(name, True):
+                        continue
+                    stack.append(name)
+                item["name"] = name
+                count += 1
+                yield item
+        logger.info(f"Получен список файлов на диске: {count} элементов")
+
+    def info(self, path=None):
+        """
+        Постранично получает информацию о файлах в указанной директории.
+
+        Проходит все страницы списка с помощью параметров `limit`/`offset` и запрашивает
+        только нужные поля, поэтому ответы остаются компактными. Элементы отдаются по мере
+        получения страниц, полный список в памяти не собирается.
+
+        Args:
+            path (str): Путь к директории на диске (по умолчанию DISK_PATH).
+
+        Yields:
+            dict: Описание элемента директории с ключами из INFO_FIELDS.
+
+        Raises:
+            requests.exceptions.RequestException: Если страницу списка получить не удалось.
+                Неполный список нельзя использовать для сравнения с локальной папкой.
+        """
+        path = path or self.disk_path
+        logger.debug("Запрос информации о файлах в директории: {}", path)
+        fields = ",".join(f"_embedded.items.{field}" for field in INFO_FIELDS)
+        offset = 0
+        count = 0
+
+        while True:
+            params = {
+                "path": path,
+                "limit": self.page_limit,
+                "offset": offset,
+                "fields": f"{fields},_embedded.total",
+            }
+            try:
+                response = self.session.get(
+                    self.url, params=params, headers=self._headers, timeout=self.timeout
+                )
+                response.raise_for_status()
+                embedded = response.json().get("_embedded", {})
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Ошибка при запросе информации о файлах: {e}")
+                raise
+            except Exception as e:
+                logger.exception(
+                    f"Неожиданная ошибка при получении информации о файлах: {e}"
+                )
+                raise
+
+            items = embedded.get("items", [])
+            logger.debug(
+                "Получена страница списка файлов: offset {}, {} элементов",
+                offset,
+                len(items),
+            )
+            for item in items:
+                if "name" in item:
+                    count += 1
+                    yield item
+
+            offset += len(items)
+            total = embedded.get("total")
+            if len(items) < self.page_limit or (total is not None and offset >= total):
+                break
+
+        logger.debug("Получен список файлов в {}: {} элементов", path, count)
 
 
 # if __name__ == '__main__':
@@ -1,13 +1,135 @@
 import os
 from dotenv import load_dotenv, dotenv_values, find_dotenv
 
-if not find_dotenv():
-    exit("Переменные окружения не загружены т.к отсутствует файл .env")
-else:
+# Без файла .env настройки берутся из окружения процесса (например, в benchmark.py)
+if find_dotenv():
     load_dotenv()
+elif not os.getenv("API_KEY"):
+    exit("Переменные окружения не загружены т.к отсутствует файл .env")
 
 API = os.getenv("API_KEY")
 DIR_PATH = os.getenv("DIR_PATH")
 DISK_PATH = os.getenv("DISK_PATH")
 URL = os.getenv("URL")
 LOG_FILE = os.getenv("LOG_FILE")
+
+# Минимальный уровень записей в файле лога и в консоли (пустое значение — без консоли)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO")
+# Сколько однотипных сообщений о файлах записывается за итерацию; 0 — все
+LOG_SAMPLE_LIMIT = int(os.getenv("LOG_SAMPLE_LIMIT", 20))
+
+# Пары синхронизации "локальная директория=директория на диске" через запятую;
+# если не заданы, синхронизируется одна пара DIR_PATH=DISK_PATH
+SYNC_PAIRS = [
+    pair.strip() for pair in os.getenv("SYNC_PAIRS", "").split(",") if pair.strip()
+]
+# Максимальное число файлов, операции над которыми выполняются за один ход пары
+# при нескольких парах; остальные остаются в журнале до следующего хода, чтобы пара
+# с большой очередью чаще проверяла новые изменения. 0 — без ограничения
+PAIR_TURN_OPERATIONS = int(os.getenv("PAIR_TURN_OPERATIONS", 500))
+
+# Размер блока потоковой загрузки файла (в байтах)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+# Файлы от этого размера (в байтах) загружаются частями с возобновлением после сбоя
+UPLOAD_RESUME_THRESHOLD = int(os.getenv("UPLOAD_RESUME_THRESHOLD", 64 * 1024 * 1024))
+# Размер части возобновляемой загрузки (в байтах)
+UPLOAD_SEGMENT_SIZE = int(os.getenv("UPLOAD_SEGMENT_SIZE", 32 * 1024 * 1024))
+# Время действия ссылки для загрузки, выданной API (в секундах)
+UPLOAD_HREF_TTL = float(os.getenv("UPLOAD_HREF_TTL", 1800))
+
+# Пул HTTP-соединений и повторы запросов к API
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 5))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 60))
+
+# Ограничение числа запросов к API в секунду и размер их пачки; 0 — без ограничения.
+# После ответов 429/503 скорость снижается, но не ниже API_MIN_RATE
+API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", 0))
+API_BURST = float(os.getenv("API_BURST", 20))
+API_MIN_RATE = float(os.getenv("API_MIN_RATE", 1))
+# Ограничение полосы загрузки файлов в байтах в секунду (можно с суффиксом K, M, G);
+# 0 — без ограничения
+UPLOAD_BANDWIDTH = os.getenv("UPLOAD_BANDWIDTH", "0")
+# Расписание ограничения полосы по времени суток через запятую, например
+# "09:00-19:00=2M,19:00-09:00=0"; вне интервалов действует UPLOAD_BANDWIDTH
+UPLOAD_BANDWIDTH_SCHEDULE = [
+    rule.strip()
+    for rule in os.getenv("UPLOAD_BANDWIDTH_SCHEDULE", "").split(",")
+    if rule.strip()
+]
+
+# Число параллельных операций загрузки/удаления
+TRANSFER_WORKERS = int(os.getenv("TRANSFER_WORKERS", 4))
+
+# Задержка перед повтором невыполненной операции из журнала (в секундах); удваивается
+# с каждой неудачной попыткой до QUEUE_RETRY_MAX_DELAY
+QUEUE_RETRY_DELAY = float(os.getenv("QUEUE_RETRY_DELAY", 5))
+QUEUE_RETRY_MAX_DELAY = float(os.getenv("QUEUE_RETRY_MAX_DELAY", 3600))
+
+# Число параллельных скачиваний при восстановлении папки с диска (restore.py)
+RESTORE_WORKERS = int(os.getenv("RESTORE_WORKERS", 8))
+# Файлы больше этого размера (в байтах) скачиваются параллельно частями такого размера
+RESTORE_SEGMENT_SIZE = int(os.getenv("RESTORE_SEGMENT_SIZE", 32 * 1024 * 1024))
+
+# Размер страницы при получении списка файлов на Диске
+INFO_PAGE_LIMIT = int(os.getenv("INFO_PAGE_LIMIT", 1000))
+
+# Режим отслеживания изменений: auto (inotify, если доступен), inotify или poll
+WATCH_MODE = os.getenv("WATCH_MODE", "auto").lower()
+# Интервал опроса директории (в секундах): минимальный пока идут изменения,
+# в простое растёт в POLL_BACKOFF раз после каждой пустой итерации до максимального
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", 1))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 60))
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", 2))
+# Интервал полной сверки с диском в режиме inotify (в секундах)
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", 300))
+# Время накопления пакета событий inotify перед синхронизацией (в секундах)
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", 0.5))
+
+# Время (в секундах), в течение которого размер и время изменения файла не должны
+# меняться, чтобы файл считался дописанным и был загружен; 0 отключает проверку
+SETTLE_WINDOW = float(os.getenv("SETTLE_WINDOW", 2))
+# Максимальное время ожидания завершения записи файла (в секундах)
+SETTLE_MAX_WAIT = float(os.getenv("SETTLE_MAX_WAIT", 300))
+
+# Шаблоны исключаемых из синхронизации файлов в формате .gitignore через запятую;
+# дополняются шаблонами из файла SYNC_IGNORE_FILE в синхронизируемой директории
+SYNC_IGNORE = [
+    pattern.strip()
+    for pattern in os.getenv(
+        "SYNC_IGNORE",
+        "*.swp,*.swo,*~,*.tmp,*.part,*.crdownload,.~lock.*#,__pycache__/,.DS_Store",
+    ).split(",")
+]
+SYNC_IGNORE_FILE = os.getenv("SYNC_IGNORE_FILE", ".syncignore")
+
+# Файл базы данных состояния синхронизации
+DB_FILE = os.getenv("DB_FILE", "database.db")
+
+# Число хэшей содержимого файлов, кэшируемых в памяти по (inode, размер, mtime_ns)
+HASH_CACHE_SIZE = int(os.getenv("HASH_CACHE_SIZE", 4096))
+
+# Интервал полного получения списка файлов с диска (в секундах); между сверками
+# состояние диска берётся из локального кэша
+REMOTE_RECONCILE_INTERVAL = float(os.getenv("REMOTE_RECONCILE_INTERVAL", 3600))
+
+# Удалять файлы с диска, минуя корзину
+DELETE_PERMANENTLY = os.getenv("DELETE_PERMANENTLY", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Число параллельных запросов при пакетном удалении и ожидании асинхронных операций
+DELETE_WORKERS = int(os.getenv("DELETE_WORKERS", 8))
+
+# Максимальное время ожидания асинхронной операции на диске (в секундах)
+OPERATION_TIMEOUT = float(os.getenv("OPERATION_TIMEOUT", 300))
+
+# Порт HTTP-сервера с метриками в формате Prometheus (путь /metrics); 0 — отключён
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Интервал записи сводки метрик в лог (в секундах); 0 — сводка не пишется
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", 300))
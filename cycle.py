@@ -1,223 +1,1336 @@
-import os
 from importlib.metadata import files
-import datetime
-from time import sleep
-from config import DIR_PATH, API, LOG_FILE
+import os
+import queue
+import threading
+import time
+from config import (
+    DIR_PATH,
+    DISK_PATH,
+    API,
+    REMOTE_RECONCILE_INTERVAL,
+    WATCH_MODE,
+    WATCH_DEBOUNCE,
+    QUEUE_RETRY_DELAY,
+    QUEUE_RETRY_MAX_DELAY,
+)
 from loguru import logger
 
-from cloud import Connector
-from database_connect import sql_req
+from hashing import entry_hash
+from ignore import get_ignore_rules
+from logs import flush_sampled, log_sampled, setup_logging
+from metrics import PhaseClock, get_metrics, start_metrics_server
+from pairs import load_pairs
+from scanner import changed_dirs, parent_path, scan_names, scan_tree
+from transfer import TransferOperation
+from watcher import InotifyWatcher, inotify_available
 
-logger.add(
-    LOG_FILE,
-    format="{level} {time} {file} {function} {line} {message} {exception}",
-    serialize=True,
-    level="INFO",
-    rotation="500 MB",
-)
 
+def in_tree(name, paths):
+    """
+    Проверяет, совпадает ли путь с одним из путей или находится внутри них.
+
+    Args:
+        name (str): Путь относительно корня синхронизации.
+        paths (collection): Пути файлов и директорий.
+
+    Returns:
+        bool: True, если путь или одна из его родительских директорий есть в `paths`.
+    """
+    while name:
+        if name in paths:
+            return True
+        name = parent_path(name)
+    return False
 
-def get_last_modified_time(file_path):
+
+def keep_unrestored(names, unrestored):
     """
-    Возвращает время последнего изменения файла в формате 'YYYY-MM-DD HH:MM:SS'.
+    Исключает из удаления на диске файлы, которые восстановление не скачало
+    с диска, и директории, в которых они лежат.
+
+    Локальной копии таких файлов нет, поэтому синхронизация считала бы их
+    удалёнными локально, хотя копия на диске может быть единственной.
 
     Args:
-        file_path (str): Полный путь к файлу.
+        names (iterable): Имена файлов и директорий, удаляемых с диска.
+        unrestored (set): Имена не восстановленных файлов.
 
     Returns:
-        str: Время последнего изменения или None, если файл не найден или произошла ошибка.
+        list: Имена, которые можно удалить.
+    """
+    protected = set()
+    for name in unrestored:
+        while name and name not in protected:
+            protected.add(name)
+            name = parent_path(name)
+    kept = [name for name in names if name not in protected]
+    skipped = len(names) - len(kept)
+    if skipped:
+        logger.warning(
+            f"Не удаляются с диска файлы и директории, не восстановленные "
+            f"с диска: {skipped}. Повторите восстановление"
+        )
+    return kept
+
+
+def save_state(
+    db,
+    local,
+    results,
+    adopted=(),
+    removed=(),
+    remote=None,
+    hashes=None,
+    dir_path=None,
+):
     """
+    Сохраняет результаты итерации в базу данных одной транзакцией.
+
+    Записываются только изменившиеся строки: загруженные и принятые без загрузки файлы,
+    отметки об ошибках и удалённые записи. Выполненные операции удаляются из журнала
+    операций, невыполненные возвращаются в него с увеличенной задержкой повтора.
+
+    Args:
+        db (DatabaseManager): Менеджер базы данных.
+        local (dict): Файлы в директории {имя: FileEntry}.
+        results (list): Результаты операций TransferResult.
+        adopted (iterable): Имена файлов, состояние которых принимается без загрузки.
+        removed (iterable): Имена файлов, записи о которых нужно удалить.
+        remote (dict): Файлы на диске {имя: описание ресурса}.
+        hashes (dict): Вычисленные в итерации MD5 содержимого файлов {имя: хэш}.
+        dir_path (str): Синхронизируемая директория (по умолчанию DIR_PATH).
+    """
+    hashes = hashes or {}
+    synced = []
+    failed = []
+    deleted = []
+    moved = []
+    created = set()
+    completed = []
+    retries = []
+
+    # Операции, возобновлённые из журнала после перезапуска, относятся к файлам,
+    # которых нет в результатах сканирования текущей итерации
+    unknown = {
+        result.operation.name
+        for result in results
+        if result.ok
+        and result.operation.kind not in ("delete", "mkdir")
+        and result.operation.name not in local
+    }
+    if unknown:
+        local = {**local, **scan_names(dir_path or DIR_PATH, unknown)}
+
+    now = time.time()
+    for result in results:
+        if result.operation.id is not None:
+            if result.ok:
+                completed.append(result.operation.id)
+            else:
+                retries.append(
+                    (result.operation.id, now + retry_delay(result), result.message)
+                )
+        if not result.ok:
+            failed.append(result.operation.name)
+        elif result.operation.kind == "delete":
+            deleted.append(result.operation.name)
+        elif result.operation.kind == "mkdir":
+            created.add(result.operation.name)
+        elif result.operation.kind == "move" and result.operation.path_file is None:
+            # Директория перемещена вместе с содержимым (см. `dir_move_operations`)
+            moved.append((result.operation.source, result.operation.name))
+            created.add(result.operation.name)
+        else:
+            if result.operation.kind == "move":
+                deleted.append(result.operation.source)
+            if result.digest:
+                # MD5 посчитан при загрузке по фактически отправленному содержимому
+                # и пополняет индекс содержимого на диске
+                hashes[result.operation.name] = result.digest
+            if result.operation.name in local:
+                synced.append(local[result.operation.name])
+
+    # Родительские директории загруженных файлов созданы на диске (см. `Connector.ensure_parent`)
+    for name in [entry.name for entry in synced] + list(created):
+        name = parent_path(name)
+        while name and name not in created:
+            created.add(name)
+            name = parent_path(name)
+
+    logger.debug("Начало save_state")
     try:
-        timestamp = os.path.getmtime(file_path)
-        datetime_object = datetime.datetime.fromtimestamp(timestamp)
-        last_modified_time = datetime_object.strftime("%Y-%m-%d %H:%M:%S")
+        with db.transaction():
+            db.queue_complete(completed)
+            db.queue_retry(retries)
+            db.rename_tree(moved)
+            db.mark_synced(synced, hashes=hashes)
+            db.unrestored_delete(entry.name for entry in synced)
+            db.mark_synced((local[name] for name in adopted), remote, hashes)
+            db.mark_failed(failed)
+            db.data_delete_many(removed)
+
+            # Кэш состояния диска обновляется по результатам собственных операций
+            db.remote_upsert(
+                {
+                    "name": entry.name,
+                    "type": "file",
+                    "size": entry.size,
+                    "md5": hashes.get(entry.name),
+                }
+                for entry in synced
+            )
+            db.remote_upsert({"name": name, "type": "dir"} for name in created)
+            # Удалённая директория удаляется из базы вместе с содержимым
+            db.forget_tree(deleted)
+            if failed:
+                # После ошибок состояние диска неизвестно: в следующей итерации
+                # выполняется полная сверка
+                db.set_meta("remote_stale", 1)
         logger.debug(
-            f"Время последнего изменения файла {file_path}: {last_modified_time}"
+            f"Состояние сохранено: загружено {len(synced)}, ошибок {len(failed)}, "
+            f"удалено записей {len(removed)}"
         )
-        return last_modified_time
-    except FileNotFoundError:
-        logger.warning(f"Файл не найден: {file_path}")
-        return None
     except Exception as e:
-        logger.error(f"Ошибка при получении времени изменения файла {file_path}: {e}")
+        logger.error(f"Ошибка при записи в database.db: {e}")
+
+
+def retry_delay(result):
+    """
+    Вычисляет задержку перед повтором невыполненной операции из журнала.
+
+    Args:
+        result (TransferResult): Результат неудачной попытки.
+
+    Returns:
+        float: Задержка в секундах.
+    """
+    delay = min(QUEUE_RETRY_MAX_DELAY, QUEUE_RETRY_DELAY * 2**result.operation.attempts)
+    logger.warning(
+        f"Операция {result.operation.kind} для файла {result.operation.name} "
+        f"не выполнена (попытка {result.operation.attempts + 1}), "
+        f"повтор через {delay:.0f} с"
+    )
+    return delay
+
+
+def enqueue(db, operations, scope=None):
+    """
+    Записывает запланированные операции в журнал операций до их выполнения.
+
+    Args:
+        db (DatabaseManager): Менеджер базы данных.
+        operations (list): Операции TransferOperation.
+        scope (iterable): Имена файлов, для которых составлен план (по умолчанию все).
+
+    Returns:
+        int: Число добавленных операций (без уже ожидающих в журнале).
+    """
+    with db.transaction():
+        added = db.queue_push(operations, scope)
+    if added:
+        logger.debug(f"В журнал операций добавлено операций: {added}")
+    return added
+
+
+def queue_delay(db):
+    """
+    Вычисляет время до ближайшего повтора операции из журнала.
+
+    Args:
+        db (DatabaseManager): Менеджер базы данных.
+
+    Returns:
+        float: Время в секундах (не меньше 0) или None, если журнал пуст.
+    """
+    with db.transaction():
+        next_attempt = db.queue_next_attempt()
+    if next_attempt is None:
         return None
+    return max(0.0, next_attempt - time.time())
 
 
-def download_db(data):
+def run_queue(db, executor, local=None, hashes=None, limit=None):
     """
-    Загружает данные в базу данных.
+    Выполняет операции из журнала, время повтора которых наступило.
 
-    Функция принимает словарь, где ключи - имена файлов, а значения - соответствующие им даты и время последнего обновления.
-    Для каждой пары ключ-значение вызывает функцию `sql_req` для добавления или обновления записи в базе данных.
-    В случае успеха логирует информацию об успешном сохранении данных.
-    В случае ошибки логирует информацию об ошибке.
+    Результаты сохраняются по мере завершения операций над каждым файлом, поэтому
+    при перезапуске процесса уже выполненные операции не повторяются.
 
     Args:
-        data (dict): Словарь с данными для записи в базу данных. Ключи - имена файлов, значения - дата и время обновления.
+        db (DatabaseManager): Менеджер базы данных.
+        executor (TransferExecutor): Исполнитель операций.
+        local (dict): Файлы в директории {имя: FileEntry}.
+        hashes (dict): Вычисленные в итерации MD5 содержимого файлов {имя: хэш}.
+        limit (int): Максимальное число файлов, операции над которыми выполняются
+            за вызов; остальные остаются в журнале до следующего хода (по умолчанию
+            без ограничения).
+
+    Returns:
+        list: Результаты операций TransferResult.
     """
+    with db.transaction():
+        entries = db.queue_claim(limit=limit)
+    if not entries:
+        flush_sampled()
+        return []
+
+    operations = [
+        TransferOperation(
+            entry.kind,
+            entry.name,
+            entry.path_file,
+            entry.source,
+            entry.id,
+            entry.attempts,
+        )
+        for entry in entries
+    ]
+    local = local or {}
+    hashes = hashes or {}
+    dir_path = executor.connector.file_path
+    results = executor.run(
+        operations,
+        callback=lambda results: save_state(
+            db, local, results, hashes=hashes, dir_path=dir_path
+        ),
+    )
+    # Сообщения о файлах, пропущенные за итерацию, записываются одной строкой на тип
+    flush_sampled()
+    return results
+
+
+def resume_queue(executor):
+    """
+    Выполняет операции, оставшиеся в журнале после предыдущего запуска.
+
+    Args:
+        executor (TransferExecutor): Исполнитель операций.
+    """
+    db = executor.connector.db
+    with db.transaction():
+        pending = db.queue_reset()
+    if pending:
+        logger.info(f"Возобновление журнала операций: {pending} операций")
+        run_queue(db, executor)
+
+
+def detect_renames(candidates, local, removed_states, remote):
+    """
+    Находит переименованные файлы среди новых.
+
+    Новый файл считается переименованным, если у одного из исчезнувших файлов
+    совпадают inode и размер, а файл с прежним именем есть на диске.
+
+    Args:
+        candidates (iterable): Имена новых файлов.
+        local (dict): Файлы в директории {имя: FileEntry}.
+        removed_states (dict): Сохранённое состояние исчезнувших файлов {имя: FileState}.
+        remote (dict): Файлы на диске {имя: описание ресурса}.
+
+    Returns:
+        dict: Словарь {новое имя: FileState прежнего файла}.
+    """
+    by_inode = {
+        (state.inode, state.size): state
+        for state in removed_states.values()
+        if state.inode and state.filename in remote
+    }
+    renames = {}
+    for name in candidates:
+        entry = local[name]
+        state = by_inode.pop((entry.inode, entry.size), None)
+        if state is not None:
+            renames[name] = state
+    return renames
+
+
+def detect_dir_renames(new_dirs, dirs, vanished, remote):
+    """
+    Находит переименованные директории среди новых.
+
+    Новая директория считается переименованной, если у одной из исчезнувших
+    директорий совпадает inode, а директория с прежним именем есть на диске.
+    Вложенные директории перемещаются вместе с родительской.
+
+    Args:
+        new_dirs (iterable): Пути новых директорий.
+        dirs (dict): Текущие отпечатки директорий {путь: DirState}.
+        vanished (iterable): Сохранённые отпечатки исчезнувших директорий DirState.
+        remote (dict): Файлы на диске {имя: описание ресурса}.
+
+    Returns:
+        dict: Словарь {новый путь: прежний путь}.
+    """
+    by_inode = {
+        state.inode: state.path
+        for state in vanished
+        if state.inode and remote.get(state.path, {}).get("type") == "dir"
+    }
+    matches = {}
+    for path in sorted(new_dirs):
+        state = dirs.get(path)
+        source = by_inode.pop(state.inode, None) if state is not None else None
+        if source is not None and not in_tree(path, matches):
+            matches[path] = source
+    # Директория, прежний путь которой лежит внутри другой перемещаемой, уже
+    # перемещена вместе с ней и создаётся заново
+    sources = set(matches.values())
+    return {
+        path: source
+        for path, source in matches.items()
+        if not in_tree(parent_path(source), sources)
+    }
+
+
+def dir_move_operations(renames):
+    """
+    Формирует операции перемещения директорий на диске вместе с содержимым.
+
+    Args:
+        renames (dict): Словарь {новый путь: прежний путь}.
+
+    Returns:
+        list: Операции TransferOperation.
+    """
+    operations = []
+    for path, source in renames.items():
+        log_sampled(
+            "Директория переименована",
+            "Директория переименована: {} -> {}",
+            source,
+            path,
+        )
+        operations.append(TransferOperation("move", path, source=source))
+    return operations
+
+
+def rename_operations(renames, local, hashes):
+    """
+    Формирует операции перемещения файлов на диске для переименованных файлов.
+
+    Если после переименования изменилось и время изменения файла, за перемещением
+    следует перезагрузка; операции над одним именем выполняются по порядку.
+
+    Args:
+        renames (dict): Словарь {новое имя: FileState прежнего файла}.
+        local (dict): Файлы в директории {имя: FileEntry}.
+        hashes (dict): Словарь, в который переносятся известные хэши содержимого.
+
+    Returns:
+        list: Операции TransferOperation.
+    """
+    operations = []
+    for name, state in renames.items():
+        entry = local[name]
+        log_sampled(
+            "Файл переименован", "Файл переименован: {} -> {}", state.filename, name
+        )
+        operations.append(
+            TransferOperation("move", name, entry.path, source=state.filename)
+        )
+        if entry.mtime_ns != state.mtime_ns:
+            operations.append(TransferOperation("reload", name, entry.path))
+        elif state.hash:
+            hashes[name] = state.hash
+    return operations
+
+
+def find_duplicates(names, local, db, hashes, exclude=()):
+    """
+    Находит новые файлы, содержимое которых уже есть на диске под другим именем.
+
+    Индексом служит кэш состояния диска: MD5 из списка файлов и собственных загрузок.
+    Хэш локального файла вычисляется, только если на диске есть файл того же размера.
+
+    Args:
+        names (list): Имена новых файлов.
+        local (dict): Файлы в директории {имя: FileEntry}.
+        db (DatabaseManager): Менеджер базы данных.
+        hashes (dict): Словарь, в который записываются вычисленные хэши.
+        exclude (iterable): Имена файлов и директорий на диске, которые изменяются
+            в этой итерации; файлы в них не могут быть источником копирования.
+
+    Returns:
+        dict: Словарь {имя нового файла: имя файла с тем же содержимым на диске}.
+    """
+    exclude = set(exclude)
+    with db.transaction():
+        index = db.remote_by_size(local[name].size for name in names)
+
+    duplicates = {}
+    saved = 0
+    for name in names:
+        entry = local[name]
+        candidates = index.get(entry.size)
+        if not entry.size or not candidates:
+            continue
+        digest = entry_hash(entry)
+        if digest is None:
+            continue
+        hashes[name] = digest
+        source = candidates.get(digest)
+        if source is not None and source != name and not in_tree(source, exclude):
+            duplicates[name] = source
+            saved += entry.size
+
+    if duplicates:
+        logger.info(
+            f"Содержимое {len(duplicates)} новых файлов уже есть на диске, "
+            f"копирование вместо загрузки {saved} байт"
+        )
+    return duplicates
+
+
+def skip_unchanged(names, local, remote_md5, hashes):
+    """
+    Отбирает файлы, содержимое которых совпадает с уже загруженным на диск.
+
+    Хэш вычисляется только для файлов, MD5 которых на диске известен; повторно
+    одна и та же версия файла не хэшируется (см. `hashing.entry_hash`).
+
+    Args:
+        names (list): Имена изменившихся файлов.
+        local (dict): Файлы в директории {имя: FileEntry}.
+        remote_md5 (dict): MD5 файлов на диске {имя: хэш}.
+        hashes (dict): Словарь, в который записываются вычисленные хэши.
+
+    Returns:
+        tuple: Списки имён (нужно загрузить, содержимое не изменилось).
+    """
+    to_upload = []
+    unchanged = []
+    saved = 0
+    for name in names:
+        expected = remote_md5.get(name)
+        digest = entry_hash(local[name]) if expected else None
+        if digest is not None:
+            hashes[name] = digest
+        if digest is not None and digest == expected:
+            unchanged.append(name)
+            saved += local[name].size
+        else:
+            to_upload.append(name)
+
+    if unchanged:
+        logger.info(
+            f"Содержимое не изменилось у {len(unchanged)} файлов, "
+            f"пропущена загрузка {saved} байт"
+        )
+    return to_upload, unchanged
+
+
+def diff_states(local, remote, dirty):
+    """
+    Сравнивает состояние локальной директории, диска и базы данных.
+
+    Локальные и удалённые файлы сравниваются операциями над множествами ключей словарей,
+    изменившиеся файлы заранее найдены запросом к базе (`DatabaseManager.dirty_files`),
+    поэтому время сравнения линейно зависит от числа файлов.
+
+    Args:
+        local (dict): Файлы в директории {имя: FileEntry}.
+        remote (dict): Файлы на диске {имя: описание ресурса}.
+        dirty (dict): Файлы, отличающиеся от сохранённого состояния {имя: причина}.
+
+    Returns:
+        tuple: Списки имён (новые файлы, новые директории, удалённые, изменённые,
+            принимаемые без загрузки).
+    """
+    local_names = local.keys()
+    new = []
+    new_dirs = []
+    for name in local_names - remote.keys():
+        (new_dirs if local[name].is_dir else new).append(name)
+    deleted = list(remote.keys() - local_names)
+    changed = []
+    adopted = []
+    for name, reason in dirty.items():
+        if name not in remote:
+            continue
+        if reason == "adopt":
+            # Строка прежнего формата, файл не изменялся с момента загрузки
+            adopted.append(name)
+        else:
+            # Изменившиеся файлы и файлы, которые уже есть на диске, но не отслеживаются,
+            # перед загрузкой сравниваются по хэшу (см. `skip_unchanged`)
+            changed.append(name)
+    return new, new_dirs, deleted, changed, adopted
 
-    logger.info("Начало download_db")
-    try:
-        for key, value in data.items():
-            sql_req(func="add", file=key, add_or_update_datetime=value)
-        logger.debug("data успешно сохранен в database.db")
-    except Exception as e:
-        logger.error(f"Ошибка при записи в database.db: {e}")
 
+def remote_reconcile_due(db):
+    """
+    Проверяет, нужно ли получить полный список файлов с диска.
+
+    Args:
+        db (DatabaseManager): Менеджер базы данных.
+
+    Returns:
+        bool: True, если кэш устарел по времени или после ошибок.
+    """
+    if db.get_meta("remote_stale") == "1":
+        return True
+    reconciled_at = float(db.get_meta("remote_reconciled_at", 0))
+    return time.time() - reconciled_at >= REMOTE_RECONCILE_INTERVAL
 
-def open_db():
+
+def load_remote_state(attribute, db, reconcile=None, ignore=None):
     """
-    Открывает и считывает данные из базы данных.
+    Возвращает состояние директории на диске из кэша или из полного списка файлов.
+
+    Полный список запрашивается по расписанию REMOTE_RECONCILE_INTERVAL, после ошибок
+    или по явному запросу, и сохраняется в кэш.
 
-    Функция вызывает функцию `sql_req` для чтения данных из базы данных.
-    В случае успеха возвращает считанные данные.
-    В случае ошибки логирует информацию об ошибке и возвращает None.
+    Args:
+        attribute (Connector): Клиент API диска.
+        db (DatabaseManager): Менеджер базы данных.
+        reconcile (bool): Принудительно запросить (True) или взять из кэша (False)
+            список файлов. По умолчанию решается по `remote_reconcile_due`.
+        ignore (IgnoreRules): Правила исключения; исключённые директории на диске
+            не обходятся.
 
     Returns:
-        dict: Данные, считанные из базы данных, или None в случае ошибки.
+        dict: Файлы на диске {имя: описание ресурса} или None, если список получить
+            не удалось.
     """
+    if reconcile is None:
+        reconcile = remote_reconcile_due(db)
+    if not reconcile:
+        with db.transaction():
+            return db.remote_read()
 
-    logger.info("Начало open_db")
     try:
-        data_db = sql_req(func="read")
-        return data_db
-    except Exception as e:
-        logger.error(f"Ошибка при чтении db: {e}")
+        listing = {item["name"]: item for item in attribute.walk(ignore)}
+    except Exception:
+        with db.transaction():
+            db.set_meta("remote_stale", 1)
         return None
 
+    with db.transaction():
+        db.remote_replace(listing)
+        db.update_remote(listing.values())
+        db.set_meta("remote_reconciled_at", time.time())
+        db.set_meta("remote_stale", 0)
+    logger.info(f"Кэш состояния диска обновлён: {len(listing)} элементов")
+    return listing
+
+
+def save_fingerprints(db, dirs, stored, unsettled, moved=None):
+    """
+    Сохраняет отпечатки директорий, содержимое которых полностью синхронизировано.
+
+    Отпечаток директории, в поддереве которой есть файлы с невыполненными операциями
+    или отложенной загрузкой, удаляется: в следующей итерации она будет проверена снова.
+
+    Args:
+        db (DatabaseManager): Менеджер базы данных.
+        dirs (dict): Текущие отпечатки директорий {путь: DirState}.
+        stored (dict): Сохранённые отпечатки директорий {путь: DirState}.
+        unsettled (iterable): Имена файлов, синхронизация которых не завершена.
+        moved (dict): Перемещаемые директории {новый путь: прежний путь}. Содержимое
+            новых проверяется в следующей итерации, отпечатки прежних сохраняются,
+            пока перемещение не выполнено.
+    """
+    moved = moved or {}
+    sources = set(moved.values())
+    blocked = set()
+
+    def block(path):
+        while path not in blocked:
+            blocked.add(path)
+            if not path:
+                break
+            path = parent_path(path)
+
+    for name in unsettled:
+        block(parent_path(name))
+    for path, state in dirs.items():
+        if state.fingerprint is None or in_tree(path, moved):
+            block(path)
+    kept = {path for path in stored if in_tree(path, sources)}
+
+    with db.transaction():
+        db.dirs_save(
+            state
+            for path, state in dirs.items()
+            if path not in blocked and stored.get(path) != state
+        )
+        db.dirs_delete(
+            ((stored.keys() - dirs.keys()) | (blocked & stored.keys())) - kept
+        )
 
-def clear_db(data_db, list_file):
+
+def sync_cycle(attribute, executor, reconcile=None, settle=None, limit=None):
     """
-    Очищает базу данных, удаляя записи, которых нет в `list_file`.
+    Выполняет полную сверку дерева локальной директории с директорией на диске.
 
-    Функция принимает текущие данные из базы данных (`data_db`) и список файлов (`list_file`).
-    Определяет ключи, которые присутствуют в `data_db`, но отсутствуют в `list_file`.
-    Для каждого такого ключа вызывает функцию `sql_req` для удаления соответствующей записи из базы данных,
-    а также удаляет ключ из локальной копии `data_db`.
-    Возвращает обновленный словарь `data_db`.
+    Состояние диска берётся из кэша, полный список файлов запрашивается только
+    по расписанию или после ошибок (см. `load_remote_state`). Дерево сканируется
+    целиком, но с базой данных и диском сравниваются только файлы директорий,
+    отпечаток которых изменился с прошлой итерации (см. `scanner.changed_dirs`);
+    неизменившиеся поддеревья пропускаются.
 
     Args:
-        data_db (dict): Текущие данные из базы данных.
-        list_file (list): Список файлов, которые должны остаться в базе данных.
+        attribute (Connector): Клиент API диска.
+        executor (TransferExecutor): Исполнитель операций загрузки и удаления.
+        reconcile (bool): Принудительно запросить полный список файлов с диска.
+        settle (SettleTracker): Откладывает загрузку файлов, запись которых
+            ещё продолжается.
+        limit (int): Максимальное число файлов, операции над которыми выполняются
+            за итерацию (см. `run_queue`).
 
     Returns:
-        dict: Обновленный словарь `data_db` после очистки.
+        int: Число обнаруженных изменений (новые операции, изменённые без загрузки,
+            исчезнувшие и ещё записываемые файлы) или None, если список файлов на диске получить
+            не удалось.
+    """
+    logger.debug("Начало итерации цикла")
+    clock = PhaseClock()
+    db = attribute.db
+    rules = get_ignore_rules(attribute.file_path)
+    rules.refresh()
+    local, dirs = scan_tree(attribute.file_path, rules)
+    clock.mark("scan")
+    with db.transaction():
+        if reconcile is None:
+            reconcile = remote_reconcile_due(db)
+        if db.get_meta("ignore_digest") != rules.digest:
+            # Правила исключения изменились: проверяется всё дерево и весь диск
+            db.dirs_clear()
+            db.set_meta("ignore_digest", rules.digest)
+            reconcile = True
+        stored = db.dirs_read()
+    files_on_disk = load_remote_state(attribute, db, reconcile, rules)
+    clock.mark("remote")
+    if files_on_disk is None:
+        logger.warning("Список файлов на диске не получен, итерация пропущена")
+        get_metrics().inc("cycles_total", result="failed")
+        return None
+    attribute.remember_dirs(
+        name for name, item in files_on_disk.items() if item.get("type") == "dir"
+    )
+    logger.debug("Файлы в директории: {}, на диске: {}", len(local), len(files_on_disk))
+
+    full = reconcile or not stored
+    # Непрочитанные директории не проверяются: их файлы не считаются удалёнными
+    unreadable = {path for path, state in dirs.items() if state.fingerprint is None}
+    if full:
+        scope = dirs.keys() - unreadable
+    else:
+        scope = changed_dirs(dirs, stored)
+        logger.debug("Изменившихся директорий: {} из {}", len(scope), len(dirs))
+    local_changed = {
+        name: entry for name, entry in local.items() if parent_path(name) in scope
+    }
+    remote_changed = {
+        name: item for name, item in files_on_disk.items() if parent_path(name) in scope
+    }
+
+    with db.transaction():
+        db.load_scan(local_changed.values())
+        dirty = db.dirty_files()
+        if full:
+            removed = [
+                name for name in db.missing_files() if not in_tree(name, unreadable)
+            ]
+        else:
+            # Записи о файлах исчезнувших директорий тоже удаляются из базы
+            removed = db.missing_files(scope | (stored.keys() - dirs.keys()))
+        removed_states = db.file_states(removed)
+        unrestored = db.unrestored_read()
+    clock.mark("compare")
+
+    new, new_dirs, deleted, changed, adopted = diff_states(
+        local_changed, remote_changed, dirty
+    )
+    # Исключённые файлы не синхронизируются, но и не удаляются с диска
+    deleted = keep_unrestored(
+        [
+            file
+            for file in deleted
+            if not rules.match(file, files_on_disk[file].get("type") == "dir")
+        ],
+        unrestored,
+    )
+
+    # Переименованные директории перемещаются на диске вместе с содержимым;
+    # их файлы сравниваются с базой в следующей итерации
+    dir_renames = detect_dir_renames(
+        new_dirs,
+        dirs,
+        (state for path, state in stored.items() if path not in dirs),
+        files_on_disk,
+    )
+    dir_sources = set(dir_renames.values())
+    if dir_renames:
+        new_dirs = [path for path in new_dirs if not in_tree(path, dir_renames)]
+        new = [file for file in new if not in_tree(file, dir_renames)]
+        deleted = [file for file in deleted if not in_tree(file, dir_sources)]
+        removed = [name for name in removed if not in_tree(name, dir_sources)]
+        removed_states = {
+            name: state
+            for name, state in removed_states.items()
+            if not in_tree(name, dir_sources)
+        }
+    waiting = []
+    if settle is not None:
+        # Файлы, которые ещё записываются, загружаются после завершения записи;
+        # отложенные файлы из непроверенных директорий остаются в ожидании
+        settle.retain(
+            set(new).union(changed)
+            | {name for name in settle.waiting() if parent_path(name) not in scope}
+        )
+        new, waiting_new = settle.split(new, local)
+        changed, waiting_changed = settle.split(changed, local)
+        waiting = waiting_new + waiting_changed
+    hashes = {}
+    changed, unchanged = skip_unchanged(
+        changed,
+        local,
+        {name: files_on_disk[name].get("md5") for name in changed},
+        hashes,
+    )
+    adopted.extend(unchanged)
+
+    # Переименованные файлы перемещаются на диске без повторной загрузки
+    operations = dir_move_operations(dir_renames)
+    renames = detect_renames(new, local, removed_states, remote_changed)
+    operations.extend(rename_operations(renames, local, hashes))
+    sources = {state.filename for state in renames.values()}
+    new = [file for file in new if file not in renames]
+    deleted = [file for file in deleted if file not in sources]
+
+    # Файлы, содержимое которых уже есть на диске, копируются на стороне сервера
+    duplicates = find_duplicates(
+        new, local, db, hashes, exclude=sources.union(deleted, changed, dir_sources)
+    )
+
+    # Новые директории создаются на диске, даже если в них нет файлов
+    for folder in new_dirs:
+        log_sampled(
+            "Новая директория обнаружена", "Новая директория обнаружена: {}", folder
+        )
+        operations.append(TransferOperation("mkdir", folder))
+
+    # Обнаружение новых файлов
+    for file in new:
+        log_sampled("Новый файл обнаружен", "Новый файл обнаружен: {}", file)
+        if file in duplicates:
+            operations.append(
+                TransferOperation(
+                    "copy", file, local[file].path, source=duplicates[file]
+                )
+            )
+        else:
+            operations.append(TransferOperation("load", file, local[file].path))
+
+    # Обнаружение удаленных файлов
+    for file in deleted:
+        log_sampled("Файл удален", "Файл удален: {}", file)
+        operations.append(TransferOperation("delete", file))
+
+    # Обновление изменившихся файлов
+    for file in changed:
+        log_sampled(
+            "Файл нуждается в обновлении", "Файл {} нуждается в обновлении", file
+        )
+        operations.append(TransferOperation("reload", file, local[file].path))
+
+    # Операции записываются в журнал до выполнения, результаты сохраняются по мере
+    # завершения; в базу попадают только успешные загрузки
+    plan_scope = None
+    if not full:
+        # План составлен только для файлов проверенных и исчезнувших директорий
+        with db.transaction():
+            plan_scope = {
+                name
+                for name in db.queue_names()
+                if parent_path(name) in scope or parent_path(name) not in dirs
+            }
+    added = enqueue(db, operations, plan_scope)
+    clock.mark("plan")
+    save_state(db, local, [], adopted, removed, files_on_disk, hashes)
+    run_queue(db, executor, local, hashes, limit)
+    clock.mark("transfer")
+
+    # Отпечатки сохраняются только для директорий, где синхронизация завершена
+    with db.transaction():
+        unsettled = db.queue_names()
+    save_fingerprints(db, dirs, stored, unsettled.union(waiting), dir_renames)
+    clock.mark("save")
+
+    metrics = get_metrics()
+    metrics.observe("cycle", clock.elapsed())
+    metrics.inc("cycles_total", result="ok")
+    metrics.set("last_success_timestamp_seconds", time.time(), pair=attribute.disk_path)
+    metrics.set("dirs", len(dirs), pair=attribute.disk_path)
+    record_state(db, settle, attribute.disk_path)
+    logger.info("Конец итерации цикла")
+    return added + len(adopted) + len(removed) + len(waiting)
+
+
+def sync_changes(attribute, executor, names, settle=None, closed=(), limit=None):
+    """
+    Синхронизирует только указанные файлы, не запрашивая список файлов с диска.
+
+    Состояние на диске берётся из кэша: файл загружается с перезаписью, если его
+    содержимое отличается от известного MD5 на диске, файл, которого больше нет
+    в директории, удаляется с диска. Новая директория создаётся на диске, удалённая
+    удаляется вместе с содержимым.
+
+    Args:
+        attribute (Connector): Клиент API диска.
+        executor (TransferExecutor): Исполнитель операций загрузки и удаления.
+        names (set): Пути изменившихся файлов и директорий.
+        settle (SettleTracker): Откладывает загрузку файлов, запись которых
+            ещё продолжается.
+        closed (set): Имена файлов, закрытых после записи.
+        limit (int): Максимальное число файлов, операции над которыми выполняются
+            за вызов (см. `run_queue`).
     """
+    logger.debug("Синхронизация изменившихся файлов: {}", names)
+    rules = get_ignore_rules(attribute.file_path)
+    names = {name for name in names if not rules.match(name)}
+    local = scan_names(attribute.file_path, names, rules)
+
+    db = attribute.db
+    with db.transaction():
+        db.load_scan(local.values())
+        dirty = db.dirty_files()
+        remote = db.remote_read(names)
+        removed_states = db.file_states(names - local.keys())
+        unrestored = db.unrestored_read()
+    removed = list(removed_states)
 
-    logger.info("Начало clear_db")
-    list_deleted = [k for k in data_db if k not in list_file]
+    adopted = [file for file, reason in dirty.items() if reason == "adopt"]
+    candidates = [file for file, reason in dirty.items() if reason != "adopt"]
+    if settle is not None:
+        settle.discard(names - set(candidates))
+        candidates, _ = settle.split(candidates, local, closed)
+    hashes = {}
+    to_upload, unchanged = skip_unchanged(
+        candidates,
+        local,
+        {file: remote[file].get("md5") for file in candidates if file in remote},
+        hashes,
+    )
+    adopted.extend(unchanged)
 
-    for i in list_deleted:
-        sql_req(func="del", file=i)
-        del data_db[i]
-        logger.debug(f"Удален ключ {i} из data_db и database.db")
+    # Переименованные файлы перемещаются на диске без повторной загрузки
+    renames = detect_renames(
+        [file for file in to_upload if dirty[file] == "untracked"],
+        local,
+        removed_states,
+        remote,
+    )
+    operations = rename_operations(renames, local, hashes)
+    sources = {state.filename for state in renames.values()}
 
-    logger.debug(f"Финальный data_db после очистки: {data_db}")
-    return data_db
+    # Новые файлы, содержимое которых уже есть на диске, копируются на стороне сервера
+    duplicates = find_duplicates(
+        [
+            file
+            for file in to_upload
+            if dirty[file] == "untracked" and file not in renames
+        ],
+        local,
+        db,
+        hashes,
+        exclude=sources.union(names),
+    )
 
+    for folder in sorted(local.keys() - remote.keys()):
+        if local[folder].is_dir:
+            log_sampled(
+                "Новая директория обнаружена", "Новая директория обнаружена: {}", folder
+            )
+            operations.append(TransferOperation("mkdir", folder))
 
-def path_generator(file):
+    for file in to_upload:
+        if file in renames:
+            continue
+        if dirty[file] == "untracked":
+            log_sampled("Новый файл обнаружен", "Новый файл обнаружен: {}", file)
+        else:
+            log_sampled(
+                "Файл нуждается в обновлении", "Файл {} нуждается в обновлении", file
+            )
+        if file in duplicates:
+            operations.append(
+                TransferOperation(
+                    "copy", file, local[file].path, source=duplicates[file]
+                )
+            )
+            continue
+        # Кэш может отставать от диска, поэтому загрузка всегда с перезаписью
+        operations.append(TransferOperation("reload", file, local[file].path))
+
+    gone = (names - local.keys() - sources) & (remote.keys() | set(removed))
+    gone = set(keep_unrestored(list(gone), unrestored))
+    for file in gone:
+        if in_tree(parent_path(file), gone):
+            # Удаляется вместе с родительской директорией
+            continue
+        log_sampled("Файл удален", "Файл удален: {}", file)
+        operations.append(TransferOperation("delete", file))
+
+    enqueue(db, operations, names)
+    save_state(db, local, [], adopted, removed, remote, hashes)
+    run_queue(db, executor, local, hashes, limit)
+    record_state(db, settle, attribute.disk_path)
+
+
+def record_state(db, settle=None, pair=None):
     """
-    Генерирует полный путь к файлу.
+    Обновляет метрики состояния: глубину журнала операций и число файлов по состояниям.
 
     Args:
-        file (str): Имя файла.
+        db (DatabaseManager): Менеджер базы данных.
+        settle (SettleTracker): Отслеживание записываемых файлов.
+        pair (str): Директория на диске пары синхронизации (метка "pair").
+    """
+    metrics = get_metrics()
+    pair = pair or DISK_PATH
+    with db.transaction():
+        depth = db.queue_depth()
+        statuses = db.files_by_status()
+    metrics.set("queue_depth", depth, pair=pair)
+    for status in ("synced", "failed"):
+        metrics.set("files", statuses.get(status, 0), state=status, pair=pair)
+    if settle is not None:
+        metrics.set("files", len(settle.waiting()), state="waiting", pair=pair)
+
+
+def register_metrics(limiter, settles):
+    """
+    Подключает к метрикам счётчики ограничителя запросов и отслеживания записи файлов.
+
+    Args:
+        limiter (RateLimiter): Ограничитель запросов к API.
+        settles (list): Отслеживание записываемых файлов всех пар синхронизации.
+    """
+    get_metrics().register(
+        lambda: {
+            "throttled_total": limiter.throttled,
+            "rate_wait_seconds_total": round(limiter.waited, 3),
+            "settle_avoided_total": sum(settle.avoided for settle in settles),
+        }
+    )
+
+
+def next_wakeup(db, settle):
+    """
+    Вычисляет ближайшее время, когда нужна итерация без новых изменений в директории:
+    повтор операции из журнала или проверка отложенного файла.
+
+    Args:
+        db (DatabaseManager): Менеджер базы данных.
+        settle (SettleTracker): Отслеживание записываемых файлов.
 
     Returns:
-        str: Полный путь к файлу.
+        float: Время по `time.monotonic()` или None, если ждать нечего.
     """
-    path_file = os.path.join(DIR_PATH, file)
-    logger.debug(f"Сгенерирован путь к файлу {file}: {path_file}")
-    return path_file
+    deadlines = []
+    retry = queue_delay(db)
+    if retry is not None:
+        deadlines.append(time.monotonic() + retry)
+    if settle.next_deadline() is not None:
+        deadlines.append(settle.next_deadline())
+    return min(deadlines, default=None)
 
 
-def update_file_time(file, data_disk):
+def run_pairs(pairs, loop):
     """
-    Обновляет время для файла в словаре data_disk.
+    Запускает цикл синхронизации каждой пары в отдельном потоке.
+
+    Пары не ждут друг друга: пока одна пара загружает большие файлы, другие
+    сканируют свои директории и ставят операции в общий пул потоков, который
+    выполняет операции пар по очереди (см. `transfer.FairPool`). Журнал операций
+    пары возобновляется в её потоке до запуска цикла.
 
     Args:
-        file (str): Имя файла.
-        data_disk (dict): Словарь для хранения данных о файлах.
+        pairs (list): Пары SyncPair.
+        loop (callable): Цикл пары `loop(pair)`.
 
     Returns:
-        dict: Обновленный словарь data_disk.
+        queue.Queue: Исключения, завершившие циклы пар.
+    """
+    register_metrics(pairs[0].connector.limiter, [pair.settle for pair in pairs])
+    failures = queue.Queue()
+
+    def run(pair):
+        try:
+            with logger.contextualize(pair=pair.remote):
+                resume_queue(pair.executor)
+                loop(pair)
+        except BaseException as e:
+            failures.put(e)
+
+    for index, pair in enumerate(pairs):
+        threading.Thread(
+            target=run, args=(pair,), name=f"pair_{index}", daemon=True
+        ).start()
+    return failures
+
+
+def poll_pair(pair):
+    """
+    Цикл синхронизации одной пары опросом директории.
+
+    Args:
+        pair (SyncPair): Пара синхронизации.
     """
-    now = datetime.datetime.now()
-    data_disk[file] = now.strftime("%Y-%m-%d %H:%M:%S")
-    logger.debug(f"Обновлено время для файла {file}: {data_disk[file]}")
-    return data_disk
+    while True:
+        changes = sync_cycle(
+            pair.connector,
+            pair.executor,
+            settle=pair.settle,
+            limit=pair.turn_limit,
+        )
+        delay = pair.scheduler.update(changes)
+        wakeup = next_wakeup(pair.db, pair.settle)
+        if wakeup is not None:
+            delay = max(0.0, min(delay, wakeup - time.monotonic()))
+        get_metrics().log_summary()
+        logger.debug(f"Следующая итерация через {delay:.1f} с")
+        time.sleep(delay)
 
 
-def infinite_loop():
+def infinite_loop(pairs=None):
     """
-    Основной цикл программы, который отслеживает изменения в директории с файлами.
+    Основной цикл программы, который отслеживает изменения в директориях с файлами.
+
+    Каждая пара синхронизации опрашивается в своём потоке с адаптивным интервалом
+    (см. `SyncScheduler`): пока изменения идут, итерации следуют через
+    POLL_MIN_INTERVAL секунд, в простое интервал растёт до POLL_MAX_INTERVAL. Повтор
+    операций из журнала и проверка файлов, загрузка которых отложена до завершения
+    записи, не откладываются дольше назначенного времени.
+
+    Операции всех пар выполняются общим пулом потоков по очереди (см. `run_pairs`);
+    за один ход пара выполняет операции не более чем над PAIR_TURN_OPERATIONS
+    файлами (см. `load_pairs`).
+
+    Args:
+        pairs (list): Пары SyncPair (по умолчанию из SYNC_PAIRS).
     """
     logger.info("Начало infinite_loop")
-    data_disk = {}
-    attribute = Connector()
+    pairs = pairs or load_pairs()
+    # Ошибка в цикле любой пары завершает программу
+    raise run_pairs(pairs, poll_pair).get()
+
+
+def pair_moves(events):
+    """
+    Сопоставляет события перемещения директорий внутри пары по cookie.
+
+    Цепочка переименований одной директории сворачивается в одно перемещение.
+    Перемещения, затрагивающие поддерево другого перемещения, не сворачиваются:
+    такие директории синхронизируются как созданные и удалённые.
+
+    Args:
+        events (list): События WatchEvent одной пары.
+
+    Returns:
+        tuple: Словарь {новый путь: прежний путь} и признак того, что часть
+            перемещений пропущена.
+    """
+    sources = {}
+    moves = {}
+    for event in events:
+        if not event.is_dir:
+            continue
+        if event.kind == "moved_from":
+            sources[event.cookie] = event.name
+        elif event.kind == "moved_to" and event.cookie in sources:
+            source = sources.pop(event.cookie)
+            moves[event.name] = moves.pop(source, source)
+    moves = {path: source for path, source in moves.items() if path != source}
+    paths = set(moves).union(moves.values())
+    independent = {
+        path: source
+        for path, source in moves.items()
+        if not in_tree(parent_path(path), paths)
+        and not in_tree(parent_path(source), paths)
+    }
+    return independent, len(independent) < len(moves)
 
+
+def watch_changes(pair, events):
+    """
+    Синхронизирует изменения одной пары, полученные из событий inotify.
+
+    Args:
+        pair (SyncPair): Пара синхронизации.
+        events (list): События WatchEvent этой пары (без переполнения очереди).
+    """
+    if not events:
+        if pair.settle.waiting():
+            # Отложенные файлы проверяются повторно, журнал выполняется
+            # в той же итерации
+            sync_changes(
+                pair.connector,
+                pair.executor,
+                pair.settle.waiting(),
+                pair.settle,
+                limit=pair.turn_limit,
+            )
+        else:
+            run_queue(pair.db, pair.executor, limit=pair.turn_limit)
+        return
+
+    rules = pair.rules
+    if rules.refresh():
+        # Изменились правила исключения: ранее исключённые файлы нужно найти
+        logger.info("Правила исключения изменились, полная сверка")
+        pair.scheduler.request_reconcile()
+    events = [
+        event
+        for event in events
+        if event.name and not rules.match(event.name, event.is_dir)
+    ]
+    last_kind = {event.name: event.kind for event in events}
+    closed = {name for name, kind in last_kind.items() if kind == "close_write"}
+    names = last_kind.keys() | pair.settle.waiting()
+
+    # Перемещённая директория переносится на диске одним запросом до сверки
+    # изменившихся файлов: после перемещения её содержимое уже есть на диске
+    moves, skipped = pair_moves(events)
+    if skipped:
+        logger.info("Вложенные перемещения директорий, полная сверка")
+        pair.scheduler.request_reconcile()
+    if moves:
+        db = pair.db
+        with db.transaction():
+            remote = db.remote_read(moves.values())
+        moves = {
+            path: source
+            for path, source in moves.items()
+            if remote.get(source, {}).get("type") == "dir"
+            and os.path.isdir(os.path.join(pair.local, path))
+        }
+    if moves:
+        enqueue(db, dir_move_operations(moves), moves.keys())
+        run_queue(db, pair.executor, limit=pair.turn_limit)
+        with db.transaction():
+            pending = db.queue_names()
+        # Пока перемещение не выполнено, файлы обеих директорий не синхронизируются
+        # по отдельности, иначе прежняя директория удалилась бы, а новая загрузилась
+        waiting = {path: source for path, source in moves.items() if path in pending}
+        paths = set(waiting).union(waiting.values())
+        names = {name for name in names if not in_tree(name, paths)}
+
+    sync_changes(
+        pair.connector,
+        pair.executor,
+        names,
+        pair.settle,
+        closed,
+        pair.turn_limit,
+    )
+
+
+def watch_pair(pair, inbox):
+    """
+    Цикл синхронизации одной пары по событиям inotify.
+
+    Args:
+        pair (SyncPair): Пара синхронизации.
+        inbox (queue.Queue): Пакеты событий WatchEvent пары от `watch_loop`.
+    """
     while True:
-        logger.debug("Начало итерации цикла")
-        list_file = os.listdir(DIR_PATH)
-        files_on_disk = attribute.info()
-        logger.debug(f"Файлы в директории: {list_file}")
-        logger.debug(f"Файлы на диске (attribute.info()): {files_on_disk}")
-
-        # Обнаружение новых файлов
-        for file in list_file:
-            if file not in files_on_disk:
-                logger.info(f"Новый файл обнаружен: {file}")
-                path_file = path_generator(file)
-                attribute.load(f_path=file, path_file=path_file)
-                data_disk = update_file_time(file, data_disk)
-
-        # Обнаружение удаленных файлов
-        for file in files_on_disk:
-            if file not in list_file:
-                logger.info(f"Файл удален: {file}")
-                attribute.delete(f_path=file)
-
-        # Загрузка JSON данных
-        data_db = open_db()
-
-        if data_db is None:
-            data_db = {}
-
-        logger.debug(f"Текущий data_db: {data_db}")
-
-        # Проверка времени изменения файлов и обновление при необходимости
-        for file in list_file:
-            path_file = path_generator(file)
-            last_modified_time = get_last_modified_time(path_file)
-
-            if last_modified_time is not None:
-                if file in data_db and last_modified_time > data_db.get(file, ""):
-                    logger.info(f"Файл {file} нуждается в обновлении")
-                    attribute.reload(path_file=path_file, f_path=file)
-                    data_disk = update_file_time(
-                        file, data_disk
-                    )  # Обновляем время в data_disk
-                else:
-                    logger.debug(
-                        f"Файл {file} не нуждается в обновлении или отсутствует в data_db"
-                    )
-            else:
-                logger.warning(f"Не удалось получить время изменения для файла: {file}")
+        if pair.scheduler.reconcile_due():
+            changes = sync_cycle(
+                pair.connector,
+                pair.executor,
+                settle=pair.settle,
+                limit=pair.turn_limit,
+            )
+            pair.scheduler.reconciled(changes is not None)
+        get_metrics().log_summary()
 
-        # Обновляем data_db новыми данными из data_disk
-        if data_disk:
-            data_db.update(data_disk)
+        timeout = pair.scheduler.timeout(next_wakeup(pair.db, pair.settle))
+        try:
+            events = inbox.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            events = []
+        # Пакеты, накопившиеся за время итерации, обрабатываются вместе
+        while True:
+            try:
+                events = events + inbox.get_nowait()
+            except queue.Empty:
+                break
 
-        # Очистка и сохранение database
-        cleaned_data_db = clear_db(data_db, list_file)
-        download_db(cleaned_data_db)
+        if any(event.kind == "overflow" for event in events):
+            logger.warning("Очередь событий inotify переполнена, полная сверка")
+            pair.scheduler.request_reconcile()
+        if not pair.scheduler.reconcile_due():
+            watch_changes(pair, events)
 
-        # Очищаем data_disk после сохранения в db
-        data_disk = {}
 
-        logger.info("Конец итерации цикла")
-        sleep(5)  # Используем time.sleep() для задержки
+def watch_loop(pairs=None):
+    """
+    Цикл синхронизации по событиям inotify.
+
+    Изменения из директории сразу попадают в синхронизацию, а полная сверка директории
+    выполняется раз в RECONCILE_INTERVAL секунд и при переполнении очереди событий;
+    неудачная сверка повторяется с экспоненциальной задержкой (см. `SyncScheduler`).
+    Список файлов на диске при этом берётся из кэша и запрашивается заново
+    по расписанию REMOTE_RECONCILE_INTERVAL. Операции из журнала повторяются
+    в назначенное время, даже если событий нет.
+
+    Загрузка файла, который ещё записывается, откладывается до события close_write
+    или до окончания SETTLE_WINDOW без изменений (см. `SettleTracker`).
+
+    Все пары синхронизации отслеживаются одним наблюдателем inotify; события
+    распределяются по парам, каждая из которых синхронизируется в своём потоке
+    (см. `run_pairs`).
+
+    Args:
+        pairs (list): Пары SyncPair (по умолчанию из SYNC_PAIRS).
+    """
+    logger.info("Начало watch_loop")
+    pairs = pairs or load_pairs()
+    inboxes = {pair.local: queue.Queue() for pair in pairs}
+    watcher = InotifyWatcher()
+    for pair in pairs:
+        watcher.add_root(pair.local, pair.rules)
+    watcher.start()
+
+    try:
+        failures = run_pairs(pairs, lambda pair: watch_pair(pair, inboxes[pair.local]))
+        while failures.empty():
+            # Ожидание ограничено, чтобы ошибка в цикле пары не оставалась незамеченной
+            events = watcher.drain(timeout=1.0, debounce=WATCH_DEBOUNCE)
+            grouped = {}
+            for event in events:
+                if event.kind == "overflow" and event.root not in inboxes:
+                    # Переполнение общей очереди событий касается всех пар
+                    for root in inboxes:
+                        grouped.setdefault(root, []).append(event)
+                else:
+                    grouped.setdefault(event.root, []).append(event)
+            for root, batch in grouped.items():
+                inboxes[root].put(batch)
+        raise failures.get()
+    finally:
+        watcher.stop()
+
+
+def main():
+    """
+    Запускает синхронизацию в режиме, заданном WATCH_MODE.
+
+    В режиме "auto" используется inotify, если он доступен, иначе опрос директории.
+    Если задан METRICS_PORT, метрики доступны по HTTP в формате Prometheus.
+    """
+    setup_logging()
+    start_metrics_server()
+    if WATCH_MODE != "poll" and inotify_available():
+        watch_loop()
+    else:
+        if WATCH_MODE == "inotify":
+            logger.warning("inotify недоступен, используется опрос директории")
+        infinite_loop()
 
 
 if __name__ == "__main__":
-    infinite_loop()
+    main()
@@ -1,5 +1,290 @@
+import datetime
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from sqlite3 import IntegrityError
+from typing import NamedTuple
+
+from loguru import logger
+
+from config import DB_FILE
+from scanner import DirState
+
+# Настройки SQLite для долгоживущего соединения: журнал WAL и синхронизация NORMAL
+# дают одну запись в журнал на транзакцию вместо fsync основного файла на каждый коммит
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+# Полное описание таблицы files. Столбец datetime сохранён для совместимости
+# с прежним форматом и `sql_req`, остальные столбцы добавлены миграцией 1
+FILES_COLUMNS = (
+    ("size", "INTEGER"),
+    ("mtime_ns", "INTEGER"),
+    ("inode", "INTEGER"),
+    ("hash", "TEXT"),
+    ("remote_md5", "TEXT"),
+    ("revision", "INTEGER"),
+    ("status", "TEXT NOT NULL DEFAULT 'synced'"),
+    ("synced_at", "REAL"),
+)
+
+
+class UploadState(NamedTuple):
+    """
+    Состояние незавершённой возобновляемой загрузки.
+
+    Attributes:
+        name (str): Имя файла на диске.
+        href (str): Ссылка для загрузки, выданная API.
+        expires_at (float): Время (Unix time), до которого действует ссылка.
+        size (int): Размер загружаемой версии файла в байтах.
+        mtime_ns (int): Время изменения загружаемой версии в наносекундах.
+        offset (int): Число байт, получение которых подтвердил сервер.
+    """
+
+    name: str
+    href: str
+    expires_at: float
+    size: int
+    mtime_ns: int
+    offset: int
+
+
+class QueueEntry(NamedTuple):
+    """
+    Операция из журнала операций синхронизации.
+
+    Attributes:
+        id (int): Идентификатор записи журнала.
+        kind (str): Тип операции ("load", "reload", "delete", "move" или "copy").
+        name (str): Имя файла на диске.
+        path_file (str): Полный путь к локальному файлу.
+        source (str): Имя файла-источника на диске (для перемещения и копирования).
+        attempts (int): Число неудачных попыток выполнения.
+    """
+
+    id: int
+    kind: str
+    name: str
+    path_file: str
+    source: str
+    attempts: int
+
+
+class FileState(NamedTuple):
+    """
+    Сохранённое состояние синхронизированного файла.
+
+    Attributes:
+        filename (str): Имя файла.
+        size (int): Размер загруженной версии в байтах.
+        mtime_ns (int): Время изменения загруженной версии в наносекундах.
+        inode (int): Номер inode локального файла.
+        hash (str): Хэш содержимого локального файла.
+        remote_md5 (str): MD5 файла на диске по данным API.
+        revision (int): Ревизия файла на диске по данным API.
+        status (str): Результат последней синхронизации ("synced" или "failed").
+    """
+
+    filename: str
+    size: int
+    mtime_ns: int
+    inode: int
+    hash: str
+    remote_md5: str
+    revision: int
+    status: str
+
+
+def parse_mtime(value):
+    """
+    Преобразует время в формате 'YYYY-MM-DD HH:MM:SS[.nnnnnnnnn]' в наносекунды.
+
+    Args:
+        value (str): Время в формате базы данных.
+
+    Returns:
+        int: Время в наносекундах или None, если строку разобрать не удалось.
+    """
+    seconds, _, fraction = value.partition(".")
+    try:
+        timestamp = datetime.datetime.strptime(seconds, "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+    return int(timestamp) * 1_000_000_000 + int(fraction.ljust(9, "0")[:9] or 0)
+
+
+def _migration_1(cursor):
+    """
+    Расширяет таблицу files состоянием файла: размер, mtime_ns, inode, хэш,
+    MD5 и ревизия на диске, статус последней синхронизации.
+
+    Для строк прежнего формата mtime_ns восстанавливается из столбца datetime,
+    а размер остаётся пустым: такие строки дозаполняются при следующей сверке.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS files (
+            filename TEXT PRIMARY KEY NOT NULL ,
+            datetime TEXT NOT NULL
+        )
+    """
+    )
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(files)")}
+    for column, definition in FILES_COLUMNS:
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE files ADD COLUMN {column} {definition}")
+    rows = cursor.execute(
+        "SELECT filename, datetime FROM files WHERE mtime_ns IS NULL"
+    ).fetchall()
+    cursor.executemany(
+        "UPDATE files SET mtime_ns = ? WHERE filename = ?",
+        ((parse_mtime(value), filename) for filename, value in rows),
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_inode ON files (inode)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files (hash)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_files_status ON files (status)")
+
+
+def _migration_2(cursor):
+    """
+    Добавляет кэш состояния директории на диске (таблица remote) и таблицу
+    служебных значений meta.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS remote (
+            name TEXT PRIMARY KEY NOT NULL,
+            type TEXT,
+            size INTEGER,
+            modified TEXT,
+            md5 TEXT,
+            sha256 TEXT,
+            revision INTEGER
+        )
+    """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY NOT NULL,
+            value TEXT
+        )
+    """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_remote_md5 ON remote (md5)")
+
+
+def _migration_3(cursor):
+    """
+    Добавляет индекс по размеру ресурсов на диске для поиска файлов с тем же содержимым.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_remote_size ON remote (size)")
+
+
+def _migration_4(cursor):
+    """
+    Добавляет таблицу uploads с состоянием незавершённых возобновляемых загрузок.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS uploads (
+            name TEXT PRIMARY KEY NOT NULL,
+            href TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            offset INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+
+
+def _migration_5(cursor):
+    """
+    Добавляет журнал операций синхронизации (таблица queue).
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            path_file TEXT,
+            source TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL
+        )
+    """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_queue_name ON queue (name)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_queue_status ON queue (status, next_attempt_at)"
+    )
+
+
+def _migration_6(cursor):
+    """
+    Добавляет таблицу dirs с отпечатками синхронизированных директорий.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY NOT NULL,
+            fingerprint TEXT NOT NULL,
+            aggregate TEXT NOT NULL
+        )
+    """
+    )
+
+
+def _migration_7(cursor):
+    """
+    Добавляет таблицу unrestored с файлами, которые восстановление не скачало с диска.
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS unrestored (
+            name TEXT PRIMARY KEY NOT NULL
+        )
+    """
+    )
+
+
+def _migration_8(cursor):
+    """
+    Добавляет в таблицу dirs номер inode директории для поиска переименованных
+    директорий.
+    """
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(dirs)")}
+    if "inode" not in existing:
+        cursor.execute("ALTER TABLE dirs ADD COLUMN inode INTEGER")
+
+
+# Миграции схемы по порядку; номер версии схемы хранится в PRAGMA user_version
+MIGRATIONS = (
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+    _migration_8,
+)
+
+# Столбцы кэша состояния диска, совпадают с полями ресурса в ответе API
+REMOTE_COLUMNS = ("name", "type", "size", "modified", "md5", "sha256", "revision")
 
 
 class DatabaseManager:
@@ -7,32 +292,94 @@ class DatabaseManager:
         self.db_name = db_name
         self.cursor = None
         self.connection = None
+        self._lock = threading.RLock()
+        self._depth = 0
 
-    def __enter__(self):
+    def connect(self):
         """
-        Устанавливает соединение с базой данных при входе в контекстный менеджер.
+        Открывает соединение с базой данных, если оно ещё не открыто.
+
+        Соединение живёт до вызова `close` и используется всеми последующими запросами.
 
         Returns:
             self: возвращает экземпляр DatabaseManager
         """
+        with self._lock:
+            if self.connection is not None:
+                return self
+            self.connection = sqlite3.connect(self.db_name, check_same_thread=False)
+            self.cursor = self.connection.cursor()
+            for pragma in PRAGMAS:
+                self.cursor.execute(pragma)
+
+            self._migrate()
+            self.connection.commit()
+            return self
 
-        self.connection = sqlite3.connect(self.db_name)
-        self.cursor = self.connection.cursor()
+    def _migrate(self):
+        """
+        Применяет к базе данных миграции схемы, которые ещё не были применены.
+        """
+        version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(self.cursor)
+            self.cursor.execute(f"PRAGMA user_version = {number}")
+            self.connection.commit()
 
-        self.cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS files (
-                filename TEXT PRIMARY KEY NOT NULL ,
-                datetime TEXT NOT NULL
-            )
+    def close(self):
+        """
+        Закрывает соединение с базой данных.
+        """
+        with self._lock:
+            if self.connection is None:
+                return
+            self.cursor.close()
+            self.connection.close()
+            self.cursor = None
+            self.connection = None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Выполняет блок запросов в одной транзакции.
+
+        При выходе из блока транзакция фиксируется, при исключении — откатывается.
+        Вложенные вызовы выполняются в рамках внешней транзакции.
+
+        Yields:
+            DatabaseManager: текущий экземпляр
+        """
+        with self._lock:
+            self.connect()
+            self._depth += 1
+            try:
+                yield self
+            except Exception:
+                if self._depth == 1:
+                    self.connection.rollback()
+                raise
+            else:
+                if self._depth == 1:
+                    self.connection.commit()
+            finally:
+                self._depth -= 1
+
+    def __enter__(self):
+        """
+        Устанавливает соединение с базой данных при входе в контекстный менеджер.
+
+        Returns:
+            self: возвращает экземпляр DatabaseManager
         """
-        )
 
-        return self
+        self._lock.acquire()
+        return self.connect()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        Закрывает соединение с базой данных при выходе из контекстного менеджера.
+        Фиксирует или откатывает изменения при выходе из контекстного менеджера.
+
+        Соединение остаётся открытым для последующих запросов.
 
         Returns:
             exc_type: Тип исключения, если оно возникло
@@ -40,12 +387,13 @@ class DatabaseManager:
             exc_tb: Трассировка исключения, если оно возникло
 
         """
-        if exc_type:
-            self.connection.rollback()
-        else:
-            self.connection.commit()
-        self.cursor.close()
-        self.connection.close()
+        try:
+            if exc_type:
+                self.connection.rollback()
+            else:
+                self.connection.commit()
+        finally:
+            self._lock.release()
 
     def data_add(self, file_name, add_or_update_time):
         """
@@ -98,13 +446,770 @@ class DatabaseManager:
             "DELETE " "FROM files " "WHERE filename = ?", (file_name,)
         )
 
+    def data_delete_many(self, file_names):
+        """
+        Удаляет записи о файлах одним пакетным запросом.
+
+        Args:
+            file_names (iterable): Имена файлов, записи о которых нужно удалить.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "DELETE " "FROM files " "WHERE filename = ?",
+            ((file_name,) for file_name in file_names),
+        )
+
+    def load_scan(self, entries):
+        """
+        Загружает результат сканирования директории во временную таблицу scan.
+
+        Временная таблица хранится в памяти и позволяет сравнить локальное состояние
+        с сохранённым одним запросом с объединением по первичному ключу.
+
+        Args:
+            entries (iterable): Объекты FileEntry.
+        """
+
+        self.cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS scan ("
+            "filename TEXT PRIMARY KEY NOT NULL, size INTEGER, mtime_ns INTEGER, "
+            "inode INTEGER, is_dir INTEGER)"
+        )
+        self.cursor.execute("DELETE FROM scan")
+        self.cursor.executemany(
+            "INSERT INTO scan (filename, size, mtime_ns, inode, is_dir) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (entry.name, entry.size, entry.mtime_ns, entry.inode, entry.is_dir)
+                for entry in entries
+            ),
+        )
+
+    def dirty_files(self):
+        """
+        Находит файлы из таблицы scan, состояние которых отличается от сохранённого.
+
+        Returns:
+            dict: Словарь {имя файла: причина}, где причина —
+                "untracked" (файла нет в базе), "changed" (изменились размер или mtime,
+                либо прошлая синхронизация завершилась ошибкой) или
+                "adopt" (строка прежнего формата без размера, файл не изменялся).
+        """
+
+        self.cursor.execute(
+            "SELECT s.filename, CASE "
+            "WHEN f.filename IS NULL THEN 'untracked' "
+            "WHEN f.size IS NULL AND s.mtime_ns <= f.mtime_ns THEN 'adopt' "
+            "ELSE 'changed' END "
+            "FROM scan s LEFT JOIN files f ON f.filename = s.filename "
+            "WHERE s.is_dir = 0 AND (f.filename IS NULL "
+            "OR f.size IS NOT s.size OR f.mtime_ns IS NOT s.mtime_ns "
+            "OR f.status != 'synced')"
+        )
+        return dict(self.cursor.fetchall())
+
+    def missing_files(self, scope=None):
+        """
+        Находит файлы, которые есть в базе, но отсутствуют в таблице scan.
+
+        Args:
+            scope (iterable): Пути директорий, файлы которых сравниваются
+                ("" — корень); если не переданы, сравниваются все файлы.
+
+        Returns:
+            list: Имена файлов.
+        """
+
+        if scope is None:
+            self.cursor.execute(
+                "SELECT filename FROM files "
+                "WHERE filename NOT IN (SELECT filename FROM scan)"
+            )
+            return [row[0] for row in self.cursor.fetchall()]
+
+        self.cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS scan_dirs (prefix TEXT PRIMARY KEY NOT NULL)"
+        )
+        self.cursor.execute("DELETE FROM scan_dirs")
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO scan_dirs (prefix) VALUES (?)",
+            ((f"{path}/" if path else "",) for path in scope),
+        )
+        # rtrim отрезает от имени всё после последнего "/", оставляя путь родителя
+        self.cursor.execute(
+            "SELECT filename FROM files "
+            "WHERE rtrim(filename, replace(filename, '/', '')) "
+            "IN (SELECT prefix FROM scan_dirs) "
+            "AND filename NOT IN (SELECT filename FROM scan)"
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def file_states(self, file_names):
+        """
+        Читает сохранённое состояние указанных файлов.
+
+        Args:
+            file_names (iterable): Имена файлов.
+
+        Returns:
+            dict: Словарь {имя файла: FileState} для файлов, которые есть в базе.
+        """
+
+        states = {}
+        for file_name in file_names:
+            row = self.cursor.execute(
+                "SELECT filename, size, mtime_ns, inode, hash, remote_md5, revision, "
+                "status FROM files WHERE filename = ?",
+                (file_name,),
+            ).fetchone()
+            if row is not None:
+                states[file_name] = FileState(*row)
+        return states
+
+    def mark_synced(self, entries, remote=None, hashes=None):
+        """
+        Сохраняет состояние успешно синхронизированных файлов.
+
+        Args:
+            entries (iterable): Объекты FileEntry загруженных версий файлов.
+            remote (dict): Описания ресурсов на диске {имя: dict} для заполнения
+                MD5 и ревизии. Если не передано, MD5 на диске считается равным
+                хэшу загруженного содержимого.
+            hashes (dict): Известные MD5 содержимого файлов {имя: хэш}.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        hashes = hashes or {}
+        now = time.time()
+
+        def rows():
+            for entry in entries:
+                digest = hashes.get(entry.name)
+                if remote is None:
+                    remote_md5, revision = digest, None
+                else:
+                    item = remote.get(entry.name, {})
+                    remote_md5, revision = item.get("md5"), item.get("revision")
+                yield (
+                    entry.name,
+                    entry.mtime,
+                    entry.size,
+                    entry.mtime_ns,
+                    entry.inode,
+                    digest,
+                    remote_md5,
+                    revision,
+                    now,
+                )
+
+        return self.cursor.executemany(
+            "INSERT INTO files (filename, datetime, size, mtime_ns, inode, "
+            "hash, remote_md5, revision, status, synced_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'synced', ?) "
+            "ON CONFLICT (filename) DO UPDATE SET datetime = excluded.datetime, "
+            "size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "inode = excluded.inode, hash = excluded.hash, "
+            "remote_md5 = excluded.remote_md5, revision = excluded.revision, "
+            "status = 'synced', synced_at = excluded.synced_at",
+            rows(),
+        )
+
+    def mark_failed(self, file_names):
+        """
+        Отмечает неудачную синхронизацию файлов, которые уже есть в базе.
+
+        Args:
+            file_names (iterable): Имена файлов.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "UPDATE files SET status = 'failed' WHERE filename = ?",
+            ((file_name,) for file_name in file_names),
+        )
+
+    def update_remote(self, items):
+        """
+        Обновляет MD5 и ревизию файлов на диске по данным из списка ресурсов.
+
+        Записываются только строки, в которых значения изменились.
+
+        Args:
+            items (iterable): Описания ресурсов на диске.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "UPDATE files SET remote_md5 = ?, revision = ? WHERE filename = ? "
+            "AND (remote_md5 IS NOT ? OR revision IS NOT ?)",
+            (
+                (
+                    item.get("md5"),
+                    item.get("revision"),
+                    item["name"],
+                    item.get("md5"),
+                    item.get("revision"),
+                )
+                for item in items
+            ),
+        )
+
+    def remote_read(self, names=None):
+        """
+        Читает кэш состояния директории на диске.
+
+        Args:
+            names (iterable): Имена ресурсов; если не переданы, читается весь кэш.
+
+        Returns:
+            dict: Словарь {имя: описание ресурса} в формате ответа API.
+        """
+
+        query = f"SELECT {', '.join(REMOTE_COLUMNS)} FROM remote"
+        if names is None:
+            rows = self.cursor.execute(query).fetchall()
+        else:
+            rows = []
+            for name in names:
+                rows.extend(self.cursor.execute(f"{query} WHERE name = ?", (name,)))
+        return {row[0]: dict(zip(REMOTE_COLUMNS, row)) for row in rows}
+
+    def remote_by_size(self, sizes):
+        """
+        Находит на диске файлы указанных размеров с известным MD5.
+
+        Используется как индекс хэш -> имя на диске: хэш локального файла вычисляется,
+        только если на диске есть файл того же размера.
+
+        Args:
+            sizes (iterable): Размеры файлов в байтах.
+
+        Returns:
+            dict: Словарь {размер: {md5: имя на диске}}.
+        """
+
+        index = {}
+        for size in set(sizes):
+            rows = self.cursor.execute(
+                "SELECT name, md5 FROM remote "
+                "WHERE size = ? AND type = 'file' AND md5 IS NOT NULL",
+                (size,),
+            )
+            for name, md5 in rows:
+                index.setdefault(size, {}).setdefault(md5, name)
+        return index
+
+    def remote_upsert(self, items):
+        """
+        Добавляет или обновляет ресурсы в кэше состояния диска.
+
+        Строки, в которых ничего не изменилось, не перезаписываются.
+
+        Args:
+            items (iterable): Описания ресурсов в формате ответа API.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        columns = ", ".join(REMOTE_COLUMNS)
+        placeholders = ", ".join("?" for _ in REMOTE_COLUMNS)
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in REMOTE_COLUMNS[1:]
+        )
+        changed = " OR ".join(
+            f"remote.{column} IS NOT excluded.{column}" for column in REMOTE_COLUMNS[1:]
+        )
+        return self.cursor.executemany(
+            f"INSERT INTO remote ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT (name) DO UPDATE SET {updates} WHERE {changed}",
+            (tuple(item.get(column) for column in REMOTE_COLUMNS) for item in items),
+        )
+
+    def remote_delete(self, names):
+        """
+        Удаляет ресурсы из кэша состояния диска.
+
+        Args:
+            names (iterable): Имена ресурсов.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "DELETE FROM remote WHERE name = ?", ((name,) for name in names)
+        )
+
+    def remote_replace(self, items):
+        """
+        Заменяет кэш состояния диска полным списком ресурсов.
+
+        Записываются только новые и изменившиеся ресурсы, ресурсы, которых нет
+        в списке, удаляются.
+
+        Args:
+            items (dict): Словарь {имя: описание ресурса} из полного списка директории.
+        """
+
+        cached = self.remote_read()
+        self.remote_upsert(
+            item
+            for name, item in items.items()
+            if cached.get(name)
+            != {column: item.get(column) for column in REMOTE_COLUMNS}
+        )
+        self.remote_delete(cached.keys() - items.keys())
+
+    def upload_get(self, name):
+        """
+        Читает состояние незавершённой загрузки файла.
+
+        Args:
+            name (str): Имя файла на диске.
+
+        Returns:
+            UploadState: Состояние загрузки или None, если загрузки нет.
+        """
+
+        row = self.cursor.execute(
+            f"SELECT {', '.join(UploadState._fields)} FROM uploads WHERE name = ?",
+            (name,),
+        ).fetchone()
+        return None if row is None else UploadState(*row)
+
+    def upload_save(self, state):
+        """
+        Сохраняет состояние загрузки файла.
+
+        Args:
+            state (UploadState): Состояние загрузки.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        columns = ", ".join(UploadState._fields)
+        placeholders = ", ".join("?" for _ in UploadState._fields)
+        return self.cursor.execute(
+            f"INSERT OR REPLACE INTO uploads ({columns}) VALUES ({placeholders})",
+            tuple(state),
+        )
+
+    def upload_delete(self, name):
+        """
+        Удаляет состояние загрузки файла.
+
+        Args:
+            name (str): Имя файла на диске.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.execute("DELETE FROM uploads WHERE name = ?", (name,))
+
+    def queue_push(self, operations, scope=None):
+        """
+        Записывает операции в журнал операций синхронизации.
+
+        Список операций считается новым планом для файлов из `scope`: ожидающие
+        операции над файлом, план для которого не изменился, остаются в журнале вместе
+        со счётчиком попыток и временем повтора; остальные ожидающие операции над
+        файлами из `scope` заменяются новыми или удаляются.
+
+        Args:
+            operations (list): Операции с атрибутами kind, name, path_file и source.
+            scope (iterable): Имена файлов, для которых составлен план; если не переданы,
+                план составлен для всех файлов.
+
+        Returns:
+            int: Число добавленных операций.
+        """
+
+        planned = {}
+        for operation in operations:
+            planned.setdefault(operation.name, []).append(operation)
+
+        queued = {}
+        for name, kind, source in self.cursor.execute(
+            "SELECT name, kind, source FROM queue WHERE status = 'pending' ORDER BY id"
+        ):
+            queued.setdefault(name, []).append((kind, source))
+
+        names = queued.keys() if scope is None else queued.keys() & set(scope)
+        stale = [name for name in names if name not in planned]
+        replaced = []
+        added = []
+        for name, ops in planned.items():
+            plan = [(operation.kind, operation.source) for operation in ops]
+            if queued.get(name) == plan:
+                continue
+            if name in queued:
+                replaced.append(name)
+            added.extend(ops)
+
+        self.cursor.executemany(
+            "DELETE FROM queue WHERE name = ? AND status = 'pending'",
+            ((name,) for name in stale + replaced),
+        )
+        now = time.time()
+        self.cursor.executemany(
+            "INSERT INTO queue (kind, name, path_file, source, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    operation.kind,
+                    operation.name,
+                    operation.path_file,
+                    operation.source,
+                    now,
+                )
+                for operation in added
+            ),
+        )
+        return len(added)
+
+    def queue_claim(self, now=None, limit=None):
+        """
+        Забирает из журнала операции, готовые к выполнению, и отмечает их как выполняемые.
+
+        Операции над одним файлом забираются вместе и в порядке добавления, когда
+        наступило время повтора первой из них.
+
+        Args:
+            now (float): Текущее время (Unix time).
+            limit (int): Максимальное число файлов, операции над которыми забираются;
+                сначала забираются файлы, добавленные в журнал раньше.
+
+        Returns:
+            list: Список QueueEntry в порядке добавления.
+        """
+
+        now = time.time() if now is None else now
+        rows = self.cursor.execute(
+            f"SELECT {', '.join(QueueEntry._fields)} FROM queue "
+            "WHERE status = 'pending' AND name IN ("
+            "    SELECT name FROM queue WHERE status = 'pending' "
+            "    GROUP BY name HAVING MIN(next_attempt_at) <= ? "
+            "    ORDER BY MIN(id) LIMIT ?"
+            ") ORDER BY id",
+            (now, limit or -1),
+        ).fetchall()
+        entries = [QueueEntry(*row) for row in rows]
+        self.cursor.executemany(
+            "UPDATE queue SET status = 'running' WHERE id = ?",
+            ((entry.id,) for entry in entries),
+        )
+        return entries
+
+    def queue_complete(self, ids):
+        """
+        Удаляет выполненные операции из журнала.
+
+        Args:
+            ids (iterable): Идентификаторы записей журнала.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "DELETE FROM queue WHERE id = ?", ((entry_id,) for entry_id in ids)
+        )
+
+    def queue_retry(self, rows):
+        """
+        Возвращает невыполненные операции в журнал для повтора.
+
+        Args:
+            rows (iterable): Кортежи (id, время следующей попытки, описание ошибки).
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "UPDATE queue SET status = 'pending', attempts = attempts + 1, "
+            "next_attempt_at = ?, last_error = ? WHERE id = ?",
+            ((retry_at, error, entry_id) for entry_id, retry_at, error in rows),
+        )
+
+    def queue_next_attempt(self):
+        """
+        Возвращает время ближайшего повтора операции из журнала.
+
+        Returns:
+            float: Время (Unix time) или None, если журнал пуст.
+        """
+
+        return self.cursor.execute(
+            "SELECT MIN(next_attempt_at) FROM queue WHERE status = 'pending'"
+        ).fetchone()[0]
+
+    def queue_reset(self):
+        """
+        Возвращает в ожидание операции, выполнение которых прервал перезапуск процесса.
+
+        Returns:
+            int: Число операций в журнале.
+        """
+
+        self.cursor.execute(
+            "UPDATE queue SET status = 'pending' WHERE status = 'running'"
+        )
+        return self.cursor.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def queue_names(self):
+        """
+        Returns:
+            set: Имена файлов, операции над которыми есть в журнале.
+        """
+
+        return {
+            row[0] for row in self.cursor.execute("SELECT DISTINCT name FROM queue")
+        }
+
+    def queue_depth(self):
+        """
+        Returns:
+            int: Число операций в журнале.
+        """
+
+        return self.cursor.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def files_by_status(self):
+        """
+        Returns:
+            dict: Число файлов в базе по состояниям синхронизации {состояние: число}.
+        """
+
+        return dict(
+            self.cursor.execute("SELECT status, COUNT(*) FROM files GROUP BY status")
+        )
+
+    def dirs_read(self):
+        """
+        Читает сохранённые отпечатки директорий.
+
+        Returns:
+            dict: Словарь {путь директории: DirState}.
+        """
+
+        rows = self.cursor.execute(
+            "SELECT path, fingerprint, aggregate, inode FROM dirs"
+        )
+        return {row[0]: DirState(*row) for row in rows}
+
+    def dirs_save(self, states):
+        """
+        Сохраняет отпечатки директорий.
+
+        Args:
+            states (iterable): Объекты DirState.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "INSERT INTO dirs (path, fingerprint, aggregate, inode) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET fingerprint = excluded.fingerprint, "
+            "aggregate = excluded.aggregate, inode = excluded.inode "
+            "WHERE dirs.aggregate IS NOT excluded.aggregate "
+            "OR dirs.fingerprint IS NOT excluded.fingerprint "
+            "OR dirs.inode IS NOT excluded.inode",
+            (
+                (state.path, state.fingerprint, state.aggregate, state.inode)
+                for state in states
+            ),
+        )
+
+    def dirs_delete(self, paths):
+        """
+        Удаляет отпечатки директорий, чтобы при следующей сверке они были проверены.
+
+        Args:
+            paths (iterable): Пути директорий.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "DELETE FROM dirs WHERE path = ?", ((path,) for path in paths)
+        )
+
+    def dirs_clear(self):
+        """
+        Удаляет все отпечатки директорий: следующая сверка проверит всё дерево.
+        """
+
+        self.cursor.execute("DELETE FROM dirs")
+
+    def forget_tree(self, names):
+        """
+        Удаляет записи о файлах, ресурсах на диске и отпечатки директорий
+        для указанных путей и всего их содержимого.
+
+        Args:
+            names (iterable): Пути файлов или директорий.
+        """
+
+        # Диапазон [имя + "/", имя + "0") — все пути внутри директории, "0" следует за "/"
+        rows = [(name, f"{name}/", f"{name}0") for name in names]
+        for table, column in (
+            ("files", "filename"),
+            ("remote", "name"),
+            ("dirs", "path"),
+        ):
+            self.cursor.executemany(
+                f"DELETE FROM {table} WHERE {column} = ? "
+                f"OR ({column} >= ? AND {column} < ?)",
+                rows,
+            )
+
+    def unrestored_read(self):
+        """
+        Returns:
+            set: Имена файлов, которые восстановление не скачало с диска.
+        """
+
+        return {row[0] for row in self.cursor.execute("SELECT name FROM unrestored")}
+
+    def unrestored_replace(self, names):
+        """
+        Заменяет список файлов, которые восстановление не скачало с диска.
+
+        Args:
+            names (iterable): Имена файлов.
+        """
+
+        self.cursor.execute("DELETE FROM unrestored")
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO unrestored (name) VALUES (?)",
+            ((name,) for name in names),
+        )
+
+    def unrestored_delete(self, names):
+        """
+        Удаляет файлы из списка не восстановленных, например после их загрузки.
+
+        Args:
+            names (iterable): Имена файлов.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.executemany(
+            "DELETE FROM unrestored WHERE name = ?", ((name,) for name in names)
+        )
+
+    def rename_tree(self, moves):
+        """
+        Переносит записи о файлах, ресурсах на диске и не восстановленных файлах
+        перемещённых директорий на новые пути.
+
+        Отпечатки обеих директорий удаляются: при следующей сверке их содержимое
+        сравнивается с перенесёнными записями.
+
+        Args:
+            moves (iterable): Пары (прежний путь, новый путь) директорий.
+        """
+
+        for source, target in moves:
+            # Диапазон [путь + "/", путь + "0") — все пути внутри директории
+            bounds = (source, f"{source}/", f"{source}0")
+            for table, column in (
+                ("files", "filename"),
+                ("remote", "name"),
+                ("unrestored", "name"),
+            ):
+                self.cursor.execute(
+                    f"UPDATE OR REPLACE {table} "
+                    f"SET {column} = ? || substr({column}, ?) "
+                    f"WHERE {column} = ? OR ({column} >= ? AND {column} < ?)",
+                    (target, len(source) + 1, *bounds),
+                )
+            self.cursor.executemany(
+                "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (bounds, (target, f"{target}/", f"{target}0")),
+            )
+
+    def get_meta(self, key, default=None):
+        """
+        Читает служебное значение.
+
+        Args:
+            key (str): Ключ.
+            default: Значение по умолчанию.
+
+        Returns:
+            str: Сохранённое значение или `default`.
+        """
+
+        row = self.cursor.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        """
+        Сохраняет служебное значение.
+
+        Args:
+            key (str): Ключ.
+            value: Значение.
+
+        Returns:
+            sqlite3.Cursor: Объект курсора, используемый для выполнения SQL-запросов.
+        """
+
+        return self.cursor.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
     def data_read(self):
-        self.cursor.execute("SELECT * " "FROM files")
+        self.cursor.execute("SELECT filename, datetime " "FROM files")
         data = self.cursor.fetchall()
         files = {elem[0]: elem[1] for elem in data}
         return files
 
 
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(db_name=None):
+    """
+    Возвращает общий для процесса экземпляр DatabaseManager с открытым соединением.
+
+    Args:
+        db_name (str): Путь к файлу базы данных (по умолчанию DB_FILE).
+
+    Returns:
+        DatabaseManager: Долгоживущий менеджер базы данных.
+    """
+    db_name = db_name or DB_FILE
+    with _databases_lock:
+        if db_name not in _databases:
+            _databases[db_name] = DatabaseManager(db_name).connect()
+        return _databases[db_name]
+
+
 def sql_req(func, **kwargs):
     """
     Выполняет SQL-запросы к базе данных на основе переданных аргументов.
@@ -136,8 +1241,8 @@ def sql_req(func, **kwargs):
     data = {"func": func}
     for key, value in kwargs.items():
         data.update({f"{key}": f"{value}"})
-    print(data)
-    with DatabaseManager("database.db") as db:
+    logger.debug("sql_req: {}", data)
+    with get_database() as db:
         if func in ("add", "update"):
             return db.data_add(
                 file_name=data["file"],
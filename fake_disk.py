@@ -0,0 +1,590 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlparse
+
+# Размер блока чтения тела запроса на загрузку
+READ_SIZE = 256 * 1024
+
+
+class StoredFile(NamedTuple):
+    """
+    Файл на имитируемом диске.
+
+    Attributes:
+        size (int): Размер файла в байтах.
+        md5 (str): MD5 содержимого.
+        sha256 (str): SHA-256 содержимого.
+        blob (str): Путь к файлу с содержимым в хранилище имитации.
+    """
+
+    size: int
+    md5: str
+    sha256: str
+    blob: str = None
+
+
+class _Upload:
+    """
+    Состояние загрузки по выданной ссылке.
+    """
+
+    def __init__(self, path, part):
+        self.path = path
+        self.part = part
+        self.offset = 0
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.lock = threading.Lock()
+
+    def write(self, start, chunks):
+        """
+        Записывает принятые блоки в файл части, начиная со смещения `start`.
+        Нулевые блоки пропускаются, поэтому разреженные файлы не занимают место.
+        """
+        with open(self.part, "r+b" if os.path.exists(self.part) else "wb") as f:
+            f.seek(start)
+            for data in chunks:
+                if data.strip(b"\0"):
+                    f.write(data)
+                else:
+                    f.seek(len(data), os.SEEK_CUR)
+                yield data
+            f.truncate(f.tell())
+
+
+class FakeDisk:
+    """
+    Состояние имитируемого Яндекс.Диска и параметры имитации сети.
+
+    Содержимое загруженных файлов хранится в директории `store` под именем
+    SHA-256, поэтому копии файла не занимают места.
+
+    Attributes:
+        store (str): Директория с содержимым файлов.
+        latency (float): Задержка перед обработкой каждого запроса в секундах.
+        bandwidth (float): Общая для всех соединений полоса передачи файлов в байтах
+            в секунду (приём и отдача); 0 — без ограничения.
+        error_rate (float): Доля запросов, на которые отвечается 503.
+        operation_delay (float): Время выполнения асинхронной операции в секундах.
+        stats (dict): Счётчики запросов по типам, принятых и отданных байт.
+    """
+
+    def __init__(
+        self,
+        root="/",
+        latency=0.0,
+        bandwidth=0.0,
+        error_rate=0.0,
+        operation_delay=0.2,
+        store=None,
+    ):
+        if store is None:
+            self._store = tempfile.TemporaryDirectory(prefix="fake-disk-")
+            store = self._store.name
+        self.store = store
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.operation_delay = operation_delay
+        self.files = {}
+        self.dirs = {"/"}
+        self.uploads = {}
+        self.downloads = {}
+        self.operations = {}
+        self.stats = {"calls": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+        self.lock = threading.Lock()
+        self._link_free_at = 0.0
+        self._random = random.Random(0)
+        path = ""
+        for part in root.strip("/").split("/"):
+            if part:
+                path = f"{path}/{part}"
+                self.dirs.add(path)
+
+    def count(self, kind, amount=1):
+        with self.lock:
+            self.stats[kind] = self.stats.get(kind, 0) + amount
+
+    def fail(self):
+        """
+        Решает, ответить ли на запрос ошибкой 503.
+        """
+        if not self.error_rate:
+            return False
+        with self.lock:
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        return failed
+
+    def pace(self, size):
+        """
+        Ожидает, пока через общую полосу не пройдут `size` байт.
+        """
+        if not self.bandwidth:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self._link_free_at)
+            self._link_free_at = start + size / self.bandwidth
+            delay = self._link_free_at - now
+        time.sleep(delay)
+
+    def children(self, path):
+        prefix = "" if path == "/" else path
+        return sorted(
+            name
+            for name in list(self.files) + list(self.dirs)
+            if name != path and name.rpartition("/")[0] == prefix
+        )
+
+    def describe(self, path):
+        name = path.rpartition("/")[2]
+        if path in self.dirs:
+            return {"name": name, "path": f"disk:{path}", "type": "dir"}
+        stored = self.files[path]
+        return {
+            "name": name,
+            "path": f"disk:{path}",
+            "type": "file",
+            "size": stored.size,
+            "md5": stored.md5,
+            "sha256": stored.sha256,
+        }
+
+    def remove_tree(self, path):
+        prefix = f"{path}/"
+        for name in [name for name in self.files if name.startswith(prefix)]:
+            del self.files[name]
+        for name in [name for name in self.dirs if name.startswith(prefix)]:
+            self.dirs.discard(name)
+        self.dirs.discard(path)
+        self.files.pop(path, None)
+
+
+def normalize(path):
+    path = path.removeprefix("disk:").removeprefix("app:")
+    return "/" + path.strip("/")
+
+
+class FakeDiskHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов к имитируемому REST API Диска: список ресурсов, создание
+    директорий, удаление, копирование и перемещение, ссылки на загрузку, загрузка
+    файлов (в том числе частями с заголовком Content-Range), ссылки на скачивание,
+    скачивание (в том числе частями с заголовком Range) и статус операций.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disk = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def error(self, status, name):
+        self.send_json(status, {"error": name, "description": name})
+
+    def iter_body(self):
+        """
+        Читает тело запроса блоками, в том числе в формате chunked.
+        """
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                while size:
+                    data = self.rfile.read(min(size, READ_SIZE))
+                    size -= len(data)
+                    yield data
+                self.rfile.readline()
+        remaining = int(self.headers.get("Content-Length") or 0)
+        while remaining:
+            data = self.rfile.read(min(remaining, READ_SIZE))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+    def do_GET(self):
+        self.route("GET")
+
+    def do_PUT(self):
+        self.route("PUT")
+
+    def do_POST(self):
+        self.route("POST")
+
+    def do_DELETE(self):
+        self.route("DELETE")
+
+    def route(self, method):
+        disk = self.disk
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/_stats":
+            with disk.lock:
+                return self.send_json(200, dict(disk.stats))
+
+        disk.count("calls")
+        if disk.latency:
+            time.sleep(disk.latency)
+
+        if url.path.startswith("/upload/") and method == "PUT":
+            return self.upload(url.path.rpartition("/")[2])
+        if url.path.startswith("/download/") and method == "GET":
+            return self.download(url.path.rpartition("/")[2])
+        if disk.fail():
+            return self.send_json(503, {"error": "ServiceUnavailable"})
+
+        routes = {
+            ("GET", "/v1/disk/resources"): self.list_resource,
+            ("PUT", "/v1/disk/resources"): self.mkdir,
+            ("DELETE", "/v1/disk/resources"): self.delete,
+            ("GET", "/v1/disk/resources/upload"): self.upload_href,
+            ("GET", "/v1/disk/resources/download"): self.download_href,
+            ("POST", "/v1/disk/resources/copy"): self.copy,
+            ("POST", "/v1/disk/resources/move"): self.copy,
+        }
+        handler = routes.get((method, url.path))
+        if handler is not None:
+            return handler(query, url.path)
+        if url.path.startswith("/v1/disk/operations/"):
+            return self.operation(url.path.rpartition("/")[2])
+        self.error(404, "NotFound")
+
+    def list_resource(self, query, _):
+        disk = self.disk
+        disk.count("list")
+        path = normalize(query["path"])
+        with disk.lock:
+            if path not in disk.dirs and path not in disk.files:
+                return self.error(404, "DiskNotFoundError")
+            body = disk.describe(path)
+            if path in disk.dirs:
+                offset = int(query.get("offset", 0))
+                limit = int(query.get("limit", 20))
+                names = disk.children(path)
+                body["_embedded"] = {
+                    "items": [
+                        disk.describe(name) for name in names[offset : offset + limit]
+                    ],
+                    "total": len(names),
+                    "offset": offset,
+                    "limit": limit,
+                }
+        self.send_json(200, body)
+
+    def mkdir(self, query, _):
+        disk = self.disk
+        disk.count("mkdir")
+        path = normalize(query["path"])
+        with disk.lock:
+            if path in disk.dirs:
+                return self.error(409, "DiskPathPointsToExistentDirectoryError")
+            if (path.rpartition("/")[0] or "/") not in disk.dirs:
+                return self.error(409, "DiskPathDoesntExistsError")
+            disk.dirs.add(path)
+        self.send_json(201, {"href": "", "method": "GET"})
+
+    def delete(self, query, _):
+        disk = self.disk
+        disk.count("delete")
+        path = normalize(query["path"])
+        with disk.lock:
+            if path in disk.files:
+                del disk.files[path]
+                return self.send_json(204)
+            if path not in disk.dirs:
+                return self.error(404, "DiskNotFoundError")
+            disk.remove_tree(path)
+            operation = uuid.uuid4().hex
+            disk.operations[operation] = time.monotonic() + disk.operation_delay
+        self.send_json(202, {"href": self.link(f"/v1/disk/operations/{operation}")})
+
+    def copy(self, query, path):
+        disk = self.disk
+        move = path.endswith("/move")
+        disk.count("move" if move else "copy")
+        source = normalize(query["from"])
+        target = normalize(query["path"])
+        overwrite = query.get("overwrite", "false").lower() == "true"
+        with disk.lock:
+            if source not in disk.files and source not in disk.dirs:
+                return self.error(404, "DiskNotFoundError")
+            if (target.rpartition("/")[0] or "/") not in disk.dirs:
+                return self.error(409, "DiskPathDoesntExistsError")
+            if (target in disk.files or target in disk.dirs) and not overwrite:
+                return self.error(409, "DiskResourceAlreadyExistsError")
+            disk.remove_tree(target)
+            prefix = f"{source}/"
+            for name in [
+                name for name in disk.files if name == source or name.startswith(prefix)
+            ]:
+                disk.files[target + name[len(source) :]] = disk.files[name]
+            for name in [
+                name for name in disk.dirs if name == source or name.startswith(prefix)
+            ]:
+                disk.dirs.add(target + name[len(source) :])
+            if move:
+                disk.remove_tree(source)
+        self.send_json(201, {"href": "", "method": "GET"})
+
+    def upload_href(self, query, _):
+        disk = self.disk
+        disk.count("upload_href")
+        path = normalize(query["path"])
+        overwrite = query.get("overwrite", "false").lower() == "true"
+        with disk.lock:
+            if (path.rpartition("/")[0] or "/") not in disk.dirs:
+                return self.error(409, "DiskPathDoesntExistsError")
+            if path in disk.files and not overwrite:
+                return self.error(409, "DiskResourceAlreadyExistsError")
+            token = uuid.uuid4().hex
+            disk.uploads[token] = _Upload(path, os.path.join(disk.store, f".{token}"))
+        self.send_json(
+            200,
+            {
+                "href": self.link(f"/upload/{token}"),
+                "method": "PUT",
+                "templated": False,
+            },
+        )
+
+    def upload(self, token):
+        disk = self.disk
+        disk.count("upload")
+        upload = disk.uploads.get(token)
+        if upload is None:
+            for _ in self.iter_body():
+                pass
+            return self.error(404, "UploadNotFound")
+
+        content_range = self.headers.get("Content-Range")
+        with upload.lock:
+            start, total = 0, None
+            if content_range:
+                spec, _, size = content_range.removeprefix("bytes ").partition("/")
+                total = int(size)
+                if spec == "*":
+                    # Запрос подтверждённого смещения
+                    for _ in self.iter_body():
+                        pass
+                    return self.confirm(upload, token, total)
+                start = int(spec.split("-")[0])
+                if start != upload.offset:
+                    for _ in self.iter_body():
+                        pass
+                    return self.error(416, "RangeNotSatisfiable")
+
+            md5 = upload.md5.copy()
+            sha256 = upload.sha256.copy()
+            received = 0
+            for data in upload.write(start, self.iter_body()):
+                disk.pace(len(data))
+                md5.update(data)
+                sha256.update(data)
+                received += len(data)
+            disk.count("bytes_in", received)
+            if disk.fail():
+                return self.send_json(503, {"error": "ServiceUnavailable"})
+            upload.md5, upload.sha256 = md5, sha256
+            upload.offset = start + received
+            return self.confirm(upload, token, total)
+
+    def confirm(self, upload, token, total):
+        disk = self.disk
+        if total is not None and upload.offset < total:
+            headers = {"Content-Length": "0"}
+            self.send_response(308)
+            if upload.offset:
+                self.send_header("Range", f"bytes=0-{upload.offset - 1}")
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            return
+        sha256 = upload.sha256.hexdigest()
+        blob = os.path.join(disk.store, sha256)
+        if os.path.exists(upload.part):
+            os.replace(upload.part, blob)
+        else:
+            # Пустой файл
+            open(blob, "wb").close()
+        with disk.lock:
+            disk.files[upload.path] = StoredFile(
+                upload.offset, upload.md5.hexdigest(), sha256, blob
+            )
+            disk.uploads.pop(token, None)
+        self.send_json(201)
+
+    def download_href(self, query, _):
+        disk = self.disk
+        disk.count("download_href")
+        path = normalize(query["path"])
+        with disk.lock:
+            stored = disk.files.get(path)
+            if stored is None:
+                return self.error(404, "DiskNotFoundError")
+            token = uuid.uuid4().hex
+            disk.downloads[token] = stored
+        self.send_json(
+            200,
+            {
+                "href": self.link(f"/download/{token}"),
+                "method": "GET",
+                "templated": False,
+            },
+        )
+
+    def download(self, token):
+        disk = self.disk
+        disk.count("download")
+        stored = disk.downloads.get(token)
+        if stored is None:
+            return self.error(404, "DownloadNotFound")
+        if disk.fail():
+            return self.send_json(503, {"error": "ServiceUnavailable"})
+
+        start, end = 0, stored.size - 1
+        match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+        if match and stored.size:
+            first, last = match.groups()
+            if first:
+                start = int(first)
+                end = min(int(last), end) if last else end
+            elif last:
+                start = max(0, stored.size - int(last))
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{stored.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        length = end - start + 1
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{stored.size}")
+        self.end_headers()
+        with open(stored.blob, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    # Конец разреженного файла
+                    data = bytes(min(READ_SIZE, remaining))
+                disk.pace(len(data))
+                self.wfile.write(data)
+                remaining -= len(data)
+        disk.count("bytes_out", length)
+
+    def operation(self, operation):
+        disk = self.disk
+        disk.count("operation")
+        ready = disk.operations.get(operation)
+        if ready is None:
+            return self.error(404, "NotFound")
+        status = "success" if time.monotonic() >= ready else "in-progress"
+        self.send_json(200, {"status": status})
+
+    def link(self, path):
+        return f"http://{self.headers['Host']}{path}"
+
+
+def serve(
+    host="127.0.0.1",
+    port=0,
+    root="/",
+    latency=0.0,
+    bandwidth=0.0,
+    error_rate=0.0,
+    operation_delay=0.2,
+    store=None,
+):
+    """
+    Запускает имитацию REST API Диска в фоновом потоке.
+
+    Args:
+        host (str): Адрес для прослушивания.
+        port (int): Порт (0 — выбрать свободный).
+        root (str): Директория на диске, которая создаётся при запуске.
+        latency (float): Задержка перед обработкой каждого запроса в секундах.
+        bandwidth (float): Полоса передачи файлов в байтах в секунду; 0 — без
+            ограничения.
+        error_rate (float): Доля запросов, на которые отвечается 503.
+        operation_delay (float): Время выполнения асинхронной операции в секундах.
+        store (str): Директория для содержимого файлов (по умолчанию временная,
+            удаляется при завершении).
+
+    Returns:
+        ThreadingHTTPServer: Запущенный сервер; состояние диска — в `server.disk`,
+            URL API — в `server.url`.
+    """
+    disk = FakeDisk(root, latency, bandwidth, error_rate, operation_delay, store)
+    handler = type("Handler", (FakeDiskHandler,), {"disk": disk})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.disk = disk
+    server.url = f"http://{host}:{server.server_address[1]}/v1/disk/resources"
+    threading.Thread(target=server.serve_forever, name="fake-disk", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Имитация REST API Яндекс.Диска")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--root", default="/")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--operation-delay", type=float, default=0.2)
+    parser.add_argument("--store", help="директория для содержимого файлов")
+    args = parser.parse_args()
+    # При завершении по SIGTERM временное хранилище удаляется
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server = serve(
+        args.host,
+        args.port,
+        args.root,
+        args.latency,
+        args.bandwidth,
+        args.error_rate,
+        args.operation_delay,
+        args.store,
+    )
+    # Первая строка вывода — URL API, по ней запускающий процесс находит сервер
+    print(server.url, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+from functools import lru_cache
+
+from loguru import logger
+
+from config import HASH_CACHE_SIZE
+
+# Размер блока чтения файла при вычислении хэша
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path, algorithm="md5", chunk_size=HASH_CHUNK_SIZE):
+    """
+    Вычисляет хэш содержимого файла, читая его блоками через один буфер.
+
+    Алгоритмы md5 и sha256 совпадают с теми, что API диска возвращает для ресурсов.
+
+    Args:
+        path (str): Полный путь к файлу.
+        algorithm (str): Алгоритм хэширования ("md5" или "sha256").
+        chunk_size (int): Размер блока чтения в байтах.
+
+    Returns:
+        str: Хэш в шестнадцатеричном виде.
+    """
+    hasher = hashlib.new(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while size := f.readinto(buffer):
+            hasher.update(view[:size])
+    return hasher.hexdigest()
+
+
+def file_digests(path, algorithms=("md5", "sha256"), chunk_size=HASH_CHUNK_SIZE):
+    """
+    Вычисляет несколько хэшей содержимого файла за одно чтение.
+
+    Args:
+        path (str): Полный путь к файлу.
+        algorithms (tuple): Алгоритмы хэширования.
+        chunk_size (int): Размер блока чтения в байтах.
+
+    Returns:
+        dict: Словарь {алгоритм: хэш в шестнадцатеричном виде}.
+    """
+    hashers = {algorithm: hashlib.new(algorithm) for algorithm in algorithms}
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while size := f.readinto(buffer):
+            for hasher in hashers.values():
+                hasher.update(view[:size])
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+
+@lru_cache(maxsize=HASH_CACHE_SIZE)
+def _cached_hash(path, inode, size, mtime_ns, algorithm):
+    return file_hash(path, algorithm)
+
+
+def entry_hash(entry, algorithm="md5"):
+    """
+    Возвращает хэш содержимого файла, вычисляя его не больше одного раза для версии файла.
+
+    Версия определяется парой (inode, размер, mtime_ns): пока они не изменились,
+    файл повторно не читается.
+
+    Args:
+        entry (FileEntry): Состояние файла.
+        algorithm (str): Алгоритм хэширования ("md5" или "sha256").
+
+    Returns:
+        str: Хэш в шестнадцатеричном виде или None, если файл прочитать не удалось.
+    """
+    try:
+        return _cached_hash(
+            entry.path, entry.inode, entry.size, entry.mtime_ns, algorithm
+        )
+    except OSError as e:
+        logger.warning(f"Не удалось вычислить хэш файла {entry.path}: {e}")
+        return None
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+
+import pathspec
+from loguru import logger
+
+from config import DIR_PATH, SYNC_IGNORE, SYNC_IGNORE_FILE
+
+
+class IgnoreRules:
+    """
+    Правила исключения файлов из синхронизации в формате .gitignore.
+
+    Правила собираются из переменной окружения SYNC_IGNORE и файла `.syncignore`
+    в синхронизируемой директории и компилируются один раз; файл перечитывается,
+    только если он изменился (см. `refresh`).
+
+    Attributes:
+        digest (str): Хэш текущего набора правил, позволяет заметить изменение
+            правил между запусками.
+    """
+
+    def __init__(self, dir_path, patterns=(), file_name=None):
+        self.dir_path = dir_path
+        self.patterns = [pattern for pattern in patterns if pattern]
+        self.file_path = os.path.join(dir_path, file_name) if file_name else None
+        self._file_state = None
+        self._spec = None
+        self.digest = None
+        self._compile([])
+        self.refresh()
+
+    def _compile(self, file_lines):
+        """
+        Компилирует правила из переменной окружения и строк файла правил.
+        """
+        lines = list(self.patterns) + list(file_lines)
+        self._spec = pathspec.GitIgnoreSpec.from_lines(lines)
+        self.digest = hashlib.md5("\n".join(lines).encode()).hexdigest()
+
+    def refresh(self):
+        """
+        Перечитывает файл правил, если он изменился с прошлой проверки.
+
+        Returns:
+            bool: True, если правила изменились.
+        """
+        if self.file_path is None:
+            return False
+        try:
+            st = os.stat(self.file_path)
+            state = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            state = None
+        if state == self._file_state:
+            return False
+
+        lines = []
+        if state is not None:
+            try:
+                with open(self.file_path, encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error(f"Не удалось прочитать файл правил {self.file_path}: {e}")
+                return False
+        self._file_state = state
+        self._compile(lines)
+        logger.info(
+            f"Загружены правила исключения: {len(self.patterns)} из SYNC_IGNORE, "
+            f"{sum(1 for line in lines if line.strip())} из {self.file_path}"
+        )
+        return True
+
+    def match(self, path, is_dir=False):
+        """
+        Проверяет, исключён ли путь из синхронизации.
+
+        Args:
+            path (str): Путь относительно синхронизируемой директории.
+            is_dir (bool): Путь указывает на директорию.
+
+        Returns:
+            bool: True, если путь исключён.
+        """
+        if is_dir:
+            path = f"{path}/"
+        return self._spec.match_file(path)
+
+
+_rules = {}
+_rules_lock = threading.Lock()
+
+
+def get_ignore_rules(dir_path=None):
+    """
+    Возвращает общие для процесса правила исключения для синхронизируемой директории.
+
+    Args:
+        dir_path (str): Синхронизируемая директория (по умолчанию DIR_PATH).
+
+    Returns:
+        IgnoreRules: Правила исключения.
+    """
+    dir_path = dir_path or DIR_PATH
+    with _rules_lock:
+        if dir_path not in _rules:
+            _rules[dir_path] = IgnoreRules(dir_path, SYNC_IGNORE, SYNC_IGNORE_FILE)
+        return _rules[dir_path]
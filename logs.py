@@ -0,0 +1,113 @@
+import sys
+import threading
+
+from loguru import logger
+
+from config import LOG_FILE, LOG_LEVEL, LOG_CONSOLE_LEVEL, LOG_SAMPLE_LIMIT
+
+LOG_FORMAT = "{level} {time} {file} {function} {line} {message} {exception}"
+
+_configured = False
+_configured_lock = threading.Lock()
+
+
+def setup_logging(log_file=None, level=None, console_level=None):
+    """
+    Настраивает логирование процесса.
+
+    Записи пишутся в один JSON-файл LOG_FILE и в консоль; форматирование и запись
+    выполняются в фоновом потоке (`enqueue=True`), поэтому потоки синхронизации не
+    ждут диска. Повторный вызов ничего не меняет.
+
+    Args:
+        log_file (str): Путь к файлу лога (по умолчанию LOG_FILE; пустое значение —
+            без файла).
+        level (str): Минимальный уровень записей в файле (по умолчанию LOG_LEVEL).
+        console_level (str): Минимальный уровень записей в консоли (по умолчанию
+            LOG_CONSOLE_LEVEL; пустое значение — без вывода в консоль).
+    """
+    global _configured
+    with _configured_lock:
+        if _configured:
+            return
+        _configured = True
+        log_file = LOG_FILE if log_file is None else log_file
+        console_level = LOG_CONSOLE_LEVEL if console_level is None else console_level
+        logger.remove()
+        if console_level:
+            logger.add(sys.stderr, level=console_level.upper(), enqueue=True)
+        if log_file:
+            logger.add(
+                log_file,
+                format=LOG_FORMAT,
+                serialize=True,
+                level=(level or LOG_LEVEL).upper(),
+                rotation="500 MB",
+                enqueue=True,
+            )
+
+
+class LogSampler:
+    """
+    Ограничивает число однотипных сообщений о файлах.
+
+    Из сообщений с одним ключом записываются первые `limit`, остальные только
+    подсчитываются; `flush` записывает, сколько сообщений каждого типа пропущено,
+    и начинает подсчёт заново. Так при синхронизации тысяч файлов лог не растёт
+    на строку на файл.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = LOG_SAMPLE_LIMIT if limit is None else limit
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """
+        Учитывает сообщение и решает, записывать ли его.
+
+        Args:
+            key (str): Тип сообщения.
+
+        Returns:
+            bool: True, если сообщение нужно записать.
+        """
+        with self._lock:
+            count = self._counts[key] = self._counts.get(key, 0) + 1
+        return not self.limit or count <= self.limit
+
+    def flush(self):
+        """
+        Записывает число пропущенных сообщений каждого типа и сбрасывает счётчики.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not self.limit:
+            return
+        for key, count in counts.items():
+            if count > self.limit:
+                logger.info("{}: ещё {} сообщений не записано", key, count - self.limit)
+
+
+_sampler = LogSampler()
+
+
+def log_sampled(key, message, *args, level="INFO"):
+    """
+    Записывает сообщение о файле, если лимит сообщений этого типа не исчерпан.
+
+    Args:
+        key (str): Тип сообщения, например "Новый файл обнаружен".
+        message (str): Шаблон сообщения в формате `str.format`.
+        *args: Аргументы шаблона; форматирование выполняется только при записи.
+        level (str): Уровень сообщения.
+    """
+    if _sampler.allow(key):
+        logger.opt(depth=1).log(level, message, *args)
+
+
+def flush_sampled():
+    """
+    Записывает число сообщений о файлах, пропущенных с предыдущего вызова.
+    """
+    _sampler.flush()
@@ -0,0 +1,344 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from loguru import logger
+
+from config import METRICS_HOST, METRICS_PORT, METRICS_LOG_INTERVAL
+
+# Префикс имён метрик в формате Prometheus
+PREFIX = "disksync_"
+
+# Порядок этапов итерации в сводке
+PHASES = ("scan", "remote", "compare", "plan", "transfer", "save")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in key)
+    return f"{{{pairs}}}"
+
+
+class Metrics:
+    """
+    Потокобезопасный реестр метрик синхронизации.
+
+    Поддерживаются счётчики (`inc`), текущие значения (`set`) и длительности
+    (`observe`, `timer`) с метками. Значения, которые хранятся в других объектах
+    (например, `RateLimiter.throttled`), подключаются функциями-сборщиками
+    (`register`) и читаются в момент запроса метрик.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        # (имя, метки) -> [число, сумма, максимум, последнее значение]
+        self._timings = {}
+        self._collectors = []
+        self._logged_at = time.monotonic()
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Увеличивает счётчик.
+
+        Args:
+            name (str): Имя счётчика без префикса, например "upload_bytes_total".
+            amount (float): Приращение.
+            **labels: Метки значения.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """
+        Устанавливает текущее значение показателя.
+
+        Args:
+            name (str): Имя показателя без префикса, например "queue_depth".
+            value (float): Значение.
+            **labels: Метки значения.
+        """
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Учитывает длительность.
+
+        Args:
+            name (str): Имя длительности без префикса и суффикса "_seconds".
+            seconds (float): Длительность в секундах.
+            **labels: Метки значения.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                self._timings[key] = [1, seconds, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+                timing[3] = seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Измеряет длительность блока `with` (учитывается и при исключении).
+
+        Args:
+            name (str): Имя длительности без префикса и суффикса "_seconds".
+            **labels: Метки значения.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register(self, collector):
+        """
+        Подключает функцию, возвращающую значения метрик на момент запроса.
+
+        Args:
+            collector (callable): Функция без аргументов, возвращающая словарь
+                {имя: значение}; имена на "_total" считаются счётчиками.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def counter(self, name, **labels):
+        """
+        Returns:
+            float: Значение счётчика (сумма по всем меткам, если метки не заданы).
+        """
+        with self._lock:
+            if labels:
+                return self._counters.get((name, _label_key(labels)), 0)
+            return sum(
+                value for (key, _), value in self._counters.items() if key == name
+            )
+
+    def gauge(self, name, default=None, **labels):
+        """
+        Returns:
+            float: Текущее значение показателя или `default`.
+        """
+        with self._lock:
+            return self._gauges.get((name, _label_key(labels)), default)
+
+    def gauges(self, name, **labels):
+        """
+        Returns:
+            list: Значения показателя, метки которых включают заданные (например,
+                значения всех пар синхронизации).
+        """
+        wanted = set(labels.items())
+        with self._lock:
+            return [
+                value
+                for (key, label_key), value in self._gauges.items()
+                if key == name and wanted.issubset(label_key)
+            ]
+
+    def last(self, name, **labels):
+        """
+        Returns:
+            float: Последняя измеренная длительность в секундах или None.
+        """
+        with self._lock:
+            timing = self._timings.get((name, _label_key(labels)))
+            return timing[3] if timing is not None else None
+
+    def _collected(self):
+        values = {}
+        for collector in list(self._collectors):
+            try:
+                values.update(collector())
+            except Exception as e:
+                logger.warning(f"Не удалось получить значения метрик: {e}")
+        return values
+
+    def render(self):
+        """
+        Формирует текущие значения в текстовом формате Prometheus.
+
+        Returns:
+            str: Текст для ответа на запрос /metrics.
+        """
+        collected = self._collected()
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {key: list(value) for key, value in self._timings.items()}
+        for name, value in collected.items():
+            (counters if name.endswith("_total") else gauges)[(name, ())] = value
+
+        lines = []
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            declared = set()
+            for (name, labels), value in sorted(values.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    declared.add(name)
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+        declared = set()
+        for (name, labels), (count, total, maximum, _) in sorted(timings.items()):
+            metric = f"{PREFIX}{name}_seconds"
+            if name not in declared:
+                lines.append(f"# TYPE {metric} summary")
+                declared.add(name)
+            suffix = _format_labels(labels)
+            lines.append(f"{metric}_count{suffix} {count}")
+            lines.append(f"{metric}_sum{suffix} {total:.6f}")
+            lines.append(f"{metric}_max{suffix} {maximum:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Формирует строку сводки для лога.
+
+        Returns:
+            str: Сводка по итерациям, этапам, передаче данных и состоянию файлов.
+        """
+        collected = self._collected()
+        phases = ", ".join(
+            f"{phase} {seconds:.2f}"
+            for phase in PHASES
+            if (seconds := self.last("phase", phase=phase)) is not None
+        )
+        cycle = self.last("cycle")
+        # Отставание считается по паре синхронизации, дольше всех не сверявшейся
+        last_success = min(self.gauges("last_success_timestamp_seconds"), default=None)
+        lag = f"{time.time() - last_success:.0f} с" if last_success else "нет"
+        return (
+            f"итераций {self.counter('cycles_total')} "
+            f"(ошибок {self.counter('cycles_total', result='failed')}), "
+            f"последняя {cycle or 0:.2f} с [{phases}], "
+            f"с последней успешной {lag}; "
+            f"отправлено {self.counter('upload_bytes_total') / 1024 / 1024:.1f} МБ, "
+            f"операций {self.counter('transfers_total')} "
+            f"(ошибок {self.counter('transfers_total', result='failed')}), "
+            f"запросов к API {self.counter('api_requests_total')}, "
+            f"повторов {self.counter('retries_total')}, "
+            f"ограничений {collected.get('throttled_total', 0)}; "
+            f"очередь {sum(self.gauges('queue_depth'))}, "
+            f"синхронизировано файлов {sum(self.gauges('files', state='synced'))}, "
+            f"ожидают записи {sum(self.gauges('files', state='waiting'))}"
+        )
+
+    def log_summary(self, interval=None):
+        """
+        Пишет сводку в лог, если с предыдущей прошло не меньше `interval` секунд.
+
+        Args:
+            interval (float): Интервал в секундах (по умолчанию METRICS_LOG_INTERVAL;
+                0 отключает сводку).
+        """
+        interval = METRICS_LOG_INTERVAL if interval is None else interval
+        if not interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._logged_at < interval:
+                return
+            self._logged_at = now
+        logger.info(f"Сводка: {self.summary()}")
+
+
+class PhaseClock:
+    """
+    Измеряет последовательные этапы итерации: каждый вызов `mark` учитывает время,
+    прошедшее с предыдущей отметки, как длительность этапа.
+    """
+
+    def __init__(self, metrics=None, name="phase"):
+        self.metrics = metrics or get_metrics()
+        self.name = name
+        self.started = self._last = time.perf_counter()
+
+    def mark(self, phase):
+        """
+        Завершает этап.
+
+        Args:
+            phase (str): Название этапа.
+        """
+        now = time.perf_counter()
+        self.metrics.observe(self.name, now - self._last, phase=phase)
+        self._last = now
+
+    def elapsed(self):
+        """
+        Returns:
+            float: Время с начала измерения в секундах.
+        """
+        return time.perf_counter() - self.started
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        data = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(metrics=None, host=None, port=None):
+    """
+    Запускает HTTP-сервер с метриками в формате Prometheus (путь /metrics)
+    в фоновом потоке.
+
+    Args:
+        metrics (Metrics): Реестр метрик (по умолчанию общий).
+        host (str): Адрес (по умолчанию METRICS_HOST).
+        port (int): Порт (по умолчанию METRICS_PORT; 0 — сервер не запускается).
+
+    Returns:
+        ThreadingHTTPServer: Запущенный сервер или None.
+    """
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    host = host or METRICS_HOST
+    handler = type(
+        "MetricsHandler", (_MetricsHandler,), {"metrics": metrics or get_metrics()}
+    )
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Метрики доступны по адресу http://{host}:{port}/metrics")
+    return server
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """
+    Returns:
+        Metrics: Общий для всего процесса реестр метрик.
+    """
+    return _metrics
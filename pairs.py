@@ -0,0 +1,147 @@
+import hashlib
+import os
+
+from loguru import logger
+
+from cloud import Connector
+from config import DB_FILE, DIR_PATH, DISK_PATH, PAIR_TURN_OPERATIONS, SYNC_PAIRS
+from database_connect import get_database
+from ignore import get_ignore_rules
+from scheduler import SyncScheduler
+from settle import SettleTracker
+from transfer import TransferExecutor, create_pool
+
+
+def parse_pairs(values=None):
+    """
+    Разбирает пары синхронизации из настройки SYNC_PAIRS.
+
+    Args:
+        values (list): Строки вида "локальная директория=директория на диске"
+            (по умолчанию SYNC_PAIRS). Пустой список означает одну пару
+            DIR_PATH=DISK_PATH.
+
+    Returns:
+        list: Пары (локальная директория, директория на диске).
+    """
+    values = SYNC_PAIRS if values is None else values
+    if not values:
+        return [(DIR_PATH, DISK_PATH)]
+
+    pairs = []
+    for value in values:
+        local, sep, remote = value.partition("=")
+        local, remote = local.strip(), remote.strip().rstrip("/")
+        if not sep or not local or not remote:
+            exit(f"Неверная пара синхронизации в SYNC_PAIRS: {value}")
+        pairs.append((os.path.normpath(local), remote))
+
+    # Вложенные директории синхронизировались бы дважды, в разные места на диске
+    for index, (local, remote) in enumerate(pairs):
+        for other, other_remote in pairs[index + 1 :]:
+            if os.path.commonpath([local, other]) in (local, other):
+                exit(f"Пары синхронизации пересекаются: {local} и {other}")
+            if remote == other_remote:
+                exit(f"Директория на диске {remote} указана в двух парах синхронизации")
+    return pairs
+
+
+def pair_db_file(local, remote):
+    """
+    Возвращает путь к файлу базы данных пары синхронизации.
+
+    Пара DIR_PATH=DISK_PATH использует DB_FILE, поэтому при переходе к нескольким
+    парам её состояние сохраняется. Для остальных пар к имени файла добавляется
+    короткий хэш пары.
+
+    Args:
+        local (str): Локальная директория.
+        remote (str): Директория на диске.
+
+    Returns:
+        str: Путь к файлу базы данных.
+    """
+    if (
+        DIR_PATH
+        and os.path.normpath(local) == os.path.normpath(DIR_PATH)
+        and remote == (DISK_PATH or "").rstrip("/")
+    ):
+        return DB_FILE
+    stem, ext = os.path.splitext(DB_FILE)
+    digest = hashlib.md5(f"{local}\0{remote}".encode()).hexdigest()[:8]
+    return f"{stem}-{digest}{ext}"
+
+
+class SyncPair:
+    """
+    Пара синхронизации "локальная директория — директория на диске".
+
+    Состояние пары (база данных, отслеживание записываемых файлов, расписание
+    итераций) своё у каждой пары, а HTTP-сессия, ограничитель запросов и пул потоков
+    передачи общие для всего процесса.
+
+    Attributes:
+        local (str): Локальная директория.
+        remote (str): Директория на диске.
+        db (DatabaseManager): База данных пары.
+        connector (Connector): Клиент API диска для директории пары.
+        executor (TransferExecutor): Исполнитель операций на общем пуле потоков.
+        settle (SettleTracker): Отслеживание записываемых файлов.
+        scheduler (SyncScheduler): Расписание итераций пары.
+        turn_limit (int): Максимальное число файлов, операции над которыми
+            выполняются за один ход пары (None — без ограничения).
+    """
+
+    def __init__(
+        self, local, remote, pool=None, session=None, limiter=None, turn_limit=None
+    ):
+        self.local = local
+        self.remote = remote
+        self.db = get_database(pair_db_file(local, remote))
+        self.connector = Connector(
+            session=session,
+            db=self.db,
+            limiter=limiter,
+            dir_path=local,
+            disk_path=remote,
+        )
+        self.executor = TransferExecutor(self.connector, pool=pool)
+        self.settle = SettleTracker()
+        self.scheduler = SyncScheduler()
+        self.turn_limit = turn_limit
+
+    @property
+    def rules(self):
+        """
+        Правила исключения файлов локальной директории пары.
+        """
+        return get_ignore_rules(self.local)
+
+    def __repr__(self):
+        return f"{self.local} -> {self.remote}"
+
+
+def load_pairs(values=None):
+    """
+    Создаёт пары синхронизации с общим пулом потоков передачи.
+
+    Операции всех пар выполняются общим пулом потоков по очереди (см.
+    `transfer.FairPool`). Если пар несколько, за один ход пара выполняет операции
+    не более чем над PAIR_TURN_OPERATIONS файлами: остальные остаются в журнале
+    до следующего хода, и пара с большой очередью операций раньше замечает новые
+    изменения в директории.
+
+    Args:
+        values (list): Строки пар (по умолчанию SYNC_PAIRS).
+
+    Returns:
+        list: Пары SyncPair.
+    """
+    pool = create_pool()
+    parsed = parse_pairs(values)
+    turn_limit = PAIR_TURN_OPERATIONS if len(parsed) > 1 else None
+    pairs = [
+        SyncPair(local, remote, pool, turn_limit=turn_limit) for local, remote in parsed
+    ]
+    logger.info(f"Пары синхронизации: {len(pairs)} ({', '.join(map(repr, pairs))})")
+    return pairs
@@ -0,0 +1,385 @@
+import datetime
+import email.utils
+import threading
+import time
+
+from loguru import logger
+
+from config import (
+    API_RATE_LIMIT,
+    API_BURST,
+    API_MIN_RATE,
+    UPLOAD_BANDWIDTH,
+    UPLOAD_BANDWIDTH_SCHEDULE,
+)
+
+# Коды ответа, которыми сервер сообщает о превышении лимитов
+THROTTLE_STATUSES = frozenset({429, 503})
+
+# Задержка после сигнала ограничения без заголовка Retry-After (в секундах)
+DEFAULT_PAUSE = 1.0
+
+# Как часто пересчитывается лимит полосы по расписанию (в секундах)
+SCHEDULE_CHECK_INTERVAL = 30.0
+
+_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_rate(value):
+    """
+    Разбирает скорость в байтах в секунду с необязательным суффиксом K, M или G.
+
+    Args:
+        value (str): Значение, например "512K", "2M" или "1048576".
+
+    Returns:
+        float: Скорость в байтах в секунду; 0 — без ограничения.
+
+    Raises:
+        ValueError: Если значение не удалось разобрать.
+    """
+    value = str(value).strip().upper().removesuffix("B")
+    multiplier = _SUFFIXES.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return max(0.0, float(value) * multiplier)
+
+
+def parse_schedule(rules):
+    """
+    Разбирает расписание ограничения полосы загрузки.
+
+    Args:
+        rules (iterable): Правила вида "09:00-19:00=2M". Интервал может переходить
+            через полночь ("22:00-06:00=0").
+
+    Returns:
+        list: Кортежи (начало, конец, скорость), где начало и конец — минуты от полуночи.
+    """
+    schedule = []
+    for rule in rules:
+        try:
+            period, rate = rule.split("=")
+            start, end = (
+                datetime.time.fromisoformat(part.strip()) for part in period.split("-")
+            )
+            schedule.append(
+                (
+                    start.hour * 60 + start.minute,
+                    end.hour * 60 + end.minute,
+                    parse_rate(rate),
+                )
+            )
+        except ValueError:
+            logger.error(f"Неверное правило расписания полосы загрузки: {rule!r}")
+    return schedule
+
+
+def parse_retry_after(value):
+    """
+    Разбирает заголовок `Retry-After`.
+
+    Args:
+        value (str): Число секунд или дата в формате HTTP.
+
+    Returns:
+        float: Задержка в секундах или None, если заголовка нет или он неверный.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Потокобезопасный ограничитель скорости «корзина токенов».
+
+    Токены пополняются со скоростью `rate` в секунду до `capacity`. Запрос большего
+    числа токенов, чем есть в корзине, уводит её в долг: вызывающий поток ждёт, пока
+    долг не будет погашен, а следующие потоки ждут своей очереди за ним.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate or 0
+        self.capacity = capacity or self.rate
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def set_rate(self, rate, capacity=None):
+        """
+        Меняет скорость пополнения корзины.
+
+        Args:
+            rate (float): Новая скорость в токенах в секунду; 0 — без ограничения.
+            capacity (float): Новый размер корзины (по умолчанию равен скорости).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.rate:
+                self._refill(now)
+            else:
+                self.tokens = capacity or rate
+            self.rate = rate or 0
+            self.capacity = capacity or self.rate
+            self.tokens = min(self.tokens, self.capacity)
+            self._updated = now
+
+    def reserve(self, amount=1.0):
+        """
+        Списывает токены и вычисляет, сколько нужно подождать до их появления.
+
+        Args:
+            amount (float): Число токенов.
+
+        Returns:
+            float: Время ожидания в секундах.
+        """
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, amount=1.0):
+        """
+        Списывает токены, ожидая их появления.
+
+        Args:
+            amount (float): Число токенов.
+
+        Returns:
+            float: Время ожидания в секундах.
+        """
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """
+    Общий для всех запросов к API ограничитель числа запросов и полосы загрузки.
+
+    Запросы к API расходуют токены корзины `api` (API_RATE_LIMIT запросов в секунду),
+    отправляемые байты файлов — корзины `upload` (UPLOAD_BANDWIDTH байт в секунду или
+    значение из расписания UPLOAD_BANDWIDTH_SCHEDULE для текущего времени суток).
+
+    Ответы 429 и 503 приостанавливают все запросы на время из заголовка `Retry-After`
+    и вдвое снижают скорость запросов (не ниже API_MIN_RATE); после каждой секунды
+    успешных ответов скорость увеличивается на десятую часть исходной, пока не
+    вернётся к настроенной.
+
+    Attributes:
+        throttled (int): Число полученных сигналов ограничения.
+        waited (float): Суммарное время ожидания запросов и загрузок в секундах.
+    """
+
+    def __init__(
+        self,
+        api_rate=None,
+        api_burst=None,
+        min_api_rate=None,
+        upload_rate=None,
+        schedule=None,
+    ):
+        self.api_rate = API_RATE_LIMIT if api_rate is None else api_rate
+        self.min_api_rate = API_MIN_RATE if min_api_rate is None else min_api_rate
+        self.api_burst = API_BURST if api_burst is None else api_burst
+        self.api = TokenBucket(self.api_rate, self.api_burst)
+        self.upload_rate = parse_rate(
+            UPLOAD_BANDWIDTH if upload_rate is None else upload_rate
+        )
+        self.schedule = parse_schedule(
+            UPLOAD_BANDWIDTH_SCHEDULE if schedule is None else schedule
+        )
+        self.upload = TokenBucket(0)
+        self.throttled = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._ceiling = None
+        self._changed_at = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._observed = 0.0
+        self._schedule_checked = None
+        self._check_schedule()
+        logger.debug(
+            f"Ограничение запросов к API: {self.api_rate or 'нет'} в секунду, "
+            f"полосы загрузки: {self.upload.rate or 'нет'} байт/с"
+        )
+
+    def current_upload_rate(self, moment=None):
+        """
+        Возвращает ограничение полосы загрузки для текущего времени суток.
+
+        Args:
+            moment (datetime.datetime): Момент времени (по умолчанию сейчас).
+
+        Returns:
+            float: Скорость в байтах в секунду; 0 — без ограничения.
+        """
+        moment = moment or datetime.datetime.now()
+        minute = moment.hour * 60 + moment.minute
+        for start, end, rate in self.schedule:
+            if start <= end:
+                if start <= minute < end:
+                    return rate
+            elif minute >= start or minute < end:
+                return rate
+        return self.upload_rate
+
+    def _check_schedule(self):
+        """
+        Применяет ограничение полосы из расписания, если оно изменилось.
+        """
+        now = time.monotonic()
+        if (
+            self._schedule_checked is not None
+            and now - self._schedule_checked < SCHEDULE_CHECK_INTERVAL
+        ):
+            return
+        self._schedule_checked = now
+        rate = self.current_upload_rate()
+        if rate != self.upload.rate:
+            logger.info(
+                f"Ограничение полосы загрузки: "
+                f"{f'{rate / 1024 / 1024:.2f} МБ/с' if rate else 'нет'}"
+            )
+            # Корзина на секунду передачи: короткие всплески не превышают лимит
+            self.upload.set_rate(rate, rate)
+
+    def before_request(self):
+        """
+        Ожидает разрешения на запрос к API.
+        """
+        with self._lock:
+            now = time.monotonic()
+            pause = self._paused_until - now
+            if now - self._window_start >= 1.0:
+                self._observed = self._window_count / (now - self._window_start)
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+        waited = 0.0
+        if pause > 0:
+            time.sleep(pause)
+            waited = pause
+        waited += self.api.acquire()
+        if waited:
+            with self._lock:
+                self.waited += waited
+
+    def after_response(self, status, retry_after=None):
+        """
+        Учитывает ответ сервера: сигналы ограничения замедляют запросы, успешные ответы
+        постепенно возвращают скорость к настроенной.
+
+        Args:
+            status (int): Код ответа.
+            retry_after (str): Значение заголовка `Retry-After`.
+        """
+        if status in THROTTLE_STATUSES:
+            self.throttle(retry_after)
+        elif status < 400:
+            self._recover()
+
+    def throttle(self, retry_after=None):
+        """
+        Приостанавливает запросы и снижает их скорость после сигнала ограничения.
+
+        Args:
+            retry_after (str): Значение заголовка `Retry-After`.
+        """
+        pause = parse_retry_after(retry_after)
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self._paused_until = max(
+                self._paused_until, now + (DEFAULT_PAUSE if pause is None else pause)
+            )
+            # Несколько ответов одной волны снижают скорость один раз
+            if now - self._changed_at < 1.0:
+                return
+            # Без настроенного лимита за исходную берётся наблюдаемая скорость запросов
+            current = (
+                self.api.rate
+                or max(self._observed, self._window_count)
+                or self.min_api_rate * 2
+            )
+            if self._ceiling is None:
+                self._ceiling = current
+            rate = max(self.min_api_rate, current / 2)
+            self._changed_at = now
+        self.api.set_rate(rate, max(1.0, rate))
+        logger.warning(
+            f"Сервер ограничивает запросы, пауза {pause or DEFAULT_PAUSE:.1f} с, "
+            f"скорость снижена до {rate:.1f} запросов в секунду"
+        )
+
+    def _recover(self):
+        """
+        Увеличивает скорость запросов, сниженную после сигнала ограничения.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._ceiling is None or now - self._changed_at < 1.0:
+                return
+            self._changed_at = now
+            rate = self.api.rate + max(1.0, self._ceiling / 10)
+            if rate < self._ceiling:
+                capacity = max(1.0, rate)
+            else:
+                rate = self.api_rate
+                capacity = self.api_burst
+                self._ceiling = None
+        self.api.set_rate(rate, capacity)
+        if self._ceiling is None:
+            logger.info("Скорость запросов к API восстановлена")
+
+    def before_upload(self, size):
+        """
+        Ожидает разрешения на отправку очередного блока файла.
+
+        Args:
+            size (int): Размер блока в байтах.
+        """
+        self._check_schedule()
+        waited = self.upload.acquire(size)
+        if waited:
+            with self._lock:
+                self.waited += waited
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Возвращает общий для всего процесса ограничитель, создавая его при первом обращении.
+
+    Returns:
+        RateLimiter: Общий ограничитель.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,393 @@
+import argparse
+import datetime
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from loguru import logger
+
+from config import RESTORE_SEGMENT_SIZE, RESTORE_WORKERS
+from hashing import entry_hash, file_digests
+from logs import flush_sampled, log_sampled, setup_logging
+from metrics import get_metrics
+from pairs import load_pairs
+from scanner import scan_names
+
+# Суффикс файла, в который идёт скачивание; такие файлы исключены из синхронизации
+# шаблоном "*.part" из SYNC_IGNORE по умолчанию
+PART_SUFFIX = ".part"
+
+# Число скачанных файлов, после которого их состояние записывается в базу данных
+SAVE_BATCH = 500
+
+
+def parse_modified(value):
+    """
+    Разбирает время изменения ресурса из ответа API.
+
+    Args:
+        value (str): Время в формате ISO 8601, например "2024-05-01T10:00:00+00:00".
+
+    Returns:
+        int: Время в наносекундах или None, если значение не задано или не разобрано.
+    """
+    if not value:
+        return None
+    try:
+        return int(datetime.datetime.fromisoformat(value).timestamp() * 1e9)
+    except ValueError:
+        return None
+
+
+class Download:
+    """
+    Скачивание одного файла с диска участками в заранее выделенный файл.
+
+    Участки скачиваются независимо в потоках пула; файл открывается при скачивании
+    первого участка, а после последнего проверяется и переименовывается
+    (см. `finish`).
+
+    Attributes:
+        name (str): Путь файла относительно синхронизируемой директории.
+        item (dict): Описание ресурса на диске (размер, md5, sha256, время изменения).
+        path (str): Полный путь к восстанавливаемому файлу.
+        segments (list): Участки файла (начало, конец включительно).
+        ok (bool): Все участки скачаны и содержимое совпало с хэшами на диске.
+        message (str): Описание результата или ошибки.
+    """
+
+    def __init__(self, name, item, path, segment_size):
+        self.name = name
+        self.item = item
+        self.path = path
+        self.part = path + PART_SUFFIX
+        self.size = int(item.get("size") or 0)
+        # У пустого файла один пустой участок
+        self.segments = [
+            (start, min(start + segment_size, self.size) - 1)
+            for start in range(0, self.size, segment_size)
+        ] or [(0, -1)]
+        self.ok = True
+        self.message = "скачан"
+        self._fd = None
+        self._remaining = len(self.segments)
+        self._lock = threading.Lock()
+        # Файл из одного участка хэшируется по ходу скачивания
+        self._hashers = (
+            (hashlib.md5(), hashlib.sha256()) if len(self.segments) == 1 else ()
+        )
+
+    def _open(self):
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(
+                    self.part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+                )
+                try:
+                    os.posix_fallocate(self._fd, 0, self.size)
+                except (AttributeError, OSError):
+                    # Файловая система не поддерживает выделение места заранее
+                    os.ftruncate(self._fd, self.size)
+            return self._fd
+
+    def fetch(self, connector, start, end):
+        """
+        Скачивает участок файла.
+
+        Args:
+            connector (Connector): Клиент API диска.
+            start (int): Начало участка в байтах.
+            end (int): Конец участка в байтах (включительно).
+
+        Returns:
+            Download: Это скачивание, если участок был последним и файл завершён,
+                иначе None.
+        """
+        ok, message = True, None
+        if self.ok and end >= start:
+            try:
+                ok, message = connector.download(
+                    self.name, self._open(), start, end, self._hashers
+                )
+            except OSError as e:
+                ok, message = False, f"ошибка записи: {e}"
+        with self._lock:
+            if not ok and self.ok:
+                self.ok, self.message = False, message
+            self._remaining -= 1
+            if self._remaining:
+                return None
+        self.finish()
+        return self
+
+    def finish(self):
+        """
+        Завершает скачивание: сверяет содержимое с хэшами на диске, устанавливает
+        время изменения и переименовывает файл. При ошибке недокачанный файл удаляется.
+        """
+        try:
+            if self._fd is not None:
+                os.close(self._fd)
+            elif self.ok:
+                # Пустой файл
+                open(self.part, "wb").close()
+            if self.ok:
+                self.ok, self.message = self.verify()
+            if self.ok:
+                mtime_ns = parse_modified(self.item.get("modified"))
+                if mtime_ns is not None:
+                    os.utime(self.part, ns=(mtime_ns, mtime_ns))
+                os.replace(self.part, self.path)
+        except OSError as e:
+            self.ok, self.message = False, f"ошибка записи: {e}"
+        if not self.ok:
+            try:
+                os.remove(self.part)
+            except OSError:
+                pass
+
+    def verify(self):
+        """
+        Сверяет содержимое скачанного файла с MD5 и SHA-256 ресурса на диске.
+
+        Returns:
+            tuple: (bool, str) — совпадает ли содержимое и описание результата.
+        """
+        if self._hashers:
+            digests = {hasher.name: hasher.hexdigest() for hasher in self._hashers}
+        else:
+            digests = file_digests(self.part)
+        for algorithm, digest in digests.items():
+            expected = self.item.get(algorithm)
+            if expected and expected != digest:
+                return False, f"{algorithm} не совпадает с файлом на диске"
+        return True, "скачан"
+
+
+def plan_restore(local_root, listing, overwrite=False):
+    """
+    Сравнивает список файлов на диске с локальной директорией.
+
+    Args:
+        local_root (str): Локальная директория.
+        listing (dict): Файлы на диске {имя: описание ресурса}.
+        overwrite (bool): Заменять локальные файлы, содержимое которых отличается
+            от файла на диске.
+
+    Returns:
+        tuple: Списки имён (нужно скачать, уже совпадают с диском, пропущены
+            из-за отличающегося локального файла).
+    """
+    names = [name for name, item in listing.items() if item.get("type") != "dir"]
+    existing = scan_names(local_root, names)
+    to_download = []
+    present = []
+    conflicts = []
+    for name in names:
+        entry = existing.get(name)
+        if entry is None:
+            to_download.append(name)
+            continue
+        item = listing[name]
+        if (
+            not entry.is_dir
+            and entry.size == item.get("size")
+            and item.get("md5")
+            and entry_hash(entry) == item["md5"]
+        ):
+            present.append(name)
+        elif overwrite and not entry.is_dir:
+            to_download.append(name)
+        else:
+            log_sampled(
+                "Локальный файл отличается от файла на диске",
+                "Локальный файл {} отличается от файла на диске и не заменяется",
+                name,
+            )
+            conflicts.append(name)
+    return to_download, present, conflicts
+
+
+def save_restored(db, local_root, names, listing):
+    """
+    Записывает в базу данных состояние файлов, совпадающих с диском.
+
+    Args:
+        db (DatabaseManager): База данных пары синхронизации.
+        local_root (str): Локальная директория.
+        names (list): Имена восстановленных файлов.
+        listing (dict): Файлы на диске {имя: описание ресурса}.
+    """
+    if not names:
+        return
+    entries = scan_names(local_root, names)
+    with db.transaction():
+        db.mark_synced(
+            entries.values(),
+            listing,
+            {name: listing[name].get("md5") for name in entries},
+        )
+
+
+def restore(pair, overwrite=False, workers=None, segment_size=None):
+    """
+    Восстанавливает локальную директорию пары синхронизации из директории на диске.
+
+    Список файлов запрашивается постранично (`Connector.walk`). Файлы скачиваются
+    параллельно в пуле из RESTORE_WORKERS потоков; файлы больше RESTORE_SEGMENT_SIZE
+    делятся на участки, которые скачиваются отдельными запросами с заголовком
+    `Range` прямо в заранее выделенный файл. Содержимое сверяется с MD5 и SHA-256
+    из списка файлов, файл появляется под своим именем только после проверки.
+
+    Состояние восстановленных файлов и список файлов на диске записываются в базу
+    данных пары, поэтому цикл синхронизации после восстановления ничего не загружает
+    повторно. Уже совпадающие с диском файлы не скачиваются, поэтому прерванное
+    восстановление можно запустить снова.
+
+    Args:
+        pair (SyncPair): Пара синхронизации.
+        overwrite (bool): Заменять локальные файлы, содержимое которых отличается
+            от файла на диске.
+        workers (int): Число потоков скачивания (по умолчанию RESTORE_WORKERS).
+        segment_size (int): Размер участка файла в байтах
+            (по умолчанию RESTORE_SEGMENT_SIZE).
+
+    Returns:
+        int: Число файлов, которые восстановить не удалось, или None, если список
+            файлов на диске получить не удалось.
+    """
+    connector, db, rules = pair.connector, pair.db, pair.rules
+    metrics = get_metrics()
+    started = time.monotonic()
+    logger.info(f"Восстановление {pair.remote} в {pair.local}")
+    os.makedirs(pair.local, exist_ok=True)
+    try:
+        listing = {
+            item["name"]: item
+            for item in connector.walk(rules)
+            if not rules.match(item["name"], item.get("type") == "dir")
+        }
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Список файлов на диске не получен, восстановление прервано: {e}")
+        return None
+
+    for name, item in listing.items():
+        if item.get("type") == "dir":
+            os.makedirs(os.path.join(pair.local, name), exist_ok=True)
+    to_download, present, conflicts = plan_restore(pair.local, listing, overwrite)
+    save_restored(db, pair.local, present, listing)
+
+    downloads = [
+        Download(
+            name,
+            listing[name],
+            os.path.join(pair.local, name),
+            segment_size or RESTORE_SEGMENT_SIZE,
+        )
+        for name in to_download
+    ]
+    logger.info(
+        f"Файлов на диске: {len(to_download) + len(present) + len(conflicts)}, "
+        f"скачать: {len(downloads)} ({sum(d.size for d in downloads)} байт), "
+        f"уже на месте: {len(present)}"
+    )
+
+    failed = []
+    restored = 0
+    restored_bytes = 0
+    pending = []
+    with ThreadPoolExecutor(
+        max_workers=workers or RESTORE_WORKERS, thread_name_prefix="restore"
+    ) as pool:
+        futures = [
+            pool.submit(download.fetch, connector, start, end)
+            for download in downloads
+            for start, end in download.segments
+        ]
+        for future in as_completed(futures):
+            download = future.result()
+            if download is None:
+                continue
+            metrics.inc(
+                "transfers_total",
+                kind="download",
+                result="ok" if download.ok else "failed",
+            )
+            if not download.ok:
+                failed.append(download.name)
+                logger.error(
+                    f"Файл {download.name} не восстановлен: {download.message}"
+                )
+                continue
+            log_sampled("Файл скачан", "Файл {} скачан", download.name)
+            restored += 1
+            restored_bytes += download.size
+            pending.append(download.name)
+            if len(pending) >= SAVE_BATCH:
+                save_restored(db, pair.local, pending, listing)
+                pending = []
+    save_restored(db, pair.local, pending, listing)
+
+    # Кэш состояния диска заполняется полученным списком: первая итерация
+    # синхронизации не запрашивает его заново. Не восстановленные файлы и файлы,
+    # отличающиеся от локальных, в кэш не попадают. Не восстановленные файлы
+    # к тому же запоминаются: синхронизация не удаляет их с диска как удалённые
+    # локально, пока их не скачает следующее восстановление
+    skipped = set(failed).union(conflicts)
+    with db.transaction():
+        db.set_meta("ignore_digest", rules.digest)
+        db.remote_replace(
+            {name: item for name, item in listing.items() if name not in skipped}
+        )
+        db.unrestored_replace(failed)
+        db.set_meta("remote_reconciled_at", time.time())
+        db.set_meta("remote_stale", 0)
+    flush_sampled()
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Восстановлено файлов: {restored} ({restored_bytes / 1024 / 1024:.1f} МБ) "
+        f"за {elapsed:.1f} с ({restored_bytes / 1024 / 1024 / elapsed:.1f} МБ/с); "
+        f"уже на месте: {len(present)}, не заменено локальных файлов: "
+        f"{len(conflicts)}, ошибок: {len(failed)}"
+    )
+    if failed:
+        logger.warning(
+            f"{len(failed)} файлов не восстановлено. Синхронизация не удаляет их "
+            f"с диска, пока их не скачает повторное восстановление"
+        )
+    return len(failed)
+
+
+def main(argv=None):
+    """
+    Восстанавливает локальные директории всех пар синхронизации с диска.
+
+    Returns:
+        int: Код завершения: 0, если все файлы восстановлены, иначе 1.
+    """
+    parser = argparse.ArgumentParser(
+        description="Восстановление локальной папки из папки на Яндекс.Диске"
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="заменять локальные файлы, отличающиеся от файлов на диске",
+    )
+    parser.add_argument("--workers", type=int, help="число потоков скачивания")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    code = 0
+    for pair in load_pairs():
+        with logger.contextualize(pair=pair.remote):
+            if restore(pair, args.overwrite, args.workers) != 0:
+                code = 1
+    return code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
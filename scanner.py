@@ -0,0 +1,253 @@
+import datetime
+import hashlib
+import os
+import stat
+from typing import NamedTuple
+
+from loguru import logger
+
+
+class FileEntry(NamedTuple):
+    """
+    Состояние файла в локальной директории, полученное одним вызовом stat.
+
+    Attributes:
+        name (str): Имя файла.
+        path (str): Полный путь к файлу.
+        size (int): Размер файла в байтах.
+        mtime_ns (int): Время последнего изменения в наносекундах.
+        inode (int): Номер inode файла.
+        is_dir (bool): Элемент является директорией.
+    """
+
+    name: str
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    is_dir: bool = False
+
+    @property
+    def mtime(self):
+        """
+        Время последнего изменения в формате базы данных.
+        """
+        return format_mtime(self.mtime_ns)
+
+
+class DirState(NamedTuple):
+    """
+    Отпечаток состояния директории.
+
+    Attributes:
+        path (str): Путь директории относительно корня синхронизации ("" — корень).
+        fingerprint (str): Хэш состояния элементов директории (имя, тип, размер, mtime,
+            inode файлов; имя и inode поддиректорий) или None, если директорию
+            прочитать не удалось.
+        aggregate (str): Хэш отпечатка директории и совокупных отпечатков всех
+            поддиректорий, т.е. всего поддерева.
+        inode (int): Номер inode директории (None для корня); по нему находятся
+            переименованные директории.
+    """
+
+    path: str
+    fingerprint: str
+    aggregate: str
+    inode: int = None
+
+
+def parent_path(name):
+    """
+    Возвращает путь родительской директории.
+
+    Args:
+        name (str): Путь относительно корня синхронизации, например "a/b/c.txt".
+
+    Returns:
+        str: Путь родительской директории ("a/b") или "" для элементов корня.
+    """
+    return name.rpartition("/")[0]
+
+
+def format_mtime(mtime_ns):
+    """
+    Форматирует время изменения файла в строку 'YYYY-MM-DD HH:MM:SS.nnnnnnnnn'.
+
+    Строки такого вида сравниваются как время, а наносекундная часть позволяет
+    различать изменения, сделанные в пределах одной секунды.
+
+    Args:
+        mtime_ns (int): Время изменения в наносекундах.
+
+    Returns:
+        str: Отформатированное время.
+    """
+    seconds, nanoseconds = divmod(mtime_ns, 1_000_000_000)
+    datetime_object = datetime.datetime.fromtimestamp(seconds)
+    return f"{datetime_object:%Y-%m-%d %H:%M:%S}.{nanoseconds:09d}"
+
+
+def _entry_from_stat(name, path, st, is_dir):
+    return FileEntry(name, path, st.st_size, st.st_mtime_ns, st.st_ino, is_dir)
+
+
+def scan_tree(dir_path, ignore=None):
+    """
+    Рекурсивно сканирует дерево директорий и вычисляет отпечатки директорий.
+
+    Для каждого элемента выполняется один stat. Исключённые элементы отбрасываются
+    до stat, исключённые директории не обходятся. Символические ссылки на директории
+    не обходятся и отпечатков не имеют.
+
+    Args:
+        dir_path (str): Путь к корню синхронизации.
+        ignore (IgnoreRules): Правила исключения файлов.
+
+    Returns:
+        tuple: (entries, dirs) — словарь {путь: FileEntry} всех элементов дерева
+            и словарь {путь директории: DirState}, включая корень "".
+    """
+    entries = {}
+    listing = {}
+    unreadable = []
+    ignored = 0
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        try:
+            iterator = os.scandir(os.path.join(dir_path, rel) if rel else dir_path)
+        except OSError as e:
+            # Содержимое директории неизвестно: её файлы не сравниваются с диском
+            if rel:
+                logger.warning(f"Не удалось прочитать директорию {rel}: {e}")
+                unreadable.append(rel)
+                continue
+            raise
+        children = listing[rel] = []
+        with iterator:
+            for entry in iterator:
+                name = f"{rel}/{entry.name}" if rel else entry.name
+                if ignore is not None and ignore.match(name, entry.is_dir()):
+                    ignored += 1
+                    continue
+                try:
+                    st = entry.stat()
+                    is_dir = entry.is_dir()
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logger.warning(
+                        f"Не удалось получить информацию о файле {entry.path}: {e}"
+                    )
+                    entries[name] = FileEntry(name, entry.path, 0, 0, entry.inode())
+                    children.append(name)
+                    continue
+                entries[name] = _entry_from_stat(name, entry.path, st, is_dir)
+                children.append(name)
+                if is_dir and not entry.is_symlink():
+                    stack.append(name)
+
+    dirs = {}
+    # Отпечатки считаются от самых глубоких директорий к корню
+    for rel in sorted(
+        listing, key=lambda path: path.count("/") + 1 if path else 0, reverse=True
+    ):
+        digest = hashlib.md5()
+        subdirs = []
+        for name in sorted(listing[rel]):
+            entry = entries[name]
+            if entry.is_dir:
+                # Изменения внутри поддиректории учитываются в её собственном отпечатке
+                line = f"{name}\0d\0{entry.inode}\n"
+                subdirs.append(name)
+            else:
+                line = f"{name}\0f\0{entry.size}\0{entry.mtime_ns}\0{entry.inode}\n"
+            digest.update(line.encode("utf-8", "surrogateescape"))
+        fingerprint = digest.hexdigest()
+        aggregate = hashlib.md5(fingerprint.encode())
+        for name in subdirs:
+            child = dirs.get(name)
+            aggregate.update(
+                (
+                    child.aggregate if child is not None and child.aggregate else "?"
+                ).encode()
+            )
+        dirs[rel] = DirState(
+            rel, fingerprint, aggregate.hexdigest(), entries[rel].inode if rel else None
+        )
+    for rel in unreadable:
+        dirs[rel] = DirState(rel, None, None, entries[rel].inode)
+
+    logger.debug(
+        f"Просканировано элементов в {dir_path}: {len(entries)}, "
+        f"директорий: {len(dirs)}, исключено: {ignored}"
+    )
+    return entries, dirs
+
+
+def changed_dirs(dirs, stored):
+    """
+    Находит директории, элементы которых нужно сравнить с сохранённым состоянием.
+
+    Дерево обходится от корня; поддерево, совокупный отпечаток которого совпадает
+    с сохранённым, пропускается целиком. Директории, содержимое которых прочитать
+    не удалось, не сравниваются.
+
+    Args:
+        dirs (dict): Текущие отпечатки {путь: DirState}.
+        stored (dict): Сохранённые отпечатки {путь: DirState}.
+
+    Returns:
+        set: Пути директорий, собственный отпечаток которых изменился.
+    """
+    children = {}
+    for path in dirs:
+        if path:
+            children.setdefault(parent_path(path), []).append(path)
+
+    scope = set()
+    stack = [""]
+    while stack:
+        path = stack.pop()
+        current = dirs[path]
+        if current.fingerprint is None:
+            continue
+        previous = stored.get(path)
+        if previous is not None and previous.aggregate == current.aggregate:
+            continue
+        if previous is None or previous.fingerprint != current.fingerprint:
+            scope.add(path)
+        stack.extend(children.get(path, ()))
+    return scope
+
+
+def scan_names(dir_path, names, ignore=None):
+    """
+    Получает состояние только указанных файлов директории.
+
+    Args:
+        dir_path (str): Путь к директории.
+        names (iterable): Имена файлов.
+        ignore (IgnoreRules): Правила исключения файлов.
+
+    Returns:
+        dict: Словарь {имя: FileEntry} для существующих и не исключённых файлов.
+    """
+    entries = {}
+    for name in names:
+        if ignore is not None and ignore.match(name):
+            continue
+        path = os.path.join(dir_path, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Не удалось получить информацию о файле {path}: {e}")
+            entries[name] = FileEntry(name, path, 0, 0, 0)
+            continue
+        is_dir = stat.S_ISDIR(st.st_mode)
+        if is_dir and ignore is not None and ignore.match(name, is_dir):
+            continue
+        entries[name] = _entry_from_stat(name, path, st, is_dir)
+    return entries
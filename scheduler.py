@@ -0,0 +1,110 @@
+import time
+
+from loguru import logger
+
+from config import (
+    POLL_MIN_INTERVAL,
+    POLL_MAX_INTERVAL,
+    POLL_BACKOFF,
+    RECONCILE_INTERVAL,
+)
+
+
+class SyncScheduler:
+    """
+    Планирует итерации синхронизации в зависимости от активности в директории.
+
+    Пока изменения идут, интервал между итерациями равен `min_interval`; когда
+    директория не меняется, интервал растёт в `backoff` раз после каждой пустой
+    итерации до `max_interval`. Отдельно планируется полная сверка раз
+    в `reconcile_interval` секунд; после неудачной сверки она повторяется
+    с той же экспоненциальной задержкой.
+    """
+
+    def __init__(
+        self,
+        min_interval=None,
+        max_interval=None,
+        backoff=None,
+        reconcile_interval=None,
+    ):
+        self.min_interval = POLL_MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = max(
+            self.min_interval,
+            POLL_MAX_INTERVAL if max_interval is None else max_interval,
+        )
+        self.backoff = max(1.0, POLL_BACKOFF if backoff is None else backoff)
+        self.reconcile_interval = (
+            RECONCILE_INTERVAL if reconcile_interval is None else reconcile_interval
+        )
+        self.interval = self.min_interval
+        self.next_reconcile = 0.0
+        logger.debug(
+            f"Интервал синхронизации: от {self.min_interval} до {self.max_interval} с, "
+            f"полная сверка раз в {self.reconcile_interval} с"
+        )
+
+    def update(self, changes):
+        """
+        Пересчитывает интервал до следующей итерации по результату текущей.
+
+        Args:
+            changes (int): Число изменений, обнаруженных в итерации; None, если
+                итерация не удалась.
+
+        Returns:
+            float: Интервал до следующей итерации в секундах.
+        """
+        if changes:
+            self.interval = self.min_interval
+        else:
+            # Пустая или неудачная итерация: следующая откладывается
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+    def reconcile_due(self, now=None):
+        """
+        Проверяет, наступило ли время полной сверки.
+
+        Returns:
+            bool: True, если полную сверку нужно выполнить сейчас.
+        """
+        now = time.monotonic() if now is None else now
+        return now >= self.next_reconcile
+
+    def request_reconcile(self):
+        """
+        Назначает полную сверку на ближайшую итерацию.
+        """
+        self.next_reconcile = 0.0
+
+    def reconciled(self, ok, now=None):
+        """
+        Планирует следующую полную сверку.
+
+        Args:
+            ok (bool): Успешно ли выполнена сверка.
+        """
+        now = time.monotonic() if now is None else now
+        if ok:
+            self.interval = self.min_interval
+            self.next_reconcile = now + self.reconcile_interval
+        else:
+            self.next_reconcile = now + self.update(None)
+
+    def timeout(self, deadline=None, now=None):
+        """
+        Вычисляет время ожидания до ближайшего запланированного события.
+
+        Args:
+            deadline (float): Дополнительный срок по `time.monotonic()`, например время
+                повтора операции из журнала.
+
+        Returns:
+            float: Время ожидания в секундах (не меньше 0).
+        """
+        now = time.monotonic() if now is None else now
+        wakeup = self.next_reconcile
+        if deadline is not None:
+            wakeup = min(wakeup, deadline)
+        return max(0.0, wakeup - now)
@@ -0,0 +1,158 @@
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+from config import SETTLE_WINDOW, SETTLE_MAX_WAIT
+
+
+@dataclass
+class _Pending:
+    """
+    Файл, запись которого ещё не завершена.
+
+    Attributes:
+        first_seen (float): Время первого обнаружения изменения (по `time.monotonic()`).
+        stable_since (float): Время, с которого размер и mtime не менялись.
+        size (int): Последний наблюдавшийся размер файла.
+        mtime_ns (int): Последнее наблюдавшееся время изменения файла.
+        changes (int): Число изменений файла за время ожидания.
+    """
+
+    first_seen: float
+    stable_since: float
+    size: int
+    mtime_ns: int
+    changes: int = 0
+
+
+class SettleTracker:
+    """
+    Откладывает загрузку файлов, запись которых ещё продолжается.
+
+    Файл считается дописанным, если его размер и время изменения не менялись
+    `window` секунд (или время изменения старше `window` секунд уже при первом
+    обнаружении), либо inotify сообщил о закрытии файла после записи. Файл,
+    который продолжает меняться дольше `max_wait` секунд, загружается в текущем виде.
+
+    Каждое изменение файла за время ожидания — загрузка, которая без этой проверки
+    была бы выполнена впустую; их число накапливается в `avoided`.
+    """
+
+    def __init__(self, window=None, max_wait=None):
+        self.window = SETTLE_WINDOW if window is None else window
+        self.max_wait = SETTLE_MAX_WAIT if max_wait is None else max_wait
+        self.avoided = 0
+        self._pending = {}
+
+    def split(self, names, local, closed=(), now=None):
+        """
+        Разделяет изменившиеся файлы на дописанные и ещё записываемые.
+
+        Args:
+            names (iterable): Имена изменившихся файлов.
+            local (dict): Файлы в директории {имя: FileEntry}.
+            closed (collection): Имена файлов, закрытых после записи
+                (событие inotify close_write было последним для файла).
+            now (float): Текущее время по `time.monotonic()`.
+
+        Returns:
+            tuple: Списки имён (можно загружать, загрузка отложена).
+        """
+        if self.window <= 0:
+            return list(names), []
+
+        now = time.monotonic() if now is None else now
+        wall_now = time.time()
+        ready = []
+        waiting = []
+        for name in names:
+            entry = local[name]
+            state = self._pending.get(name)
+            if name in closed:
+                self._release(name, state, now, "файл закрыт после записи")
+                ready.append(name)
+                continue
+
+            if state is None:
+                if wall_now - entry.mtime_ns / 1_000_000_000 >= self.window:
+                    ready.append(name)
+                    continue
+                self._pending[name] = _Pending(now, now, entry.size, entry.mtime_ns)
+                logger.debug("Файл {} ещё записывается, загрузка отложена", name)
+                waiting.append(name)
+                continue
+
+            if (entry.size, entry.mtime_ns) != (state.size, state.mtime_ns):
+                # Без ожидания эта версия файла была бы загружена
+                state.changes += 1
+                self.avoided += 1
+                state.size, state.mtime_ns = entry.size, entry.mtime_ns
+                state.stable_since = now
+            elif wall_now - entry.mtime_ns / 1_000_000_000 >= self.window:
+                state.stable_since = min(state.stable_since, now - self.window)
+
+            if now - state.stable_since >= self.window:
+                self._release(name, state, now, "размер и время изменения не меняются")
+                ready.append(name)
+            elif now - state.first_seen >= self.max_wait:
+                logger.warning(
+                    f"Файл {name} изменяется дольше {self.max_wait:.0f} с, "
+                    f"загружается текущая версия"
+                )
+                self._release(name, state, now, "превышено время ожидания")
+                ready.append(name)
+            else:
+                waiting.append(name)
+        return ready, waiting
+
+    def _release(self, name, state, now, reason):
+        """
+        Прекращает ожидание файла.
+        """
+        self._pending.pop(name, None)
+        if state is not None:
+            logger.info(
+                f"Запись файла {name} завершена ({reason}), ожидание "
+                f"{now - state.first_seen:.1f} с, пропущено загрузок: {state.changes}"
+            )
+
+    def discard(self, names):
+        """
+        Прекращает отслеживание файлов, которых больше нет в директории.
+
+        Args:
+            names (iterable): Имена файлов.
+        """
+        for name in names:
+            self._pending.pop(name, None)
+
+    def retain(self, names):
+        """
+        Оставляет в отслеживании только указанные файлы.
+
+        Args:
+            names (collection): Имена файлов, которые есть в директории.
+        """
+        self.discard([name for name in self._pending if name not in names])
+
+    def waiting(self):
+        """
+        Returns:
+            set: Имена файлов, загрузка которых отложена.
+        """
+        return set(self._pending)
+
+    def next_deadline(self):
+        """
+        Возвращает ближайшее время, когда отложенный файл может быть загружен.
+
+        Returns:
+            float: Время по `time.monotonic()` или None, если отложенных файлов нет.
+        """
+        if not self._pending:
+            return None
+        return min(
+            min(state.stable_since + self.window, state.first_seen + self.max_wait)
+            for state in self._pending.values()
+        )
@@ -1,8 +1,11 @@
-from cycle import open_json
-import os
-from config import FILE_PATH, API
-
-list_file = os.listdir(FILE_PATH)
+from config import DIR_PATH
+from database_connect import get_database
+from scanner import scan_tree
 
+# Файлы, которые есть в базе данных, но отсутствуют в локальной директории
+local, _ = scan_tree(DIR_PATH)
+db = get_database()
+with db.transaction():
+    list_deleted = [name for name in db.data_read() if name not in local]
 
 print(list_deleted)
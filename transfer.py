@@ -0,0 +1,343 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, as_completed
+from dataclasses import dataclass
+
+from loguru import logger
+
+from config import TRANSFER_WORKERS
+from metrics import get_metrics
+
+
+def create_pool(workers=None):
+    """
+    Создаёт пул потоков для выполнения операций.
+
+    Args:
+        workers (int): Число потоков (по умолчанию TRANSFER_WORKERS).
+
+    Returns:
+        FairPool: Пул потоков.
+    """
+    return FairPool(workers or TRANSFER_WORKERS, thread_name_prefix="transfer")
+
+
+class FairPool:
+    """
+    Пул потоков, общий для нескольких пар синхронизации.
+
+    Задачи ставятся в очереди по владельцу (`lane`); освободившийся поток берёт
+    следующую задачу из очередей по кругу. Пара с тысячами операций получает
+    такую же долю потоков, как и пара с одной операцией, и не задерживает её.
+    Потоки создаются по мере необходимости.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix="pool"):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        # Очереди задач по владельцам в порядке обхода
+        self._lanes = {}
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+        self._ready = threading.Condition()
+
+    def submit(self, fn, *args, lane=None):
+        """
+        Ставит задачу в очередь владельца.
+
+        Args:
+            fn (callable): Функция задачи.
+            *args: Аргументы функции.
+            lane (hashable): Владелец задачи; задачи разных владельцев
+                выполняются по очереди.
+
+        Returns:
+            Future: Результат задачи.
+        """
+        future = Future()
+        with self._ready:
+            if self._shutdown:
+                raise RuntimeError("Пул потоков остановлен")
+            self._lanes.setdefault(lane, deque()).append((future, fn, args))
+            queued = sum(len(tasks) for tasks in self._lanes.values())
+            if queued > self._idle and len(self._threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"{self.thread_name_prefix}_{len(self._threads)}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._ready.notify()
+        return future
+
+    def shutdown(self, wait=True):
+        """
+        Останавливает пул после выполнения поставленных задач.
+
+        Args:
+            wait (bool): Дождаться завершения потоков.
+        """
+        with self._ready:
+            self._shutdown = True
+            self._ready.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self):
+        """
+        Выполняет задачи, выбирая очереди владельцев по кругу.
+        """
+        while True:
+            with self._ready:
+                while not self._lanes and not self._shutdown:
+                    self._idle += 1
+                    self._ready.wait()
+                    self._idle -= 1
+                if not self._lanes:
+                    return
+                lane = next(iter(self._lanes))
+                tasks = self._lanes.pop(lane)
+                future, fn, args = tasks.popleft()
+                if tasks:
+                    # Владелец переходит в конец очереди обхода
+                    self._lanes[lane] = tasks
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+@dataclass
+class TransferOperation:
+    """
+    Операция синхронизации одного файла.
+
+    Attributes:
+        kind (str): Тип операции: "load", "reload", "delete", "move", "copy"
+            или "mkdir".
+        name (str): Путь файла или директории на диске относительно DISK_PATH.
+        path_file (str): Полный путь к локальному файлу (для загрузки).
+        source (str): Прежнее имя файла на диске (для перемещения) или имя файла
+            с тем же содержимым (для копирования).
+        id (int): Идентификатор записи в журнале операций.
+        attempts (int): Число предыдущих неудачных попыток выполнения.
+    """
+
+    kind: str
+    name: str
+    path_file: str = None
+    source: str = None
+    id: int = None
+    attempts: int = 0
+
+
+@dataclass
+class TransferResult:
+    """
+    Результат выполнения операции синхронизации.
+
+    Attributes:
+        operation (TransferOperation): Выполненная операция.
+        ok (bool): Успешно ли выполнена операция.
+        message (str): Описание результата или ошибки.
+        elapsed (float): Время выполнения в секундах.
+        digest (str): MD5 загруженного содержимого, если файл был загружен.
+    """
+
+    operation: TransferOperation
+    ok: bool
+    message: str = ""
+    elapsed: float = 0.0
+    digest: str = None
+
+
+class TransferExecutor:
+    """
+    Параллельно выполняет операции загрузки, перезагрузки, удаления, перемещения
+    и копирования файлов и создания директорий.
+
+    Операции над разными файлами выполняются в пуле потоков одновременно,
+    операции над одним и тем же файлом — строго в порядке добавления. Удаления
+    файлов, над которыми нет других операций, выполняются одним пакетом
+    (см. `Connector.delete_many`).
+    """
+
+    def __init__(self, connector, workers=None, pool=None):
+        self.connector = connector
+        self.workers = workers or TRANSFER_WORKERS
+        # Пул может быть общим для нескольких пар синхронизации: их операции
+        # выполняются по очереди (см. `FairPool`)
+        self._owns_pool = pool is None
+        self._pool = pool or create_pool(self.workers)
+        logger.debug(f"Инициализация TransferExecutor, потоков: {self.workers}")
+
+    def run(self, operations, callback=None):
+        """
+        Выполняет пакет операций и дожидается их завершения.
+
+        Args:
+            operations (list): Список объектов TransferOperation.
+            callback (callable): Необязательная функция `callback(results)`, вызываемая
+                в текущем потоке по мере завершения операций над каждым файлом.
+
+        Returns:
+            list: Список TransferResult в порядке завершения операций.
+        """
+        groups = {}
+        for operation in operations:
+            groups.setdefault(operation.name, []).append(operation)
+        if not groups:
+            return []
+
+        logger.info(f"Выполнение {len(operations)} операций для {len(groups)} файлов")
+        deletes = []
+        futures = []
+        for ops in groups.values():
+            if len(ops) == 1 and ops[0].kind == "delete":
+                deletes.append(ops[0])
+            else:
+                futures.append(self._pool.submit(self._run_group, ops, lane=self))
+        if deletes:
+            futures.append(self._pool.submit(self._run_deletes, deletes, lane=self))
+        results = []
+        for future in as_completed(futures):
+            group = future.result()
+            if callback is not None:
+                callback(group)
+            results.extend(group)
+
+        failed = sum(1 for result in results if not result.ok)
+        if failed:
+            logger.warning(f"Не выполнено операций: {failed} из {len(results)}")
+        return results
+
+    def _run_group(self, operations):
+        """
+        Последовательно выполняет операции над одним файлом.
+
+        Если операция завершилась ошибкой, последующие операции над тем же файлом
+        не выполняются и помечаются как неуспешные.
+        """
+        results = []
+        for operation in operations:
+            if results and not results[-1].ok:
+                results.append(
+                    TransferResult(
+                        operation, False, "Пропущено из-за ошибки предыдущей операции"
+                    )
+                )
+                continue
+            results.append(self._execute(operation))
+        return results
+
+    def _run_deletes(self, operations):
+        """
+        Выполняет пакет удалений, запросы которого отправляются параллельно.
+
+        Returns:
+            list: Результаты TransferResult.
+        """
+        started = time.monotonic()
+        try:
+            outcomes = self.connector.delete_many(
+                [operation.name for operation in operations]
+            )
+        except Exception as e:
+            logger.exception(f"Неожиданная ошибка при пакетном удалении: {e}")
+            outcomes = {}
+        elapsed = time.monotonic() - started
+        results = [
+            TransferResult(
+                operation,
+                *outcomes.get(operation.name, (False, "Удаление не выполнено")),
+                elapsed,
+            )
+            for operation in operations
+        ]
+        metrics = get_metrics()
+        metrics.observe("transfer", elapsed, kind="delete_batch")
+        for result in results:
+            metrics.inc(
+                "transfers_total",
+                kind="delete",
+                result="ok" if result.ok else "failed",
+            )
+        return results
+
+    def _execute(self, operation):
+        """
+        Выполняет одну операцию через Connector.
+
+        Returns:
+            TransferResult: Результат операции.
+        """
+        started = time.monotonic()
+        digests = {}
+        try:
+            if operation.kind == "load":
+                ok = self.connector.load(
+                    path_file=operation.path_file,
+                    f_path=operation.name,
+                    digests=digests,
+                )
+                message = ""
+            elif operation.kind == "reload":
+                ok = self.connector.reload(
+                    path_file=operation.path_file,
+                    f_path=operation.name,
+                    digests=digests,
+                )
+                message = ""
+            elif operation.kind == "delete":
+                ok, message = self.connector.delete(f_path=operation.name)
+            elif operation.kind == "move":
+                ok, message = self.connector.move(operation.source, operation.name)
+            elif operation.kind == "mkdir":
+                ok, message = self.connector.mkdir(operation.name)
+            elif operation.kind == "copy":
+                ok, message = self.connector.copy(operation.source, operation.name)
+                if not ok:
+                    logger.warning(
+                        f"Не удалось скопировать {operation.source} в {operation.name}, "
+                        f"файл будет загружен: {message}"
+                    )
+                    ok = self.connector.reload(
+                        path_file=operation.path_file,
+                        f_path=operation.name,
+                        digests=digests,
+                    )
+                    message = ""
+            else:
+                ok, message = False, f"Неизвестный тип операции: {operation.kind}"
+        except Exception as e:
+            logger.exception(
+                f"Неожиданная ошибка при выполнении операции {operation.kind} "
+                f"для файла {operation.name}: {e}"
+            )
+            ok, message = False, str(e)
+        elapsed = time.monotonic() - started
+        metrics = get_metrics()
+        metrics.observe("transfer", elapsed, kind=operation.kind)
+        metrics.inc(
+            "transfers_total", kind=operation.kind, result="ok" if ok else "failed"
+        )
+        return TransferResult(
+            operation,
+            bool(ok),
+            message,
+            elapsed,
+            digests.get(operation.name),
+        )
+
+    def shutdown(self):
+        """
+        Останавливает собственный пул потоков, дожидаясь завершения текущих операций.
+        """
+        if self._owns_pool:
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,370 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+# Флаги событий inotify (см. <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CREATE
+    | IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+# Порядок важен: при нескольких флагах в одном событии выбирается первый совпавший.
+# Переполнение очереди и удаление самих отслеживаемых директорий разбираются отдельно
+_EVENT_KINDS = (
+    (IN_MOVED_FROM, "moved_from"),
+    (IN_MOVED_TO, "moved_to"),
+    (IN_DELETE, "delete"),
+    (IN_CREATE, "create"),
+    (IN_CLOSE_WRITE, "close_write"),
+    (IN_MODIFY | IN_ATTRIB, "modify"),
+)
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+@dataclass
+class WatchEvent:
+    """
+    Событие изменения в отслеживаемой директории.
+
+    Attributes:
+        kind (str): Тип события: "create", "modify", "close_write", "delete",
+            "moved_from", "moved_to" или "overflow" (нужна полная сверка).
+        name (str): Путь файла относительно отслеживаемой директории.
+        cookie (int): Идентификатор, связывающий пару moved_from/moved_to.
+        is_dir (bool): Событие относится к директории.
+        root (str): Отслеживаемая директория, к которой относится событие; None для
+            переполнения очереди, которое касается всех директорий.
+    """
+
+    kind: str
+    name: str = None
+    cookie: int = 0
+    is_dir: bool = False
+    root: str = None
+
+
+def _load_libc():
+    """
+    Загружает libc с функциями inotify.
+
+    Returns:
+        ctypes.CDLL: Библиотека libc или None, если inotify недоступен.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not all(
+        hasattr(libc, name)
+        for name in ("inotify_init1", "inotify_add_watch", "inotify_rm_watch")
+    ):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+_libc = _load_libc()
+
+
+def inotify_available():
+    """
+    Проверяет, можно ли использовать inotify на текущей платформе.
+
+    Returns:
+        bool: True, если inotify доступен.
+    """
+    return _libc is not None
+
+
+class InotifyWatcher:
+    """
+    Отслеживает изменения в деревьях директорий через Linux inotify.
+
+    Одним дескриптором inotify и одним потоком чтения обслуживаются все
+    отслеживаемые корни (см. `add_root`). Наблюдение ставится на каждую директорию
+    дерева, кроме исключённых; для новых директорий оно добавляется по мере их
+    появления. События складываются в очередь, откуда их забирает цикл синхронизации
+    методом `drain`.
+    """
+
+    def __init__(self, path=None, ignore=None):
+        if not inotify_available():
+            raise OSError("inotify недоступен на этой платформе")
+        # Корень -> правила исключения
+        self.roots = {}
+        self.events = queue.Queue()
+        self._fd = None
+        self._thread = None
+        self._stop = threading.Event()
+        # Дескриптор наблюдения -> (корень, путь директории относительно корня)
+        self._watches = {}
+        self._paths = {}
+        if path is not None:
+            self.add_root(path, ignore)
+
+    def add_root(self, path, ignore=None):
+        """
+        Добавляет корень для отслеживания. Корни не должны быть вложены друг в друга.
+
+        Args:
+            path (str): Отслеживаемая директория.
+            ignore (IgnoreRules): Правила исключения файлов этой директории.
+        """
+        self.roots[path] = ignore
+
+    def start(self):
+        """
+        Создаёт дескриптор inotify, ставит наблюдение на деревья директорий и запускает
+        поток чтения.
+        """
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+        self._fd = fd
+        try:
+            for root in self.roots:
+                self._add_watch(root, "")
+        except OSError:
+            os.close(fd)
+            self._fd = None
+            raise
+        for root in self.roots:
+            self._add_tree(root, "")
+        self._thread = threading.Thread(
+            target=self._read_loop, name="inotify", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Запущено отслеживание изменений через inotify: "
+            f"{', '.join(self.roots)}, директорий: {len(self._watches)}"
+        )
+
+    def stop(self):
+        """
+        Останавливает поток чтения и закрывает дескриптор inotify.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _add_watch(self, root, rel):
+        """
+        Ставит наблюдение на директорию.
+
+        Args:
+            root (str): Отслеживаемый корень.
+            rel (str): Путь директории относительно корня.
+
+        Raises:
+            OSError: Если наблюдение поставить не удалось.
+        """
+        path = os.path.join(root, rel) if rel else root
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch {path}: {os.strerror(errno)}")
+        self._watches[wd] = (root, rel)
+        self._paths[(root, rel)] = wd
+
+    def _add_tree(self, root, rel, emit=False):
+        """
+        Ставит наблюдение на все поддиректории директории.
+
+        Args:
+            root (str): Отслеживаемый корень.
+            rel (str): Путь директории относительно корня.
+            emit (bool): Создать события "create" для найденных элементов: файлы
+                в новой директории могли появиться до постановки наблюдения.
+
+        Returns:
+            list: Созданные события WatchEvent.
+        """
+        ignore = self.roots.get(root)
+        events = []
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            try:
+                iterator = os.scandir(os.path.join(root, current) if current else root)
+            except OSError:
+                continue
+            with iterator:
+                for entry in iterator:
+                    name = f"{current}/{entry.name}" if current else entry.name
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    if ignore is not None and ignore.match(name, is_dir):
+                        continue
+                    if emit:
+                        events.append(WatchEvent("create", name, 0, is_dir, root))
+                    if not is_dir:
+                        continue
+                    try:
+                        self._add_watch(root, name)
+                    except OSError as e:
+                        # Например, исчерпан лимит fs.inotify.max_user_watches:
+                        # изменения в директории найдёт полная сверка
+                        logger.warning(f"Директория {name} не отслеживается: {e}")
+                        continue
+                    stack.append(name)
+        return events
+
+    def _remove_tree(self, root, rel):
+        """
+        Снимает наблюдение с директории, перемещённой или удалённой из дерева,
+        и всех её поддиректорий.
+        """
+        prefix = f"{rel}/"
+        for key in [
+            key
+            for key in self._paths
+            if key[0] == root and (key[1] == rel or key[1].startswith(prefix))
+        ]:
+            wd = self._paths.pop(key)
+            self._watches.pop(wd, None)
+            _libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_loop(self):
+        """
+        Читает события из дескриптора inotify, пока наблюдатель не остановлен.
+        """
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._fd], [], [], 1.0)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                logger.error(f"Ошибка чтения событий inotify: {e}")
+                self.events.put(WatchEvent("overflow"))
+                continue
+            for event in self._parse(data):
+                self.events.put(event)
+                if not event.is_dir or not event.name:
+                    continue
+                if event.kind in ("create", "moved_to"):
+                    ignore = self.roots.get(event.root)
+                    if ignore is not None and ignore.match(event.name, True):
+                        continue
+                    try:
+                        self._add_watch(event.root, event.name)
+                    except OSError as e:
+                        logger.warning(f"Директория {event.name} не отслеживается: {e}")
+                        continue
+                    for created in self._add_tree(event.root, event.name, emit=True):
+                        self.events.put(created)
+                elif event.kind == "moved_from":
+                    self._remove_tree(event.root, event.name)
+
+    def _parse(self, data):
+        """
+        Разбирает буфер событий inotify.
+
+        Args:
+            data (bytes): Данные, прочитанные из дескриптора inotify.
+
+        Yields:
+            WatchEvent: Разобранные события с путями относительно корня.
+        """
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                yield WatchEvent("overflow")
+                continue
+            watched = self._watches.get(wd)
+            if watched is None:
+                # Событие снятого наблюдения
+                continue
+            root, rel = watched
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    if self._paths.get(watched) == wd:
+                        del self._paths[watched]
+                if not rel:
+                    # Удалён или перемещён сам корень синхронизации
+                    yield WatchEvent("overflow", root=root)
+                # Об удалении поддиректории сообщает событие её родителя
+                continue
+            name = os.fsdecode(raw_name) if raw_name else None
+            if name is None:
+                continue
+            if rel:
+                name = f"{rel}/{name}"
+            for flag, kind in _EVENT_KINDS:
+                if mask & flag:
+                    yield WatchEvent(kind, name, cookie, bool(mask & IN_ISDIR), root)
+                    break
+
+    def drain(self, timeout, debounce=0.0):
+        """
+        Ожидает события и возвращает накопившийся пакет.
+
+        После первого события ещё `debounce` секунд собираются последующие, чтобы
+        серия быстрых изменений обрабатывалась за одну итерацию.
+
+        Args:
+            timeout (float): Максимальное время ожидания первого события в секундах.
+            debounce (float): Время ожидания последующих событий в секундах.
+
+        Returns:
+            list: Список WatchEvent (пустой, если событий не было).
+        """
+        try:
+            events = [self.events.get(timeout=max(timeout, 0))]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + debounce
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    events.append(self.events.get(timeout=remaining))
+                else:
+                    events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events